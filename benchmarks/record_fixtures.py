@@ -0,0 +1,63 @@
+"""
+Records the XML and JSON fixtures used by the benchmarks from the local stand-in server.
+
+    python benchmarks/record_fixtures.py
+"""
+
+import os
+import sys
+from xml.etree import ElementTree
+from xml.etree.ElementTree import SubElement
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from v1pysdk.client import V1Server  # noqa: E402
+from tests.fake_server import FakeDataSet, FakeV1Server  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+STORY_SELECT = "Name,Number,Estimate,ToDo,Scope,Scope.Name,Owners,Owners.Name,Timebox"
+
+
+def record():
+    dataset = FakeDataSet.generate(
+        stories=200, owners_per_story=20, tasks_per_story=0, members=50, seed=42
+    )
+    with FakeV1Server(dataset) as server:
+        client = V1Server(instance_url=server.url)
+        fixtures = {
+            "story_meta.xml": "/meta.v1/Story",
+            "member_meta.xml": "/meta.v1/Member",
+            "scope_meta.xml": "/meta.v1/Scope",
+            "timebox_meta.xml": "/meta.v1/Timebox",
+            "story_page.xml": "/rest-1.v1/Data/Story?sel=" + STORY_SELECT,
+        }
+        for filename, path in fixtures.items():
+            path, _, query = path.partition("?")
+            exception, body = client.fetch(path, query=query)
+            with open(os.path.join(FIXTURES, filename), "wb") as f:
+                f.write(body)
+        # the same page as rest-1.v1 answers it when asked for JSON
+        exception, body = client.fetch(
+            "/rest-1.v1/Data/Story",
+            query="sel=" + STORY_SELECT,
+            accept="application/json",
+        )
+        with open(os.path.join(FIXTURES, "story_page.json"), "wb") as f:
+            f.write(body)
+        # core types of real instances carry hundreds of attributes, custom fields included
+        meta = client.get_meta_xml("Story")
+        for i in range(300):
+            SubElement(
+                meta,
+                "AttributeDefinition",
+                name="Custom_Field%d" % i,
+                attributetype="Text",
+                ismultivalue="False",
+            )
+        with open(os.path.join(FIXTURES, "story_meta_large.xml"), "wb") as f:
+            f.write(ElementTree.tostring(meta, encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    record()
@@ -0,0 +1,469 @@
+"""
+Benchmarks for the SDK hot paths.
+
+Runs against the recorded XML and JSON fixtures in benchmarks/fixtures and, for the
+benchmarks that need HTTP, against the local stand-in server, so results are
+reproducible without network access.
+
+    python benchmarks/run.py                          # run everything, print JSON
+    python benchmarks/run.py unpack_asset split_attribute
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare benchmarks/baseline.json
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+
+With --compare the exit status is 1 when a benchmark is slower than its
+baseline by more than --tolerance (25% by default).  Timings are compared relative
+to a reference workload that doesn't use the SDK, timed in the same run, so a
+baseline saved on a faster or less loaded machine still compares.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from v1pysdk import V1Meta  # noqa: E402
+from tests.fake_server import FakeDataSet, FakeV1Server  # noqa: E402
+from v1pysdk.string_utils import split_attribute  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a benchmark.  The decorated function receives the Context and returns
+    (run, ops): run() is timed and performs ops operations each time it's called.  A run()
+    with a true self_timed attribute returns the seconds it measured itself instead."""
+
+    def register(f):
+        BENCHMARKS[name] = f
+        return f
+
+    return register
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class Context(object):
+    """Shared setup: offline V1Meta instances fed from the fixtures, and a stand-in
+    server started on first use."""
+
+    def __init__(self):
+        self._server = None
+        self.story_page = ElementTree.fromstring(read_fixture("story_page.xml"))
+
+    def offline_meta(self, story_meta="story_meta.xml"):
+        v1 = V1Meta()
+
+        def get_meta_xml(asset_type_name):
+            name = story_meta if asset_type_name == "Story" else None
+            name = name or "%s_meta.xml" % asset_type_name.lower()
+            return ElementTree.fromstring(read_fixture(name))
+
+        v1.server.get_meta_xml = get_meta_xml
+        return v1
+
+    @property
+    def server(self):
+        if self._server is None:
+            dataset = FakeDataSet.generate(stories=2000, owners_per_story=3, seed=42)
+            self._server = FakeV1Server(dataset).start()
+        return self._server
+
+    def online_meta(self):
+        return V1Meta(instance_url=self.server.url)
+
+    def close(self):
+        if self._server is not None:
+            self._server.stop()
+
+
+@benchmark("split_attribute")
+def bench_split_attribute(ctx):
+    terms = [
+        "Name",
+        "Scope.Name",
+        "Owners.OwnedWorkitems[ChildrenMeAndDown=$].@DistinctCount",
+        "Workitems:PrimaryWorkitem[Status.Name='Done'].Estimate.@Sum",
+        "Scope.ChildrenMeAndDown.Workitems:Story[ChildrenMeAndDown.ToDo.@Sum!='0.0'].Estimate.@Sum",
+    ]
+
+    def run():
+        for _ in range(200):
+            for term in terms:
+                split_attribute(term)
+
+    return run, 200 * len(terms)
+
+
+@benchmark("unpack_asset")
+def bench_unpack_asset(ctx):
+    v1 = ctx.offline_meta()
+    assets = ctx.story_page.findall("Asset")
+
+    def run():
+        v1.global_cache.clear()
+        for asset in assets:
+            v1.unpack_asset(asset)
+
+    return run, len(assets)
+
+
+@benchmark("from_query_select")
+def bench_from_query_select(ctx):
+    v1 = ctx.offline_meta()
+    Story = v1.Story
+    assets = ctx.story_page.findall("Asset")
+
+    def run():
+        v1.global_cache.clear()
+        for asset in assets:
+            Story.from_query_select(asset)
+
+    return run, len(assets)
+
+
+@benchmark("decode_page_xml")
+def bench_decode_page_xml(ctx):
+    """A rest-1.v1 page of stories from the response body to filled asset instances"""
+    v1 = ctx.offline_meta()
+    Story = v1.Story
+    body = read_fixture("story_page.xml")
+
+    def run():
+        v1.global_cache.clear()
+        for asset in ElementTree.fromstring(body).findall("Asset"):
+            Story.from_query_select(asset)
+
+    return run, len(ctx.story_page)
+
+
+@benchmark("decode_page_json")
+def bench_decode_page_json(ctx):
+    """decode_page_xml for the same page requested as JSON"""
+    v1 = ctx.offline_meta()
+    Story = v1.Story
+    body = read_fixture("story_page.json")
+
+    def run():
+        v1.global_cache.clear()
+        for asset in json.loads(body)["Assets"]:
+            Story.from_query_json(asset)
+
+    return run, len(ctx.story_page)
+
+
+@benchmark("asset_class")
+def bench_asset_class(ctx):
+    v1 = ctx.offline_meta(story_meta="story_meta_large.xml")
+
+    def run():
+        for _ in range(20):
+            v1.clear_memoized_cache()
+            v1.asset_class("Story")
+
+    return run, 20
+
+
+@benchmark("identity_map")
+def bench_identity_map(ctx):
+    v1 = ctx.offline_meta()
+    Story = v1.Story
+    oids = [str(1000 + i) for i in range(500)]
+    for oid in oids:
+        Story(oid)
+
+    def run():
+        for oid in oids:
+            Story(oid)
+        for oid in oids:
+            v1.asset_from_oid("Story:" + oid)
+
+    return run, 2 * len(oids)
+
+
+@benchmark("generate_update_doc")
+def bench_generate_update_doc(ctx):
+    v1 = ctx.offline_meta()
+    owners = [v1.Member(str(1000 + i)) for i in range(50)]
+    newdata = {
+        "Name": "Updated name",
+        "Estimate": 5,
+        "Description": "x" * 200,
+        "Scope": v1.Scope("1052"),
+        "Timebox": None,
+        "Owners": owners,
+    }
+
+    def run():
+        for _ in range(100):
+            v1.generate_update_doc(newdata)
+
+    return run, 100
+
+
+@benchmark("paged_iteration")
+def bench_paged_iteration(ctx):
+    v1 = ctx.online_meta()
+    page_size = 250
+
+    def run():
+        v1.global_cache.clear()
+        query = v1.Story.select("Name", "Estimate", "Owners")
+        start = 0
+        count = 0
+        while True:
+            query.page(size=page_size, start=start).reQueryAll()
+            found = list(query)
+            count += len(found)
+            start += page_size
+            if start >= query.max_length():
+                break
+        assert count == 2000, count
+
+    return run, 2000
+
+
+@benchmark("commit")
+def bench_commit(ctx):
+    v1 = ctx.online_meta()
+    stories = list(v1.Story.select("Name").page(size=100))
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        for story in stories:
+            story.Name = "Renamed %d" % counter[0]
+        errors = v1.commit()
+        assert not errors, errors
+
+    return run, len(stories)
+
+
+@benchmark("mirror_query")
+def bench_mirror_query(ctx):
+    """where/sort queries answered from a local mirror of the stand-in server's stories"""
+    import tempfile
+
+    from v1pysdk.mirror import V1Mirror
+
+    v1 = ctx.online_meta()
+    mirror = V1Mirror(v1, os.path.join(tempfile.mkdtemp(), "mirror.sqlite"))
+    mirror.track("Story", ["Name", "Number", "Estimate", "Scope", "Owners"])
+    mirror.refresh()
+    scopes = list(v1.Scope.select("Name"))
+
+    def run():
+        v1.global_cache.clear()
+        for scope in scopes:
+            list(mirror.query("Story").where(Scope=scope).sort("-Estimate"))
+
+    return run, len(scopes)
+
+
+@benchmark("fetch_debug_logging")
+def bench_fetch_debug_logging(ctx):
+    """Logging work done by V1Server.fetch for a 5 MB response at the default log level"""
+    from email.message import Message
+
+    from v1pysdk.client import V1Server
+
+    server = V1Server()
+    body = read_fixture("story_page.xml") * 10
+    headers = Message()
+    headers["Content-Type"] = "text/xml; charset=utf-8"
+    headers["Content-Length"] = str(len(body))
+
+    def run():
+        for _ in range(100):
+            server._debug_headers(headers)
+            server._debug_body(body, headers)
+
+    return run, 100
+
+
+@benchmark("import")
+def bench_import(ctx):
+    """Cumulative time of "import v1pysdk" in a fresh interpreter, from python -X importtime"""
+    command = [sys.executable, "-X", "importtime", "-c", "import v1pysdk"]
+
+    def run():
+        output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        for line in output.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[2] == "v1pysdk":
+                return int(fields[1]) / 1e6
+        raise RuntimeError("No import time for v1pysdk:\n" + output.stderr)
+
+    run.self_timed = True
+    return run, 1
+
+
+def reference_workload():
+    """A fixed mix of XML parsing and dict/str work that doesn't depend on the SDK, whose
+    time calibrates the results against the speed of the machine"""
+    data = read_fixture("story_page.xml")
+
+    def run():
+        counts = {}
+        for node in ElementTree.fromstring(data).iter():
+            key = node.get("name") or node.tag
+            counts[key] = counts.get(key, 0) + len(key.split("."))
+        return counts
+
+    return run
+
+
+def peak_memory(run):
+    """Peak number of bytes allocated by Python during a single call of run()"""
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def time_round(run, min_time):
+    """Seconds per call of run(), called until min_time is spent"""
+    calls = 0
+    timings = []
+    t0 = time.perf_counter()
+    while True:
+        timings.append(run())
+        calls += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            break
+    return min(timings) if getattr(run, "self_timed", False) else elapsed / calls
+
+
+def measure(run, ops, repeat, min_time, reference=None):
+    """Best time of *repeat* rounds, each round calling run() until min_time is spent,
+    and the peak memory of one more call.  Each round is followed by a round of the
+    *reference* run, when given: "relative" is the best ratio of the time per operation
+    to the reference time of the same round, which follows the load of the machine."""
+    run()  # warm up caches, imports and connections
+    best = relative = reference_best = None
+    for _ in range(repeat):
+        per_call = time_round(run, min_time)
+        best = per_call if best is None else min(best, per_call)
+        if reference is not None:
+            reference_time = time_round(reference, min_time)
+            ratio = per_call / ops / reference_time
+            relative = ratio if relative is None else min(relative, ratio)
+            reference_best = min(reference_best or reference_time, reference_time)
+    result = {
+        "ops": ops,
+        "best_seconds": best,
+        "us_per_op": best / ops * 1e6,
+        "ops_per_second": ops / best,
+        "peak_kib": peak_memory(run) / 1024.0,
+    }
+    if reference is not None:
+        result["relative"] = relative
+        result["reference_us"] = reference_best * 1e6
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of (name, ratio) for the benchmarks slower than baseline*(1+tolerance).
+    The times relative to the reference workload are compared when the baseline has them,
+    the absolute times otherwise."""
+    key = "relative" if baseline.get("calibration_us") else "us_per_op"
+    regressions = []
+    for name, result in sorted(results.items()):
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            continue
+        ratio = result[key] / reference[key]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", help="write the results as a new baseline")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(sorted(BENCHMARKS)))
+        return 0
+    names = args.names or sorted(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: " + ", ".join(unknown))
+
+    ctx = Context()
+    results = {}
+    reference = reference_workload()
+    try:
+        for name in names:
+            run, ops = BENCHMARKS[name](ctx)
+            results[name] = measure(run, ops, args.repeat, args.min_time, reference)
+            sys.stderr.write(
+                "%-24s %12.2f us/op %14.0f ops/s %12.1f KiB peak\n"
+                % (
+                    name,
+                    results[name]["us_per_op"],
+                    results[name]["ops_per_second"],
+                    results[name]["peak_kib"],
+                )
+            )
+    finally:
+        ctx.close()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "calibration_us": min(r["reference_us"] for r in results.values()),
+        "results": results,
+    }
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        report["regressions"] = dict(regressions)
+        for name, ratio in regressions:
+            sys.stderr.write(
+                "REGRESSION %s: %.2fx slower than baseline\n" % (name, ratio)
+            )
+        status = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import datetime, csv, os
+import datetime, csv, os, sys
 
 from v1pysdk import V1Meta
 
@@ -26,7 +26,7 @@ def as_of_times(start, end, hoursper=6):
 
 
 if __name__ == "__main__":
-    username, password, sprintName, outputFolder = sys.argv[1:3]
+    username, password, sprintName, outputFolder = sys.argv[1:5]
     with V1Meta(
         instance_url="https://www7.v1host.com/V1Production",
         username=username,
@@ -48,6 +48,6 @@ if __name__ == "__main__":
         with open(outfilename, "w") as outfile:
             writer = csv.writer(outfile, delimiter="|")
             writer.writerow(["# Date"] + statuses)
-            for result in results:
-                row = [result.data[select_term] for select_term in select_list]
-                writer.writerow([result.data["AsOf"]] + row)
+            for asof, idref, values in results.timeseries():
+                row = [values[select_term] for select_term in select_list]
+                writer.writerow([asof] + row)
@@ -3,7 +3,7 @@
 import sys
 from setuptools import setup
 
-install_requires = ["future", "python-ntlm3", "PyYAML"]
+install_requires = ["python-ntlm3", "PyYAML"]
 
 # get our long description from the README.md
 with open("README.md", "r") as f:
@@ -31,6 +31,11 @@ setup(
         "v1pysdk",
     ],
     include_package_data=True,
+    entry_points={
+        "console_scripts": [
+            "v1pysdk = v1pysdk.__main__:main",
+        ],
+    },
     install_requires=install_requires,
     classifiers=(
         "Development Status :: 4 - Beta",
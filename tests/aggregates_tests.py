@@ -0,0 +1,89 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.aggregates import Count, MaxDate, Sum
+from .fake_server import FakeDataSet, FakeV1Server
+
+
+class TestAggregateTerms(TestCase):
+    def test_terms(self):
+        self.assertEqual("Workitems.@Count", Count("Workitems").term())
+        self.assertEqual(
+            "Workitems:PrimaryWorkitem[Status.Name='Done'].Estimate.@Sum",
+            Sum(
+                "Workitems:PrimaryWorkitem.Estimate", filter={"Status.Name": "Done"}
+            ).term(),
+        )
+        self.assertEqual(
+            "Workitems[AssetState='64';Estimate>'3'].Estimate.@Sum",
+            Sum("Workitems[AssetState='64'].Estimate", filter="Estimate>'3'").term(),
+        )
+
+    def test_values_are_typed(self):
+        self.assertEqual(3, Count("Workitems").convert("3"))
+        self.assertEqual(0.0, Sum("Workitems.Estimate").convert(None))
+        self.assertEqual(2.5, Sum("Workitems.Estimate").convert(2.5))
+        self.assertEqual(None, MaxDate("Workitems.ChangeDateUTC").convert(""))
+
+
+class TestAggregateQueries(TestCase):
+    def setUp(self):
+        super(TestAggregateQueries, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=40, seed=3)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+
+    def expected(self):
+        totals = {}
+        for story in self.dataset.assets["Story"].values():
+            for timebox in story["Timebox"]:
+                estimate = float(story["Estimate"])
+                total, large = totals.get(timebox, (0.0, 0.0))
+                totals[timebox] = (total + estimate, large + (estimate > 3) * estimate)
+        return totals
+
+    def aggregate(self, v1):
+        return v1.Timebox.where(AssetState="64").aggregate(
+            total=Sum("Workitems:Story.Estimate"),
+            large=Sum("Workitems:Story.Estimate", filter="Estimate>'3'"),
+            items=Count("Workitems"),
+        )
+
+    def test_aggregates_are_computed_by_the_server(self):
+        for response_format in ("xml", "json"):
+            v1 = V1Meta(instance_url=self.server.url, response_format=response_format)
+            v1.Timebox
+            self.server.reset_counters()
+            rows = self.aggregate(v1)
+            self.assertEqual(1, self.server.request_counts["Data"])
+            expected = self.expected()
+            self.assertEqual(
+                sorted(expected.items()),
+                sorted(
+                    (row.asset.idref, (row.values["total"], row.values["large"]))
+                    for row in rows
+                ),
+            )
+            self.assertIsInstance(rows[0].values["items"], int)
+
+    def test_query_v1_and_asof(self):
+        v1 = V1Meta(instance_url=self.server.url)
+        rows = (
+            v1.Timebox.select("Name")
+            .backend("query.v1")
+            .aggregate(items=Count("Workitems"))
+        )
+        self.assertEqual(
+            dict((row.asset, row.values["items"]) for row in rows),
+            dict(
+                (row.asset, row.values["items"])
+                for row in v1.Timebox.aggregate(items=Count("Workitems"))
+            ),
+        )
+        now = "2100-01-01T00:00:00"
+        [row] = (
+            v1.Timebox.where(ID=rows[0].asset.idref)
+            .asof(now)
+            .aggregate(items=Count("Workitems"))
+        )
+        self.assertEqual((rows[0].asset, now), (row.asset, row.asof))
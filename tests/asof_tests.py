@@ -0,0 +1,94 @@
+import threading
+import time
+
+from testtools import TestCase
+
+from urllib.parse import parse_qs
+from xml.etree.ElementTree import fromstring
+
+from v1pysdk import V1Meta
+
+META_XML = """
+<AssetType name="Timebox">
+  <AttributeDefinition name="Name" attributetype="Text" ismultivalue="False" />
+  <AttributeDefinition name="Workitems" attributetype="Relation" ismultivalue="True" />
+</AssetType>
+"""
+
+HIST_XML = """
+<Assets total="1" pageSize="2147483647" pageStart="0">
+  <Asset id="Timebox:1010:{moment}">
+    <Attribute name="Name">Sprint 1</Attribute>
+    <Attribute name="Workitems.Estimate.@Sum">{asof}</Attribute>
+    <Relation name="Workitems"><Asset idref="Story:1005" /></Relation>
+  </Asset>
+</Assets>
+"""
+
+
+class TestAsofQueries(TestCase):
+    def setUp(self):
+        super(TestAsofQueries, self).setUp()
+        self.v1 = V1Meta()
+        self.requests = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # requests wait at the barrier, when there's one, until enough run together
+        self.barrier = None
+        self.v1.server.get_meta_xml = lambda name: fromstring(META_XML)
+        self.v1.server.get_xml = self.get_xml
+
+    def get_xml(self, path, query="", postdata=None):
+        params = parse_qs(query)
+        asof = params.get("asof", ["now"])[0]
+        with self.lock:
+            self.requests.append((path, asof))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.barrier is not None:
+            self.barrier.wait(timeout=10)
+        # the first moments answer last, results must still follow the asof list
+        time.sleep(0.05 / (len(self.requests)))
+        with self.lock:
+            self.in_flight -= 1
+        return fromstring(HIST_XML.format(asof=asof, moment=len(self.requests)))
+
+    def test_asof_requests_run_concurrently_and_keep_order(self):
+        asofs = ["2012-01-0%d" % day for day in range(1, 7)]
+        self.barrier = threading.Barrier(3)
+        results = self.v1.Timebox.asof(asofs).select("Name").concurrency(3)
+        self.assertEqual(asofs, [result.data["AsOf"] for result in results])
+        self.assertEqual(6, len(self.requests))
+        self.assertEqual(3, self.max_in_flight)
+        self.assertTrue(
+            all(path.endswith("/Hist/Timebox") for path, _ in self.requests)
+        )
+
+    def test_concurrency_of_one_is_serial(self):
+        asofs = ["2012-01-01", "2012-01-02", "2012-01-03"]
+        list(self.v1.Timebox.asof(asofs).concurrency(1))
+        self.assertEqual(1, self.max_in_flight)
+
+    def test_none_asof_uses_current_data(self):
+        list(self.v1.Timebox.asof([None, "2012-01-01"]))
+        self.assertEqual(
+            {
+                ("/rest-1.v1/Data/Timebox", "now"),
+                ("/rest-1.v1/Hist/Timebox", "2012-01-01"),
+            },
+            set(self.requests),
+        )
+
+    def test_timeseries_skips_asset_materialization(self):
+        asofs = ["2012-01-01", "2012-01-02"]
+        rows = (
+            self.v1.Timebox.asof(asofs).select("Workitems.Estimate.@Sum").timeseries()
+        )
+        self.assertEqual(asofs, [asof for asof, idref, values in rows])
+        self.assertEqual(
+            ["2012-01-01", "2012-01-02"],
+            [values["Workitems.Estimate.@Sum"] for asof, idref, values in rows],
+        )
+        self.assertEqual(["Story:1005"], rows[0][2]["Workitems"])
+        self.assertEqual({}, self.v1.global_cache)
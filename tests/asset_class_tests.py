@@ -0,0 +1,52 @@
+from testtools import TestCase
+
+from xml.etree.ElementTree import fromstring
+
+from v1pysdk import V1Meta
+from v1pysdk.base_asset import (
+    AssetAttribute,
+    MultiRelationAttribute,
+    SingleRelationAttribute,
+)
+from v1pysdk.none_deref import NoneDeref
+
+META_XML = """
+<AssetType name="{0}">
+  <AttributeDefinition name="Name" attributetype="Text" ismultivalue="False" />
+  <AttributeDefinition name="Owners" attributetype="Relation" ismultivalue="True" />
+  <AttributeDefinition name="Scope" attributetype="Relation" ismultivalue="False" />
+  <Operation name="QuickClose" />
+</AssetType>
+"""
+
+
+class TestAssetClass(TestCase):
+    def setUp(self):
+        super(TestAssetClass, self).setUp()
+        self.v1 = V1Meta()
+        self.v1.server.get_meta_xml = lambda name: fromstring(META_XML.format(name))
+
+    def test_attributes_are_shared_descriptors(self):
+        Story = self.v1.Story
+        self.assertEqual(AssetAttribute, type(Story.__dict__["Name"]))
+        self.assertEqual(MultiRelationAttribute, type(Story.__dict__["Owners"]))
+        self.assertEqual(SingleRelationAttribute, type(Story.__dict__["Scope"]))
+        self.assertEqual("Name", Story.Name.name)
+        self.assertTrue(callable(Story.QuickClose))
+
+    def test_attribute_access(self):
+        member = self.v1.Member(20)
+        story = self.v1.Story(1005).with_data(
+            {"Name": "Shared", "Owners": [member], "Scope": []}
+        )
+        self.assertEqual("Shared", story.Name)
+        self.assertEqual([member], story.Owners)
+        self.assertIsInstance(story.Scope, NoneDeref)
+        story.with_data({"Scope": [self.v1.Scope(0)]})
+        self.assertIs(self.v1.Scope(0), story.Scope)
+
+        story.Owners = (member,)
+        story.Name = "Renamed"
+        self.assertEqual({"Owners": [member], "Name": "Renamed"}, story._v1_new_data)
+        self.assertEqual([story, story], self.v1.dirtylist)
+        self.assertRaises(NotImplementedError, delattr, story, "Name")
@@ -0,0 +1,137 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.attachment_mirror import AttachmentMirror
+from v1pysdk.client import V1Error, V1Server
+from .fake_server import FakeDataSet, FakeV1Server
+
+BLOB = bytes(range(256)) * 1000
+
+
+class AttachmentHandler(BaseHTTPRequestHandler):
+    blobs = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        blob = self.blobs.get(self.path.rsplit("/", 1)[-1])
+        if blob is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(blob)))
+        self.end_headers()
+        self.wfile.write(blob)
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.blobs[self.path.rsplit("/", 1)[-1]] = self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class TestAttachmentStreaming(TestCase):
+    def setUp(self):
+        super(TestAttachmentStreaming, self).setUp()
+        AttachmentHandler.blobs = {"1": BLOB, "2": b"small"}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), AttachmentHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.addCleanup(self.httpd.server_close)
+        self.addCleanup(self.httpd.shutdown)
+        self.instance_url = "http://127.0.0.1:%d/VersionOne" % self.httpd.server_port
+        self.server = V1Server(instance_url=self.instance_url)
+
+    def test_download_in_chunks_reports_progress(self):
+        out = io.BytesIO()
+        calls = []
+        copied = self.server.download_attachment(
+            1, out, chunk_size=4096, progress=lambda n, total: calls.append((n, total))
+        )
+        self.assertEqual(len(BLOB), copied)
+        self.assertEqual(BLOB, out.getvalue())
+        self.assertEqual((4096, len(BLOB)), calls[0])
+        self.assertEqual((len(BLOB), len(BLOB)), calls[-1])
+
+    def test_upload_from_file_object(self):
+        calls = []
+        self.server.upload_attachment(
+            3,
+            io.BytesIO(BLOB),
+            chunk_size=10000,
+            progress=lambda n, total: calls.append((n, total)),
+        )
+        self.assertEqual(BLOB, AttachmentHandler.blobs["3"])
+        self.assertEqual(26, len(calls))
+        self.assertEqual((len(BLOB), len(BLOB)), calls[-1])
+
+    def test_mirror_downloads_and_skips_existing_files(self):
+        v1 = V1Meta(instance_url=self.instance_url)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        class FakeAttachment(object):
+            def __init__(self, intid, filename):
+                self.intid = intid
+                self.Filename = filename
+
+            def download_to(self, fileobj, **kw):
+                return v1.download_attachment(self.intid, fileobj, **kw)
+
+        attachments = [FakeAttachment(1, "big.bin"), FakeAttachment(2, "../s.txt")]
+        mirror = AttachmentMirror(v1, directory, max_workers=2)
+        mirrored, errors = mirror.run(attachments)
+        self.assertEqual([], errors)
+        self.assertEqual(["1-big.bin", "2-s.txt"], sorted(os.listdir(directory)))
+        with open(os.path.join(directory, "1-big.bin"), "rb") as f:
+            self.assertEqual(BLOB, f.read())
+        self.assertEqual(len(BLOB) + 5, mirror.copied_bytes)
+
+        mirrored, errors = AttachmentMirror(v1, directory).run(
+            attachments + [FakeAttachment(9, "missing")]
+        )
+        self.assertEqual(2, len(mirrored))
+        self.assertEqual(1, len(errors))
+        # the failed download left no partial file
+        self.assertEqual(["1-big.bin", "2-s.txt"], sorted(os.listdir(directory)))
+
+
+class TestUploadAfterChallenge(TestCase):
+    def setUp(self):
+        super(TestUploadAfterChallenge, self).setUp()
+        self.fake = FakeV1Server(
+            FakeDataSet.generate(stories=1), username="admin", password="admin"
+        ).start()
+        self.addCleanup(self.fake.stop)
+        # without preemptive credentials the first POST is answered with a 401
+        self.server = V1Server(
+            instance_url=self.fake.url,
+            username="admin",
+            password="admin",
+            preemptive_auth=False,
+        )
+
+    def test_seekable_files_are_sent_again(self):
+        self.server.upload_attachment(3, io.BytesIO(BLOB), chunk_size=10000)
+        self.assertEqual(2, self.fake.request_counts["attachment.v1"])
+        self.assertEqual(BLOB, self.fake.dataset.blobs["3"])
+
+    def test_non_seekable_files_raise(self):
+        class Stream(object):
+            def __init__(self, data):
+                self.read = io.BytesIO(data).read
+
+        self.assertRaises(
+            V1Error, self.server.upload_attachment, 3, Stream(BLOB), chunk_size=10000
+        )
+        self.assertNotIn("3", self.fake.dataset.blobs)
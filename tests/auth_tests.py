@@ -0,0 +1,114 @@
+import os
+import shutil
+import stat
+import tempfile
+from http.cookiejar import CookieJar
+
+from urllib.request import BaseHandler, HTTPBasicAuthHandler, build_opener
+
+from testtools import TestCase
+
+from v1pysdk import opener
+from v1pysdk.client import V1Server
+from .fake_server import FakeDataSet, FakeV1Server
+
+
+class TestAuthentication(TestCase):
+    def setUp(self):
+        super(TestAuthentication, self).setUp()
+        self.server = FakeV1Server(
+            FakeDataSet.generate(stories=2),
+            username="admin",
+            password="admin",
+            token="secret",
+            sessions=True,
+        ).start()
+        self.addCleanup(self.server.stop)
+
+    def client(self, **kw):
+        return V1Server(instance_url=self.server.url, **kw)
+
+    def requests_for_meta(self, client):
+        self.server.reset_counters()
+        client.get_meta_xml("Story")
+        return len(self.server.request_log)
+
+    def test_basic_credentials_are_sent_preemptively(self):
+        client = self.client(username="admin", password="admin", preemptive_auth=True)
+        self.assertEqual(1, self.requests_for_meta(client))
+        challenged = self.client(
+            username="admin", password="admin", preemptive_auth=False
+        )
+        self.assertEqual(2, self.requests_for_meta(challenged))
+
+    def test_plain_http_waits_for_the_challenge_by_default(self):
+        client = self.client(username="admin", password="admin")
+        self.assertEqual(2, self.requests_for_meta(client))
+
+    def test_only_basic_auth_is_preemptive(self):
+        handlers = []
+
+        class NtlmHandler(BaseHandler):
+            def __init__(self, password_manager):
+                self.passwd = password_manager
+                handlers.append(self)
+
+        self.patch(opener, "ntlm_handler_class", lambda: NtlmHandler)
+        for url, preemptive in (
+            ("https://v1/VersionOne", True),
+            (self.server.url, False),
+        ):
+            client = V1Server(instance_url=url, username="admin", password="admin")
+            basic = [
+                h for h in client.opener.handlers if type(h) is HTTPBasicAuthHandler
+            ]
+            base_url = client.build_url("")
+            self.assertEqual(preemptive, basic[0].passwd.is_authenticated(base_url))
+            ntlm_passwords = handlers.pop().passwd
+            self.assertFalse(hasattr(ntlm_passwords, "is_authenticated"))
+            self.assertEqual(
+                ("admin", "admin"), ntlm_passwords.find_user_password(None, base_url)
+            )
+
+    def test_tokens_are_not_replaced_by_basic_credentials(self):
+        client = self.client(
+            username="admin", password="secret", use_password_as_token=True
+        )
+        self.assertEqual(1, self.requests_for_meta(client))
+
+    def test_opener_can_be_replaced(self):
+        urls = []
+
+        class RecordingHandler(BaseHandler):
+            def http_request(self, request):
+                urls.append(request.full_url)
+                return request
+
+        opener = build_opener(RecordingHandler)
+        opener.addheaders.append(("Authorization", "Bearer secret"))
+        client = self.client()
+        client.opener = opener
+        self.assertIs(opener, client.opener)
+        self.assertEqual(1, self.requests_for_meta(client))
+        self.assertEqual([client.build_url("/meta.v1/Story")], urls)
+
+    def test_session_cookies_are_shared(self):
+        jar = CookieJar()
+        self.requests_for_meta(
+            self.client(username="admin", password="admin", cookie_jar=jar)
+        )
+        self.assertEqual(1, len(jar))
+        # the session cookie is enough for another client sharing the jar
+        self.assertEqual(1, self.requests_for_meta(self.client(cookie_jar=jar)))
+
+    def test_session_cookies_are_persisted(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "cookies.txt")
+        self.requests_for_meta(
+            self.client(username="admin", password="admin", cookie_file=path)
+        )
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+        self.assertEqual([], [name for name in os.listdir(directory) if "tmp" in name])
+        # a later process only needs the file
+        self.assertEqual(1, self.requests_for_meta(self.client(cookie_file=path)))
@@ -0,0 +1,76 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.bulk import BulkWriter, V1BulkCreateError, V1CommandError
+from .fake_server import FakeDataSet, FakeV1Server
+
+
+class TestBulkWriter(TestCase):
+    def setUp(self):
+        super(TestBulkWriter, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=25, owners_per_story=2, seed=7)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(
+            instance_url=self.server.url, bulk_writer=BulkWriter(batch_size=10)
+        )
+        self.v1.Story
+        self.v1.Member
+
+    def test_commit_sends_batches_of_commands(self):
+        stories = list(self.v1.Story.select("Name", "Estimate", "Owners"))
+        member = self.v1.Member.select("Name").first()
+        self.server.reset_counters()
+        for story in stories:
+            story.Estimate = 11
+        stories[0].Owners = [member]
+        self.assertEqual([], self.v1.commit())
+        self.assertEqual(3, self.server.request_counts["api"])
+        self.assertEqual(["POST"] * 3, [m for m, path in self.server.request_log])
+        self.assertEqual("11", self.dataset.get(stories[5].idref)["Estimate"])
+        self.assertEqual([member.idref], self.dataset.get(stories[0].idref)["Owners"])
+        # the committed assets are read again
+        self.assertEqual("11", stories[5].Estimate)
+
+    def test_batches_are_bounded_by_size(self):
+        writer = BulkWriter(batch_size=100, batch_bytes=60)
+        commands = [
+            (i, {"from": "Story:%d" % i, "update": {"Name": "x"}}) for i in range(4)
+        ]
+        self.assertEqual(
+            [[0], [1], [2], [3]],
+            [[i for i, _ in batch] for batch in writer.batches(commands)],
+        )
+        self.assertEqual(1, len(list(BulkWriter().batches(commands))))
+
+    def test_failed_commands_are_returned_with_their_asset(self):
+        story = self.v1.Story.select("Name").first()
+        story.Name = "Renamed"
+        missing = self.v1.Story(999999)
+        missing.Name = "Nobody"
+        [error] = self.v1.commit()
+        self.assertIsInstance(error, V1CommandError)
+        self.assertIs(missing, error.asset)
+        self.assertIn("Asset not found", str(error))
+        self.assertEqual("Renamed", self.dataset.get(story.idref)["Name"])
+
+    def test_create_many(self):
+        scope = self.v1.Scope.select("Name").first()
+        created = self.v1.Story.create_many(
+            [{"Name": "Bulk %d" % i, "Scope": scope} for i in range(15)]
+        )
+        self.assertEqual(2, self.server.request_counts["api"])
+        self.assertEqual(["Bulk %d" % i for i in range(15)], [s.Name for s in created])
+        self.assertEqual(scope, created[3].Scope)
+
+    def test_create_many_reports_the_failures(self):
+        error = self.assertRaises(
+            V1BulkCreateError,
+            self.v1.Story.create_many,
+            [{"Name": "Good"}, {"Name": "Bad", "Unknown": 1}, {"Name": "Good too"}],
+        )
+        self.assertEqual([1], [e.index for e in error.errors])
+        self.assertEqual(
+            ["Good", None, "Good too"],
+            [a and a.Name for a in error.assets],
+        )
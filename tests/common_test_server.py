@@ -1,3 +1,5 @@
+import os
+
 importedOk = True
 
 # Allow for tests that can't don't import this to use this file still
@@ -30,7 +32,24 @@ class PublicTestServerConnection:
             return v1pysdk.V1Meta(
                 address=PublicTestServerConnection.address,
                 instance=PublicTestServerConnection.instance,
-                scheme="https",
+                scheme=PublicTestServerConnection.scheme,
                 username=PublicTestServerConnection.username,
                 password=PublicTestServerConnection.password,
             )
+
+
+# Set V1PYSDK_TEST_SERVER=fake to run the suite against the bundled stand-in server
+# instead of the public test instance, e.g. on machines without network access.
+if importedOk and os.environ.get("V1PYSDK_TEST_SERVER") == "fake":
+    from .fake_server import FakeDataSet, FakeV1Server
+
+    _fake_server = FakeV1Server(
+        FakeDataSet.generate(tasks_per_story=2),
+        instance=PublicTestServerConnection.instance,
+        username=PublicTestServerConnection.username,
+        password=PublicTestServerConnection.password,
+        token=PublicTestServerConnection.token,
+    ).start()
+    PublicTestServerConnection.scheme = "http"
+    PublicTestServerConnection.instance_url = _fake_server.url
+    PublicTestServerConnection.address = _fake_server.url.split("/")[2]
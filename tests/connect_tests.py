@@ -22,7 +22,11 @@ class TestV1Connection(TestCase):
         self.addDetail("username", text_content(username))
 
         server = V1Server(
-            address=address, username=username, password=password, instance=instance
+            address=address,
+            username=username,
+            password=password,
+            instance=instance,
+            scheme=PublicTestServerConnection.scheme,
         )
         # The story names, but limit to only the first result so we don't get inundated with results
         code, body = server.fetch("/rest-1.v1/Data/Story?sel=Name&page=1,0")
@@ -69,6 +73,7 @@ class TestV1Connection(TestCase):
             v1 = V1Meta(
                 address=PublicTestServerConnection.address,
                 instance=PublicTestServerConnection.instance,
+                scheme=PublicTestServerConnection.scheme,
                 username=PublicTestServerConnection.username,
                 password=PublicTestServerConnection.password,
             )
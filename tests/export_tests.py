@@ -0,0 +1,275 @@
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from http.cookiejar import Cookie
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.__main__ import main
+from v1pysdk.bulk import BulkWriter
+from v1pysdk.export import Export, connect, connection_settings, prefetch
+from v1pysdk.instrumentation import Instrumentation
+from v1pysdk.lanes import Lane, RequestLanes
+from v1pysdk.select_profiler import SelectProfiler
+from v1pysdk.timeouts import Hedging
+from .fake_server import FakeDataSet, FakeV1Server
+
+
+def interrupt_after_first_page(asset_type_name, rows, rows_per_second):
+    raise KeyboardInterrupt
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        super(TestExport, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=45, defects=7, owners_per_story=2)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_csv_export_pages_through_everything(self):
+        export = Export(self.v1, "Story", ["Number", "Owners"], page_size=10)
+        result = export.to_file(self.path("stories.csv"))
+        self.assertEqual((45, 5), (result.rows, result.pages))
+        with open(self.path("stories.csv"), newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(45, len(rows))
+        self.assertEqual(["id", "Number", "Owners"], list(rows[0]))
+        self.assertEqual(2, len(rows[0]["Owners"].split(";")))
+        self.assertFalse(os.path.exists(self.path("stories.csv.checkpoint")))
+
+    def test_interrupted_export_resumes_from_checkpoint(self):
+        path = self.path("stories.jsonl")
+
+        def interrupt(asset_type_name, rows, rows_per_second):
+            if rows == 20:
+                raise KeyboardInterrupt
+
+        export = Export(
+            self.v1,
+            "Story",
+            ["Number"],
+            format="jsonl",
+            page_size=10,
+            progress=interrupt,
+        )
+        self.assertRaises(KeyboardInterrupt, export.to_file, path)
+        # a partly written page beyond the checkpoint must be dropped on resume
+        with open(path, "a") as f:
+            f.write('{"id": "partial')
+        self.server.reset_counters()
+
+        result = Export(
+            self.v1, "Story", ["Number"], format="jsonl", page_size=10
+        ).to_file(path, resume=True)
+        self.assertEqual(45, result.rows)
+        self.assertEqual(3, self.server.request_counts["Data"])
+        with open(path) as f:
+            numbers = [json.loads(line)["Number"] for line in f]
+        self.assertEqual(45, len(set(numbers)))
+
+    def test_resume_cuts_non_ascii_output_at_the_checkpoint(self):
+        for record in self.dataset.assets["Story"].values():
+            record["Name"] = "Caf\u00e9 \u2615 " + record["Name"]
+        path = self.path("stories.csv")
+        export = Export(
+            self.v1,
+            "Story",
+            ["Name"],
+            page_size=10,
+            progress=interrupt_after_first_page,
+        )
+        self.assertRaises(KeyboardInterrupt, export.to_file, path)
+        with open(path + ".checkpoint") as f:
+            self.assertEqual(os.path.getsize(path), json.load(f)["bytes"])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("Story:partial,Caf\u00e9")
+        Export(self.v1, "Story", ["Name"], page_size=10).to_file(path, resume=True)
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(45, len(set(row["id"] for row in rows)))
+        self.assertTrue(all(row["Name"].startswith("Caf\u00e9 \u2615") for row in rows))
+
+    def test_command_line_output_follows_sys_stdout(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["--url", self.server.url, "export", "Defect", "--quiet"])
+        self.assertEqual(8, len(output.getvalue().splitlines()))
+
+    def test_resume_refuses_other_settings(self):
+        path = self.path("stories.csv")
+        export = Export(
+            self.v1,
+            "Story",
+            ["Number"],
+            page_size=10,
+            progress=interrupt_after_first_page,
+        )
+        self.assertRaises(KeyboardInterrupt, export.to_file, path)
+        other = Export(self.v1, "Story", ["Name"], page_size=10)
+        self.assertRaises(ValueError, other.to_file, path, resume=True)
+
+    def test_command_line_exports_each_asset_type(self):
+        status = main(
+            [
+                "--url",
+                self.server.url,
+                "export",
+                "Story",
+                "Defect",
+                "--select",
+                "Number,Name",
+                "--where",
+                "Estimate>'2'",
+                "--format",
+                "jsonl",
+                "--output",
+                self.directory,
+                "--quiet",
+            ]
+        )
+        self.assertEqual(0, status)
+        for asset_type_name in ("Story", "Defect"):
+            with open(self.path(asset_type_name + ".jsonl")) as f:
+                rows = [json.loads(line) for line in f]
+            expected = self.v1.asset_class(asset_type_name).filter("Estimate>'2'")
+            self.assertEqual(len(expected), len(rows))
+
+    def test_sharded_export_matches_single_process_output(self):
+        single = Export(self.v1, "Story", ["Number", "Owners"], page_size=4)
+        single.to_file(self.path("single.csv"))
+        sharded = Export(self.v1, "Story", ["Number", "Owners"], page_size=4)
+        result = sharded.to_file(self.path("sharded.csv"), processes=3)
+        self.assertEqual((45, 12, []), (result.rows, result.pages, result.errors))
+        with open(self.path("single.csv")) as a, open(self.path("sharded.csv")) as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_sharded_export_reports_failed_ranges(self):
+        self.server.stop()
+        self.server = FakeV1Server(
+            self.dataset, username="admin", password="admin"
+        ).start()
+        v1 = V1Meta(instance_url=self.server.url, username="admin", password="admin")
+        path = self.path("stories.csv")
+        export = Export(v1, "Story", ["Number"], page_size=5)
+        # the workers connect with the credentials of the server settings
+        v1.server.password = "wrong"
+        result = export.to_file(path, processes=2)
+        self.assertEqual((0, 0), (result.rows, result.next_start))
+        self.assertEqual(
+            [(0, 20), (20, 40), (40, 45)], [error[:2] for error in result.errors]
+        )
+
+        v1.server.password = "admin"
+        result = export.to_file(path, resume=True, processes=2)
+        self.assertEqual((45, []), (result.rows, result.errors))
+        with open(path, newline="") as f:
+            self.assertEqual(45, len(list(csv.DictReader(f))))
+
+    def test_worker_connection_keeps_every_setting(self):
+        v1 = V1Meta(
+            instance_url=self.server.url,
+            username="admin",
+            password="secret",
+            logparent="exporter",
+            loglevel=logging.DEBUG,
+            use_oauth_path=True,
+            instrumentation=Instrumentation(buckets=(0.5, 1.0)),
+            log_body_limit=10,
+            single_flight=False,
+            timeout=7,
+            hedging=Hedging(percentile=90, budget=0.1, delay=0.25, max_workers=2),
+            preemptive_auth=False,
+            cookie_file=self.path("cookies.txt"),
+            lanes=RequestLanes(3, [Lane("a", 1), Lane("b", weight=2)], default="b"),
+            response_format="json",
+            select_profiler=SelectProfiler(mode="warn", threshold=4, learn=False),
+            bulk_writer=BulkWriter(batch_size=5),
+        )
+        v1.server.cookie_jar.set_cookie(
+            Cookie(
+                0,
+                "session",
+                "abc",
+                None,
+                False,
+                "127.0.0.1",
+                False,
+                False,
+                "/",
+                False,
+                False,
+                None,
+                False,
+                None,
+                None,
+                {},
+            )
+        )
+        # what a worker process gets
+        worker = connect(pickle.loads(pickle.dumps(connection_settings(v1))))
+        server = worker.server
+        self.assertEqual(
+            (self.server.url, "admin", "secret", "exporter", logging.DEBUG),
+            (
+                server.instance_url,
+                server.username,
+                server.password,
+                server.logparent,
+                server.logger.level,
+            ),
+        )
+        self.assertEqual(
+            ("rest-1.oauth.v1", 10, None, 7, False, self.path("cookies.txt")),
+            (
+                server.rest_api_path,
+                server.log_body_limit,
+                server.single_flight,
+                server.timeout,
+                server.preemptive_auth,
+                server.cookie_file,
+            ),
+        )
+        self.assertEqual((0.5, 1.0), server.instrumentation.buckets)
+        hedging = server.hedging
+        self.assertEqual(
+            (90, 0.1, 0.25, 2),
+            (hedging.percentile, hedging.budget, hedging.delay, hedging.max_workers),
+        )
+        lanes = server.lanes
+        self.assertEqual((3, "b"), (lanes.capacity, lanes.default))
+        self.assertEqual(
+            [("a", 1, 1), ("b", 0, 2)],
+            [(lane.name, lane.reserved, lane.weight) for lane in lanes._order],
+        )
+        self.assertEqual(["abc"], [c.value for c in server.cookie_jar])
+        profiler = worker.select_profiler
+        self.assertEqual(
+            ("warn", 4, False), (profiler.mode, profiler.threshold, profiler.learn)
+        )
+        self.assertEqual(5, worker.bulk_writer.batch_size)
+        self.assertEqual("json", worker.response_format)
+
+    def test_prefetch_reraises_and_stops_early(self):
+        def failing():
+            yield 1
+            raise RuntimeError("boom")
+
+        items = prefetch(failing())
+        self.assertEqual(1, next(items))
+        self.assertRaises(RuntimeError, next, items)
+        endless = prefetch(iter(int, 1), depth=1)
+        self.assertEqual(0, next(endless))
+        endless.close()
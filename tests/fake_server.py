@@ -0,0 +1,1496 @@
+"""
+A local stand-in for a VersionOne server, for offline tests and benchmarks.
+
+FakeV1Server serves the rest-1.v1 (Data and Hist), query.v1, api/asset, meta.v1 and
+attachment.v1 endpoints from an in-memory FakeDataSet of synthetic assets.  It understands
+enough of the query syntax for the SDK (sel, where/filter, sort, page, find,
+asof, aggregates and bracket filters in attribute paths) and can inject
+latency and errors, so the client can be measured reproducibly without a
+network connection:
+
+    with FakeV1Server(FakeDataSet.generate(stories=10000), latency=0.005) as server:
+        v1 = V1Meta(instance_url=server.url)
+        print(len(v1.Story.select("Name").page(size=100)))
+
+It can also be run on its own to point other tools at it:
+
+    python -m tests.fake_server --port 8080 --stories 10000
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse, unquote
+from xml.etree import ElementTree
+from xml.etree.ElementTree import Element, SubElement
+
+from v1pysdk.string_utils import split_attribute
+
+BASE_ATTRIBUTES = {
+    "Name": "Text",
+    "Description": "LongText",
+    "AssetState": "State",
+    "AssetType": "AssetType",
+    "CreateDateUTC": "Date",
+    "ChangeDateUTC": "Date",
+}
+
+WORKITEM_OPERATIONS = [
+    "Delete",
+    "QuickClose",
+    "Reactivate",
+    "Inactivate",
+    "QuickSignup",
+]
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+# name of the cookie of the sessions handed out when sessions are enabled
+SESSION_COOKIE = "V1Session"
+
+# AssetState of deleted assets
+DELETED_STATE = "255"
+
+# bytes of a response body written at a time by a server that trickles them
+TRICKLE_SIZE = 1024
+
+# start of the synthetic timeline used for generated assets
+EPOCH = datetime.datetime(2020, 1, 1)
+
+_AND = (";", "&")
+_OR = ("|",)
+_COMPARISON = re.compile(r"^(?P<path>.*?)(?P<op>!=|>=|<=|=|>|<)(?P<values>.*)$", re.S)
+
+
+def format_date(moment):
+    return moment.strftime(DATE_FORMAT)[:-3]
+
+
+def format_number(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _split_top_level(text, separators):
+    """Splits text on any of separators, ignoring the ones inside quotes, [] or ()"""
+    parts = []
+    depth = 0
+    quoted = False
+    last = 0
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == "'":
+            if quoted and text.startswith("'", i + 1):
+                i += 1  # escaped quote
+            else:
+                quoted = not quoted
+        elif not quoted and c in "[(":
+            depth += 1
+        elif not quoted and c in "])":
+            depth -= 1
+        elif not quoted and depth == 0 and c in separators:
+            parts.append(text[last:i])
+            last = i + 1
+        i += 1
+    parts.append(text[last:])
+    return parts
+
+
+def _parse_literals(text):
+    """Parses "'a','b'" into ["a", "b"]"""
+    values = []
+    for literal in _split_top_level(text.strip(), (",",)):
+        literal = literal.strip()
+        if literal.startswith("'") and literal.endswith("'") and len(literal) > 1:
+            literal = literal[1:-1].replace("''", "'")
+        elif literal.startswith('"') and literal.endswith('"') and len(literal) > 1:
+            literal = literal[1:-1].replace('""', '"')
+        values.append(literal)
+    return values
+
+
+def _parse_part(part):
+    """Splits one attribute path step like Workitems:Story[Status.Name='Done'] into its pieces"""
+    condition = None
+    if part.endswith("]") and "[" in part:
+        start = part.index("[")
+        condition = part[start:][1:-1]
+        part = part[:start]
+    downcast = None
+    if ":" in part:
+        part, downcast = part.split(":", 1)
+    return part, downcast, condition
+
+
+# aggregations of the numbers and of the dates among values
+_NUMBER_AGGREGATES = {"@Sum": sum, "@Max": max, "@Min": min}
+_DATE_AGGREGATES = {"@MaxDate": max, "@MinDate": min}
+
+
+def _numbers(values):
+    """The values that are numbers, as floats"""
+    numbers = []
+    for value in values:
+        try:
+            numbers.append(float(value))
+        except (TypeError, ValueError):
+            pass
+    return numbers
+
+
+def _created(n):
+    """Creation date of the n-th generated asset"""
+    return EPOCH + datetime.timedelta(minutes=n)
+
+
+def _value_text(node):
+    return node.text
+
+
+def _asset_idref(node):
+    return ":".join(node.get("idref").split(":")[:2])
+
+
+def _pick(rnd, ids, type_name, n=1):
+    """n random idrefs of type_name among ids"""
+    return ["%s:%d" % (type_name, i) for i in rnd.sample(ids, min(n, len(ids)))]
+
+
+def _compare(left, op, right):
+    if left is None:
+        left = ""
+    try:
+        left_key, right_key = float(left), float(right)
+    except (TypeError, ValueError):
+        left_key, right_key = str(left), str(right)
+    if op == "=":
+        return left_key == right_key
+    if op == "!=":
+        return left_key != right_key
+    if op == ">":
+        return left_key > right_key
+    if op == "<":
+        return left_key < right_key
+    if op == ">=":
+        return left_key >= right_key
+    return left_key <= right_key
+
+
+class FakeDataSet(object):
+    """In-memory asset types and assets served by FakeV1Server.
+
+    Asset types are declared with add_type(), assets with add_asset(), or a whole
+    synthetic instance with generate().  Every type gets the BASE_ATTRIBUTES.
+    Relations are declared as {name: (target type, is multivalue)} and reverse
+    relations, computed from the relations of other types, as
+    {name: ((source types...), relation name)}.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.assets = defaultdict(dict)
+        self.history = defaultdict(list)
+        self.blobs = {}
+        self.moment = 0
+        self.next_oid = 1000
+        self.lock = threading.RLock()
+        self._reverse_index = None
+
+    def add_type(
+        self,
+        name,
+        attributes=None,
+        relations=None,
+        reverse_relations=None,
+        operations=None,
+        multi_value=(),
+    ):
+        """:param multi_value: names of the attributes holding a list of values"""
+        attrs = dict(BASE_ATTRIBUTES)
+        attrs.update(attributes or {})
+        for attribute in multi_value:
+            attrs.setdefault(attribute, "Text")
+        self.types[name] = {
+            "attributes": attrs,
+            "relations": dict(relations or {}),
+            "reverse": dict(reverse_relations or {}),
+            "operations": list(operations or ["Delete"]),
+            "multi_value": frozenset(multi_value),
+        }
+        self.assets[name]
+        return self
+
+    def add_asset(self, asset_type, oid=None, changed=None, **values):
+        """Adds an asset and returns its oid.  Relation values are idrefs or lists of idrefs."""
+        with self.lock:
+            if oid is None:
+                oid = self.next_oid
+            self.next_oid = max(self.next_oid, int(oid) + 1)
+            self.moment += 1
+            changed = changed or datetime.datetime.utcnow()
+            record = {
+                "_type": asset_type,
+                "_oid": int(oid),
+                "_moment": self.moment,
+                "AssetType": asset_type,
+                "AssetState": "64",
+                "CreateDateUTC": format_date(changed),
+                "ChangeDateUTC": format_date(changed),
+            }
+            spec = self.types[asset_type]
+            for name, attributetype in spec["attributes"].items():
+                if attributetype == "Boolean":
+                    record[name] = "false"
+            for relname, (target, multi) in spec["relations"].items():
+                record[relname] = []
+            for name in spec["multi_value"]:
+                record[name] = []
+            for key, value in values.items():
+                if key in spec["relations"] or key in spec["multi_value"]:
+                    if value is None:
+                        value = []
+                    elif not isinstance(value, (list, tuple)):
+                        value = [value]
+                    record[key] = [str(v) for v in value]
+                else:
+                    record[key] = None if value is None else str(value)
+            self.assets[asset_type][int(oid)] = record
+            self._reverse_index = None
+            return int(oid)
+
+    @classmethod
+    def generate(
+        cls,
+        stories=100,
+        defects=0,
+        tasks_per_story=0,
+        members=10,
+        scopes=3,
+        epics=5,
+        timeboxes=4,
+        owners_per_story=1,
+        attachments=0,
+        attachment_size=1024,
+        seed=0,
+    ):
+        """Builds a deterministic synthetic instance.  owners_per_story and tasks_per_story
+        control the relation fan-out of the generated workitems."""
+        rnd = random.Random(seed)
+        data = cls()
+        data._add_generated_types()
+        counter = iter(range(10**9))
+        member_ids = [
+            data.add_asset(
+                "Member",
+                changed=_created(next(counter)),
+                Name="Member %d" % i,
+                Username="member%d" % i,
+                Email="member%d@example.com" % i,
+            )
+            for i in range(members)
+        ]
+        scope_ids = []
+        for i in range(scopes):
+            parent = "Scope:%d" % scope_ids[0] if scope_ids else None
+            scope_ids.append(
+                data.add_asset(
+                    "Scope",
+                    changed=_created(next(counter)),
+                    Name="Scope %d" % i,
+                    Parent=parent,
+                )
+            )
+        epic_ids = [
+            data.add_asset(
+                "Epic",
+                changed=_created(next(counter)),
+                Name="Epic %d" % i,
+                Number="E-%05d" % (i + 1),
+                Scope="Scope:%d" % scope_ids[i % scopes] if scopes else None,
+            )
+            for i in range(epics)
+        ]
+        timebox_ids = []
+        for i in range(timeboxes):
+            begin = EPOCH + datetime.timedelta(days=14 * i)
+            timebox_ids.append(
+                data.add_asset(
+                    "Timebox",
+                    changed=_created(next(counter)),
+                    Name="Sprint %d" % (i + 1),
+                    BeginDate=begin.strftime("%Y-%m-%d"),
+                    EndDate=(begin + datetime.timedelta(days=13)).strftime("%Y-%m-%d"),
+                )
+            )
+        story_ids = data._generate_workitems(
+            rnd,
+            counter,
+            (stories, defects, tasks_per_story, owners_per_story),
+            (member_ids, scope_ids, epic_ids, timebox_ids),
+        )
+        for i in range(attachments):
+            oid = data.add_asset(
+                "Attachment",
+                changed=_created(next(counter)),
+                Name="Attachment %d" % i,
+                Filename="file%d.bin" % i,
+                ContentType="application/octet-stream",
+                Asset=_pick(rnd, story_ids, "Story"),
+            )
+            data.blobs[str(oid)] = bytes(
+                rnd.getrandbits(8) for _ in range(attachment_size)
+            )
+        for type_name in sorted(data.types):
+            data.add_asset("AssetType", changed=EPOCH, Name=type_name)
+        return data
+
+    def _add_generated_types(self):
+        """The asset types of generate()"""
+        workitem_relations = {
+            "Scope": ("Scope", False),
+            "Super": ("Epic", False),
+            "Timebox": ("Timebox", False),
+            "Owners": ("Member", True),
+        }
+        workitem_attributes = {
+            "Number": "Text",
+            "Estimate": "Numeric",
+            "DetailEstimate": "Numeric",
+            "ToDo": "Numeric",
+            "Reference": "Text",
+            "IsClosed": "Boolean",
+        }
+        self.add_type(
+            "Member",
+            attributes={"Username": "Text", "Email": "Text"},
+            reverse_relations={
+                "OwnedWorkitems": (("Story", "Defect", "Task"), "Owners")
+            },
+        )
+        self.add_type(
+            "Scope",
+            relations={"Parent": ("Scope", False)},
+            reverse_relations={"Workitems": (("Story", "Defect", "Task"), "Scope")},
+        )
+        self.add_type(
+            "Epic",
+            attributes={"Number": "Text"},
+            relations={"Scope": ("Scope", False)},
+            reverse_relations={"Subs": (("Story", "Defect"), "Super")},
+        )
+        self.add_type(
+            "Timebox",
+            attributes={"BeginDate": "Date", "EndDate": "Date"},
+            reverse_relations={"Workitems": (("Story", "Defect", "Task"), "Timebox")},
+        )
+        for workitem in ("Story", "Defect"):
+            self.add_type(
+                workitem,
+                attributes=workitem_attributes,
+                relations=workitem_relations,
+                reverse_relations={"Children": (("Task",), "Parent")},
+                operations=WORKITEM_OPERATIONS,
+            )
+        self.add_type(
+            "Task",
+            attributes=workitem_attributes,
+            relations={
+                "Parent": ("Story", False),
+                "Scope": ("Scope", False),
+                "Timebox": ("Timebox", False),
+                "Owners": ("Member", True),
+            },
+            operations=WORKITEM_OPERATIONS,
+        )
+        self.add_type(
+            "Attachment",
+            attributes={"Filename": "Text", "ContentType": "Text", "Content": "Blob"},
+            relations={"Asset": ("Story", False)},
+        )
+        self.add_type("AssetType")
+
+    def _generate_workitems(self, rnd, counter, counts, related):
+        """Adds the stories, defects and tasks of generate(), returns the story oids"""
+        stories, defects, tasks_per_story, owners_per_story = counts
+        member_ids, scope_ids, epic_ids, timebox_ids = related
+        story_ids = []
+        for workitem, count, prefix in (
+            ("Story", stories, "S"),
+            ("Defect", defects, "D"),
+        ):
+            for i in range(count):
+                oid = self.add_asset(
+                    workitem,
+                    changed=_created(next(counter)),
+                    Name="%s %d" % (workitem, i),
+                    Number="%s-%05d" % (prefix, i + 1),
+                    Estimate=rnd.choice((1, 2, 3, 5, 8, 13)),
+                    DetailEstimate=rnd.randint(1, 40),
+                    ToDo=rnd.randint(0, 20),
+                    IsClosed="false",
+                    Scope=_pick(rnd, scope_ids, "Scope"),
+                    Super=_pick(rnd, epic_ids, "Epic"),
+                    Timebox=_pick(rnd, timebox_ids, "Timebox"),
+                    Owners=_pick(rnd, member_ids, "Member", owners_per_story),
+                )
+                if workitem == "Story":
+                    story_ids.append(oid)
+        for story in story_ids:
+            for i in range(tasks_per_story):
+                self.add_asset(
+                    "Task",
+                    changed=_created(next(counter)),
+                    Name="Task %d of %d" % (i, story),
+                    Number="TK-%05d" % next(counter),
+                    DetailEstimate=rnd.randint(1, 8),
+                    ToDo=rnd.randint(0, 8),
+                    IsClosed="false",
+                    Parent="Story:%d" % story,
+                    Owners=_pick(rnd, member_ids, "Member"),
+                )
+        return story_ids
+
+    # -- reading
+
+    def get(self, idref):
+        parts = idref.split(":")
+        try:
+            return self.assets[parts[0]][int(parts[1])]
+        except (KeyError, IndexError, ValueError):
+            return None
+
+    def _reverse(self):
+        with self.lock:
+            if self._reverse_index is None:
+                index = defaultdict(list)
+                for type_name, spec in self.types.items():
+                    for relname in spec["relations"]:
+                        for record in self.assets[type_name].values():
+                            for idref in record.get(relname) or ():
+                                index[(type_name, relname, idref)].append(
+                                    "%s:%d" % (type_name, record["_oid"])
+                                )
+                self._reverse_index = index
+            return self._reverse_index
+
+    def relation_idrefs(self, record, relname):
+        spec = self.types[record["_type"]]
+        if relname in spec["relations"]:
+            return list(record.get(relname) or ())
+        sources, source_relation = spec["reverse"][relname]
+        idref = "%s:%d" % (record["_type"], record["_oid"])
+        index = self._reverse()
+        found = []
+        for source in sources:
+            found.extend(index.get((source, source_relation, idref), ()))
+        return found
+
+    def is_relation(self, type_name, name):
+        spec = self.types.get(type_name)
+        return spec is not None and (
+            name in spec["relations"] or name in spec["reverse"]
+        )
+
+    def is_multivalue(self, type_name, name):
+        spec = self.types[type_name]
+        if name in spec["relations"]:
+            return spec["relations"][name][1]
+        return name in spec["reverse"] or name in spec["multi_value"]
+
+    def resolve(self, record, path):
+        """Evaluates an attribute path from record.  Returns (values, kind) where kind is
+        "relation" (values are idrefs), "attribute" or "aggregate", and values is a list.
+        """
+        current = [record]
+        kind = "attribute"
+        for part in split_attribute(path):
+            name, downcast, condition = _parse_part(part)
+            if name.startswith("@"):
+                return [self.aggregate(name, current, kind)], "aggregate"
+            found = []
+            kind = "attribute"
+            for item in current:
+                if not isinstance(item, dict):
+                    continue
+                if self.is_relation(item["_type"], name):
+                    kind = "relation"
+                    found.extend(self._related(item, name, downcast, condition))
+                elif name == "ID":
+                    found.append("%s:%d" % (item["_type"], item["_oid"]))
+                elif name == "Moment":
+                    found.append(str(item["_moment"]))
+                elif self.is_multivalue(item["_type"], name):
+                    found.extend(item.get(name) or ())
+                else:
+                    found.append(item.get(name))
+            current = found
+        if kind == "relation":
+            return ["%s:%d" % (r["_type"], r["_oid"]) for r in current], kind
+        return current, kind
+
+    def _related(self, record, relname, downcast=None, condition=None):
+        """The records related to record by relname, of type downcast and matching
+        condition when given"""
+        related = []
+        for idref in self.relation_idrefs(record, relname):
+            target = self.get(idref)
+            if target is None:
+                continue
+            if downcast and target["_type"] != downcast:
+                continue
+            if condition and not self.matches(target, condition):
+                continue
+            related.append(target)
+        return related
+
+    def aggregate(self, name, items, kind):
+        if name == "@Count":
+            return str(len(items))
+        if name == "@DistinctCount":
+            return str(len(set(map(str, items))))
+        if name in _DATE_AGGREGATES:
+            return _DATE_AGGREGATES[name]((i for i in items if i), default=None)
+        if name not in _NUMBER_AGGREGATES:
+            raise ValueError("Unknown aggregation " + name)
+        numbers = _numbers(items)
+        return format_number(_NUMBER_AGGREGATES[name](numbers)) if numbers else None
+
+    def matches(self, record, expression):
+        """Evaluates a V1 filter expression (terms joined with ; & or |) against record"""
+        expression = expression.strip()
+        if not expression:
+            return True
+        alternatives = _split_top_level(expression, _OR)
+        if len(alternatives) > 1:
+            return any(self.matches(record, alt) for alt in alternatives)
+        terms = _split_top_level(expression, _AND)
+        if len(terms) > 1:
+            return all(self.matches(record, term) for term in terms)
+        term = terms[0].strip()
+        if term.startswith("(") and term.endswith(")"):
+            return self.matches(record, term[1:-1])
+        match = _COMPARISON.match(term)
+        if not match:
+            # a bare path is true when it leads somewhere
+            values, kind = self.resolve(record, term)
+            return any(v not in (None, "", "0") for v in values)
+        values, kind = self.resolve(record, match.group("path").strip())
+        literals = _parse_literals(match.group("values"))
+        op = match.group("op")
+        if not values:
+            values = [None]
+        if op == "!=":
+            return all(_compare(v, "!=", lit) for v in values for lit in literals)
+        return any(_compare(v, op, lit) for v in values for lit in literals)
+
+    def select(self, type_name, where=None, sort=None, find=None, find_in=None):
+        with self.lock:
+            records = list(self.assets[type_name].values())
+        if where:
+            records = [r for r in records if self.matches(r, where)]
+        if find and find_in:
+            needle = find.lower()
+            fields = [f.strip() for f in find_in.split(",")]
+            records = [
+                r
+                for r in records
+                if any(needle in str(r.get(field) or "").lower() for field in fields)
+            ]
+        for term in reversed([s for s in (sort or "").split(",") if s.strip()]):
+            term = term.strip()
+            descending = term.startswith("-")
+            path = term.lstrip("+-")
+
+            def key(record, path=path):
+                values = self.resolve(record, path)[0]
+                value = values[0] if values else None
+                try:
+                    return (0, float(value), "")
+                except (TypeError, ValueError):
+                    return (1, 0.0, "" if value is None else str(value))
+
+            records.sort(key=key, reverse=descending)
+        return records
+
+    def as_of(self, record, asof):
+        """The version of record that was current at asof, or None if it didn't exist yet"""
+        if asof is None:
+            return record
+        asof = str(asof).replace(" ", "T")
+        versions = self.history.get((record["_type"], record["_oid"]), []) + [record]
+        current = None
+        for version in versions:
+            if version["ChangeDateUTC"] <= asof:
+                current = version
+        return current
+
+    def versions(self, record):
+        return self.history.get((record["_type"], record["_oid"]), []) + [record]
+
+    # -- writing
+
+    def apply_update(self, record, update_doc):
+        """Applies a V1 update document (Attribute/Relation elements) to record"""
+        spec = self.types[record["_type"]]
+        for node in update_doc:
+            name = node.get("name")
+            if node.tag == "Attribute" and name in spec["multi_value"]:
+                record[name] = self._multi_update(record, node, "Value", _value_text)
+            elif node.tag == "Attribute":
+                record[name] = node.text
+            elif node.tag == "Relation":
+                if name not in spec["relations"]:
+                    raise KeyError(name)
+                record[name] = self._multi_update(record, node, "Asset", _asset_idref)
+
+    def _multi_update(self, record, node, tag, value_of):
+        """The new values of a multi-value relation or attribute of record for an update
+        node, whose *tag* children give value_of(child) to add or remove"""
+        current = list(record.get(node.get("name")) or ())
+        if node.get("act") == "set":
+            current = []
+        for child in node.findall(tag):
+            value = value_of(child)
+            if child.get("act") == "remove":
+                if value in current:
+                    current.remove(value)
+            elif value not in current:
+                current.append(value)
+        return current
+
+    def command_changes(self, record, values):
+        """The new values of record for the attributes of an api/asset command.  Relations
+        take an idref, None, a list of idrefs or {"add": [...], "remove": [...]}."""
+        spec = self.types[record["_type"]]
+        changes = {}
+        for name, value in values.items():
+            if name in spec["relations"]:
+                changes[name] = self._relation_change(record, name, value)
+            elif name in spec["multi_value"]:
+                changes[name] = self._values_change(record, name, value)
+            elif name in spec["attributes"]:
+                changes[name] = None if value is None else str(value)
+            else:
+                raise ValueError("Unknown attribute: %s.%s" % (record["_type"], name))
+        return changes
+
+    def _values_change(self, record, name, value):
+        """The new values of multi-value attribute name of record for an api/asset command"""
+        if not isinstance(value, dict):
+            return [str(v) for v in value or ()]
+        current = list(record.get(name) or ())
+        current += [v for v in value.get("add") or () if v not in current]
+        return [v for v in current if v not in (value.get("remove") or ())]
+
+    def _relation_change(self, record, name, value):
+        """The new idrefs of relation name of record for an api/asset command value"""
+        current = list(record.get(name) or ())
+        if isinstance(value, dict):
+            for idref in value.get("add") or ():
+                if idref not in current:
+                    current.append(idref)
+            for idref in value.get("remove") or ():
+                if idref in current:
+                    current.remove(idref)
+        elif value is None:
+            current = []
+        elif isinstance(value, list):
+            current = list(value)
+        else:
+            current = [value]
+        for idref in current:
+            if self.get(idref) is None:
+                raise ValueError("Asset not found: %s" % idref)
+        return [":".join(idref.split(":")[:2]) for idref in current]
+
+    def touch(self, record):
+        """Records the previous version of a record before it is changed"""
+        key = (record["_type"], record["_oid"])
+        self.history[key].append(dict(record))
+        self.moment += 1
+        record["_moment"] = self.moment
+        record["ChangeDateUTC"] = format_date(datetime.datetime.utcnow())
+        self._reverse_index = None
+
+    def execute(self, record, operation):
+        self.touch(record)
+        if operation == "Delete":
+            record["AssetState"] = DELETED_STATE
+        elif operation == "QuickClose":
+            record["AssetState"] = "128"
+            record["IsClosed"] = "true"
+        elif operation in ("Reactivate", "QuickSignup"):
+            record["AssetState"] = "64"
+            record["IsClosed"] = "false"
+        elif operation == "Inactivate":
+            record["AssetState"] = "128"
+
+
+class FakeV1Server(object):
+    """Serves a FakeDataSet over HTTP the way a VersionOne instance does.
+
+    :param dataset: FakeDataSet to serve, FakeDataSet.generate() by default
+    :param host: interface to listen on
+    :param port: port to listen on, 0 picks a free one
+    :param instance: instance path, the SDK's instance_url is server.url
+    :param latency: seconds added to every response, or a callable returning them
+    :param error_rate: probability of answering a request with error_status instead
+    :param error_status: HTTP status used for injected errors
+    :param username: when set with password, Basic credentials are required
+    :param password: see username
+    :param token: when set, "Authorization: Bearer <token>" is accepted as well
+    :param sessions: when set, authorized requests get a session cookie, which is then
+                     accepted instead of the credentials
+    :param seed: seed for the error injection
+    :param trickle: seconds slept between the TRICKLE_SIZE byte parts of a response body
+    """
+
+    def __init__(
+        self,
+        dataset=None,
+        host="127.0.0.1",
+        port=0,
+        instance="VersionOne",
+        latency=0.0,
+        error_rate=0.0,
+        error_status=500,
+        username=None,
+        password=None,
+        token=None,
+        sessions=False,
+        seed=0,
+        trickle=0.0,
+    ):
+        self.dataset = dataset if dataset is not None else FakeDataSet.generate()
+        self.instance = instance.strip("/")
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.username = username
+        self.password = password
+        self.token = token
+        self.sessions = sessions
+        self.trickle = trickle
+        self._session_ids = set()
+        self.request_log = []
+        self.request_counts = Counter()
+        self._random = random.Random(seed)
+        self._fail_next = []
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _FakeV1RequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://%s:%d/%s" % (host, port, self.instance)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}
+            )
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def fail_next(self, count=1, status=500):
+        """Makes the next *count* requests fail with *status*"""
+        with self._lock:
+            self._fail_next.extend([status] * count)
+
+    def reset_counters(self):
+        with self._lock:
+            self.request_log = []
+            self.request_counts = Counter()
+
+    def record(self, method, endpoint, path):
+        with self._lock:
+            self.request_log.append((method, path))
+            self.request_counts[endpoint] += 1
+            if self._fail_next:
+                return self._fail_next.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status
+        return None
+
+    def delay(self):
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+    def session_id(self, cookie_header):
+        """The known session id sent in a Cookie header, if any"""
+        if not self.sessions or not cookie_header:
+            return None
+        for cookie in cookie_header.split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name == SESSION_COOKIE and value in self._session_ids:
+                return value
+        return None
+
+    def new_session(self):
+        """Set-Cookie header of a new session"""
+        with self._lock:
+            session_id = "%032x" % self._random.getrandbits(128)
+            self._session_ids.add(session_id)
+        return ("Set-Cookie", "%s=%s; Path=/; HttpOnly" % (SESSION_COOKIE, session_id))
+
+    def authorized(self, header, cookie_header=None):
+        if not self.username and not self.token:
+            return True
+        if self.session_id(cookie_header):
+            return True
+        if not header:
+            return False
+        scheme, _, value = header.partition(" ")
+        if scheme == "Bearer":
+            return bool(self.token) and value == self.token
+        if scheme == "Basic" and self.username:
+            expected = "%s:%s" % (self.username, self.password or "")
+            try:
+                return base64.b64decode(value).decode("utf-8") == expected
+            except ValueError:
+                return False
+        return False
+
+    # -- documents
+
+    def asset_href(self, record, with_moment=False):
+        href = "/%s/rest-1.v1/Data/%s/%d" % (
+            self.instance,
+            record["_type"],
+            record["_oid"],
+        )
+        if with_moment:
+            href += "/%d" % record["_moment"]
+        return href
+
+    def asset_element(self, record, select=None, with_moment=False):
+        data = self.dataset
+        oid_token = "%s:%d" % (record["_type"], record["_oid"])
+        if with_moment:
+            oid_token += ":%d" % record["_moment"]
+        asset = Element(
+            "Asset",
+            href=self.asset_href(record, with_moment),
+            id=oid_token,
+        )
+        if select is None:
+            spec = data.types[record["_type"]]
+            select = list(spec["attributes"]) + list(spec["relations"])
+        for term in select:
+            values, kind = data.resolve(record, term)
+            if kind == "relation":
+                node = SubElement(asset, "Relation", name=term)
+                for idref in values:
+                    SubElement(
+                        node,
+                        "Asset",
+                        href="/%s/rest-1.v1/Data/%s"
+                        % (self.instance, idref.replace(":", "/")),
+                        idref=idref,
+                    )
+                continue
+            node = SubElement(asset, "Attribute", name=term)
+            if kind == "attribute" and self.through_multivalue(record, term):
+                for value in values:
+                    SubElement(node, "Value").text = value
+            else:
+                node.text = values[0] if values else None
+        return asset
+
+    def through_multivalue(self, record, term):
+        """True when an attribute path goes through a multi-value relation of record"""
+        return self.type_through_multivalue(record["_type"], term)
+
+    def type_through_multivalue(self, type_name, term):
+        parts = split_attribute(term)
+        head = _parse_part(parts[0])[0]
+        data = self.dataset
+        if len(parts) < 2:
+            return not data.is_relation(type_name, head) and data.is_multivalue(
+                type_name, head
+            )
+        return data.is_relation(type_name, head) and data.is_multivalue(type_name, head)
+
+    def rest_json(self, node, type_name=None):
+        """The rest-1.v1 JSON document of an XML document of this server: Attributes and
+        Relations become the "Attributes" object of their asset, keyed by name, with numbers
+        and booleans as JSON values and single relations as a related asset or null"""
+        if node.tag == "Assets":
+            document = dict((key, int(value)) for key, value in node.attrib.items())
+            document["_type"] = "Assets"
+            document["Assets"] = [self.rest_json(asset) for asset in node]
+            return document
+        if node.tag == "History":
+            return {
+                "_type": "History",
+                "History": [self.rest_json(asset) for asset in node],
+            }
+        if node.tag == "Error":
+            return {"_type": "Error", "message": node.findtext("Message")}
+        if node.tag == "Asset":
+            type_name = node.get("id").split(":")[0]
+            return {
+                "_type": "Asset",
+                "href": node.get("href"),
+                "id": node.get("id"),
+                "Attributes": dict(
+                    (child.get("name"), self.rest_json_value(child, type_name))
+                    for child in node
+                ),
+            }
+        return self.rest_json_value(node, type_name)
+
+    def rest_json_value(self, node, type_name):
+        """The rest-1.v1 JSON object of an Attribute or Relation element of an asset of
+        type_name"""
+        data = self.dataset
+        name = node.get("name")
+        parts = split_attribute(name)
+        if node.tag == "Relation":
+            items = [
+                {
+                    "_type": "Relation",
+                    "href": item.get("href"),
+                    "idref": item.get("idref"),
+                }
+                for item in node
+            ]
+            value = items
+            if len(parts) == 1 and not data.is_multivalue(
+                type_name, _parse_part(parts[0])[0]
+            ):
+                value = items[0] if items else None
+            return {"_type": "Relation", "name": name, "value": value}
+        if parts[-1].startswith("@"):
+            # aggregates are single values, numbers but for the dates
+            value = node.text
+            if value is not None and not parts[-1].endswith("Date"):
+                value = float(value)
+        elif self.type_through_multivalue(type_name, name):
+            value = [item.text for item in node.findall("Value")]
+        else:
+            attributetype = data.types[type_name]["attributes"].get(name)
+            value = _json_scalar(node.text, attributetype)
+        return {"_type": "Attribute", "name": name, "value": value}
+
+    def query_v1_object(self, record, select=None, with_moment=False):
+        """The query.v1 JSON object of a record"""
+        data = self.dataset
+        oid_token = "%s:%d" % (record["_type"], record["_oid"])
+        if with_moment:
+            oid_token += ":%d" % record["_moment"]
+        result = {"_oid": oid_token}
+        if select is None:
+            spec = data.types[record["_type"]]
+            select = list(spec["attributes"]) + list(spec["relations"])
+        for term in select:
+            values, kind = data.resolve(record, term)
+            if kind == "relation":
+                items = [{"_oid": idref} for idref in values]
+                parts = split_attribute(term)
+                single = len(parts) == 1 and not data.is_multivalue(
+                    record["_type"], _parse_part(parts[0])[0]
+                )
+                if single:
+                    result[term] = items[0] if items else None
+                else:
+                    result[term] = items
+            elif kind == "attribute" and self.through_multivalue(record, term):
+                result[term] = values
+            else:
+                result[term] = values[0] if values else None
+        return result
+
+    def query_v1_results(self, query):
+        """Results of one query.v1 query (a dict)"""
+        data = self.dataset
+        type_name = query["from"]
+        if type_name not in data.types:
+            raise KeyError("Unknown AssetType: " + type_name)
+        terms = [
+            "%s='%s'" % (name, str(value).replace("'", "''"))
+            for name, value in (query.get("where") or {}).items()
+        ]
+        filters = query.get("filter") or []
+        terms.extend([filters] if isinstance(filters, str) else filters)
+        sort = query.get("sort") or []
+        sort = [sort] if isinstance(sort, str) else sort
+        find_in = query.get("findIn") or query.get("findin")
+        if isinstance(find_in, list):
+            find_in = ",".join(find_in)
+        records = data.select(
+            type_name,
+            where=";".join(terms),
+            sort=",".join(sort),
+            find=query.get("find"),
+            find_in=find_in,
+        )
+        asof = query.get("asof")
+        if asof:
+            records = [data.as_of(r, asof) for r in records]
+            records = [r for r in records if r is not None]
+        page = query.get("page")
+        if page:
+            start = int(page.get("start") or 0)
+            end = start + int(page["size"])
+            records = records[start:end]
+        select = query.get("select")
+        if isinstance(select, str):
+            select = [select]
+        return [self.query_v1_object(r, select, bool(asof)) for r in records]
+
+    def assets_document(self, records, select, page, with_moment=False):
+        total = len(records)
+        size, start = 2147483647, 0
+        if page:
+            pieces = page.split(",")
+            size = int(pieces[0])
+            if len(pieces) > 1 and pieces[1]:
+                start = int(pieces[1])
+        root = Element(
+            "Assets", total=str(total), pageSize=str(size), pageStart=str(start)
+        )
+        end = start + size
+        for record in records[start:end]:
+            root.append(self.asset_element(record, select, with_moment))
+        return root
+
+    def error_document(self, message):
+        root = Element("Error", href="/%s" % self.instance)
+        SubElement(root, "Message").text = message
+        return root
+
+    def meta_document(self, type_name):
+        spec = self.dataset.types[type_name]
+        root = Element("AssetType", name=type_name, token=type_name)
+        for name, attributetype in spec["attributes"].items():
+            SubElement(
+                root,
+                "AttributeDefinition",
+                name=name,
+                token="%s.%s" % (type_name, name),
+                attributetype=attributetype,
+                ismultivalue=str(name in spec["multi_value"]),
+                isreadonly=str(name in BASE_ATTRIBUTES and name != "Name"),
+                isrequired=str(name == "Name"),
+            )
+        relations = [(n, t, m) for n, (t, m) in spec["relations"].items()]
+        relations += [(n, s[0], True) for n, (s, r) in spec["reverse"].items()]
+        for name, target, multi in relations:
+            node = SubElement(
+                root,
+                "AttributeDefinition",
+                name=name,
+                token="%s.%s" % (type_name, name),
+                attributetype="Relation",
+                ismultivalue=str(bool(multi)),
+                isreadonly="False",
+                isrequired="False",
+            )
+            SubElement(node, "RelatedAsset", nameref=target)
+        for operation in spec["operations"]:
+            SubElement(
+                root,
+                "Operation",
+                name=operation,
+                token="%s.%s" % (type_name, operation),
+            )
+        return root
+
+    # -- request handling
+
+    def handle(self, method, path, params, body, accept=None):
+        """Returns (status, content type, body bytes) for a request.  rest-1.v1 answers in
+        JSON when *accept* (the Accept header) asks for it."""
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        if parts and parts[0] == self.instance:
+            parts = parts[1:]
+        if not parts:
+            return 404, "text/plain", b"Not found"
+        endpoint = parts[0]
+        try:
+            return self.route(method, parts, params, body, accept)
+        except ElementTree.ParseError as e:
+            return self.xml(400, self.error_document("Invalid XML: %s" % e))
+        except (KeyError, ValueError) as e:
+            if endpoint in ("query.v1", "api"):
+                return self.json(400, {"error": "Invalid request: %s" % e})
+            return self.xml(400, self.error_document("Invalid request: %s" % e))
+
+    def route(self, method, parts, params, body, accept=None):
+        """handle() of the path parts of a request, past the instance"""
+        endpoint = parts[0]
+        if endpoint == "meta.v1" and len(parts) == 2:
+            if parts[1] not in self.dataset.types:
+                return self.xml(
+                    404, self.error_document("Unknown AssetType: " + parts[1])
+                )
+            return self.xml(200, self.meta_document(parts[1]))
+        if endpoint == "attachment.v1" and len(parts) == 2:
+            return self.handle_attachment(method, parts[1], body)
+        if endpoint == "query.v1" and len(parts) == 1 and method == "POST":
+            payload = json.loads(body.decode("utf-8"))
+            queries = payload if isinstance(payload, list) else [payload]
+            return self.json(200, [self.query_v1_results(q) for q in queries])
+        if parts == ["api", "asset"] and method == "POST":
+            return self.handle_bulk(body)
+        if endpoint in ("rest-1.v1", "rest-1.oauth.v1") and len(parts) >= 3:
+            render = self.xml
+            if accept and "application/json" in accept:
+                render = self.rest_json_renderer(parts[2])
+            return self.handle_rest(method, parts[1], parts[2:], params, body, render)
+        return 404, "text/plain", b"Not found"
+
+    def xml(self, status, document):
+        return (
+            status,
+            "text/xml; charset=utf-8",
+            ElementTree.tostring(document, encoding="utf-8"),
+        )
+
+    def json(self, status, document):
+        return (
+            status,
+            "application/json; charset=utf-8",
+            json.dumps(document).encode("utf-8"),
+        )
+
+    def rest_json_renderer(self, type_name):
+        """xml() replacement answering with the rest_json() of the documents of type_name"""
+
+        def render(status, document):
+            return self.json(status, self.rest_json(document, type_name))
+
+        return render
+
+    def handle_attachment(self, method, attachment_id, body):
+        data = self.dataset
+        if method == "POST":
+            with data.lock:
+                data.blobs[attachment_id] = body
+            return 200, "text/plain", b""
+        blob = data.blobs.get(attachment_id)
+        if blob is None:
+            return 404, "text/plain", b"Not found"
+        return 200, "application/octet-stream", blob
+
+    def handle_rest(self, method, api, parts, params, body, render=None):
+        data = self.dataset
+        render = render or self.xml
+        type_name = parts[0]
+        if type_name not in data.types:
+            return render(404, self.error_document("Unknown AssetType: " + type_name))
+        select = params.get("sel")
+        select = [s for s in split_attribute_list(select)] if select else None
+        where = ";".join(
+            term for term in (params.get("where"), params.get("filter")) if term
+        )
+        if len(parts) == 1:
+            if method == "POST":
+                return self.create(type_name, body, render)
+            return self.handle_rest_query(api, type_name, params, select, where, render)
+        record = data.assets[type_name].get(int(parts[1]))
+        if record is None:
+            return render(
+                404,
+                self.error_document("Asset not found: %s:%s" % (type_name, parts[1])),
+            )
+        if method == "POST":
+            return self.handle_rest_post(record, params.get("op"), body, render)
+        return self.handle_rest_asset(api, record, parts, select, render)
+
+    def handle_rest_query(self, api, type_name, params, select, where, render):
+        """The Assets document of a rest-1.v1 query on the Data or Hist api"""
+        data = self.dataset
+        records = data.select(
+            type_name,
+            where=where,
+            sort=params.get("sort"),
+            find=params.get("find"),
+            find_in=params.get("findin"),
+        )
+        if api == "Data" and "AssetState" not in where:
+            # like the real server, deleted assets are only returned when asked for
+            records = [r for r in records if r.get("AssetState") != DELETED_STATE]
+        if api == "Hist":
+            asof = params.get("asof")
+            if asof:
+                records = [data.as_of(r, asof) for r in records]
+                records = [r for r in records if r is not None]
+            else:
+                records = [v for r in records for v in data.versions(r)]
+            return render(
+                200, self.assets_document(records, select, params.get("page"), True)
+            )
+        return render(200, self.assets_document(records, select, params.get("page")))
+
+    def handle_rest_post(self, record, operation, body, render):
+        """Runs an operation on record, or applies the update document of body"""
+        data = self.dataset
+        with data.lock:
+            if operation:
+                if operation not in data.types[record["_type"]]["operations"]:
+                    return render(
+                        400, self.error_document("Unknown operation: " + operation)
+                    )
+                data.execute(record, operation)
+            else:
+                update_doc = ElementTree.fromstring(body)
+                data.touch(record)
+                data.apply_update(record, update_doc)
+        return render(200, self.asset_element(record, [], True))
+
+    def handle_rest_asset(self, api, record, parts, select, render):
+        """The rest-1.v1 document of one asset, of one of its moments or of one of its
+        attributes"""
+        data = self.dataset
+        if len(parts) == 2:
+            if api == "Hist":
+                root = Element("History")
+                for version in data.versions(record):
+                    root.append(self.asset_element(version, select, True))
+                return render(200, root)
+            return render(200, self.asset_element(record, select))
+        rest = parts[2:]
+        if rest[0].isdigit():
+            # a specific moment
+            moment = int(rest[0])
+            versions = [v for v in data.versions(record) if v["_moment"] <= moment]
+            if not versions:
+                return render(404, self.error_document("No such moment"))
+            record = versions[-1]
+            rest = rest[1:]
+            if not rest:
+                return render(200, self.asset_element(record, select, True))
+        element = self.asset_element(record, [rest[0]])[0]
+        return render(200, element)
+
+    def handle_bulk(self, body):
+        """Runs the commands of an api/asset request, each on its own: a failed command is
+        reported and the others are still applied"""
+        payload = json.loads(body.decode("utf-8"))
+        commands = payload if isinstance(payload, list) else [payload]
+        data = self.dataset
+        created, modified, failures = [], [], []
+        with data.lock:
+            for command in commands:
+                try:
+                    if "from" in command:
+                        record = data.get(command["from"])
+                        if record is None:
+                            raise ValueError("Asset not found: %s" % command["from"])
+                        changes = data.command_changes(
+                            record, command.get("update") or {}
+                        )
+                        data.touch(record)
+                        modified.append(record)
+                    else:
+                        values = dict(command)
+                        type_name = values.pop("AssetType")
+                        if type_name not in data.types:
+                            raise ValueError("Unknown AssetType: %s" % type_name)
+                        changes = data.command_changes({"_type": type_name}, values)
+                        record = data.assets[type_name][data.add_asset(type_name)]
+                        created.append(record)
+                    record.update(changes)
+                except (KeyError, ValueError) as e:
+                    failures.append({"command": command, "error": {"message": str(e)}})
+
+        def oid_tokens(records):
+            tokens = ["%s:%d" % (r["_type"], r["_oid"]) for r in records]
+            return {"oidTokens": tokens, "count": len(tokens)}
+
+        return self.json(
+            200,
+            {
+                "complete": True,
+                "processing": False,
+                "assetsCreated": oid_tokens(created),
+                "assetsModified": oid_tokens(modified),
+                "assetsOperatedOn": oid_tokens([]),
+                "commandFailures": {"commands": failures, "count": len(failures)},
+            },
+        )
+
+    def create(self, type_name, body, render=None):
+        data = self.dataset
+        render = render or self.xml
+        update_doc = ElementTree.fromstring(body)
+        with data.lock:
+            oid = data.add_asset(type_name)
+            record = data.assets[type_name][oid]
+            data.apply_update(record, update_doc)
+        return render(200, self.asset_element(record, [], True))
+
+
+def _json_scalar(text, attributetype):
+    """The JSON value of the text of a single value attribute"""
+    if text is not None and attributetype == "Numeric":
+        return float(text)
+    if text is not None and attributetype == "Boolean":
+        return text == "true"
+    return text
+
+
+def split_attribute_list(sel):
+    """Splits a sel parameter on the commas that are not inside [] or quotes"""
+    return [s.strip() for s in _split_top_level(sel, (",",)) if s.strip()]
+
+
+class _FakeV1RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        """The body of the request, None when the client closed the connection before
+        sending all of it"""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                size = int(line.strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return body if len(body) == length else None
+
+    def _respond(self, status, content_type, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            trickle = self.server.fake.trickle
+            try:
+                if not trickle:
+                    self.wfile.write(body)
+                while trickle and body:
+                    part, body = body[:TRICKLE_SIZE], body[TRICKLE_SIZE:]
+                    self.wfile.write(part)
+                    self.wfile.flush()
+                    time.sleep(trickle)
+            except (BrokenPipeError, ConnectionResetError):
+                # the client gave up waiting, e.g. on a timeout
+                self.close_connection = True
+
+    def _handle(self):
+        fake = self.server.fake
+        body = self._read_body() if self.command == "POST" else b""
+        if body is None:
+            self.close_connection = True
+            return
+        parsed = urlparse(self.path)
+        # parameter names are case insensitive for the server (Where, where...)
+        params = dict(
+            (key.lower(), value)
+            for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        )
+        parts = parsed.path.strip("/").split("/")
+        endpoint = parts[1] if len(parts) > 1 else ""
+        if endpoint.startswith("rest-1") and len(parts) > 2:
+            endpoint = parts[2]
+        injected = fake.record(self.command, endpoint, self.path)
+        fake.delay()
+        if injected:
+            self._respond(injected, "text/plain", b"Injected error")
+            return
+        cookie = self.headers.get("Cookie")
+        if not fake.authorized(self.headers.get("Authorization"), cookie):
+            self._respond(
+                401,
+                "text/plain",
+                b"Unauthorized",
+                [("WWW-Authenticate", 'Basic realm="VersionOne"')],
+            )
+            return
+        status, content_type, response = fake.handle(
+            self.command, parsed.path, params, body, self.headers.get("Accept")
+        )
+        headers = []
+        if fake.sessions and not fake.session_id(cookie):
+            headers.append(fake.new_session())
+        self._respond(status, content_type, response, headers)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local VersionOne stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--instance", default="VersionOne")
+    parser.add_argument("--stories", type=int, default=1000)
+    parser.add_argument("--defects", type=int, default=0)
+    parser.add_argument("--tasks-per-story", type=int, default=0)
+    parser.add_argument("--owners-per-story", type=int, default=1)
+    parser.add_argument("--members", type=int, default=10)
+    parser.add_argument("--attachments", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    dataset = FakeDataSet.generate(
+        stories=args.stories,
+        defects=args.defects,
+        tasks_per_story=args.tasks_per_story,
+        owners_per_story=args.owners_per_story,
+        members=args.members,
+        attachments=args.attachments,
+    )
+    server = FakeV1Server(
+        dataset,
+        host=args.host,
+        port=args.port,
+        instance=args.instance,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    print("Serving %s" % server.url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import time
+
+from testtools import TestCase
+
+from urllib.error import HTTPError
+
+from v1pysdk import V1Meta
+from v1pysdk.client import V1Server, V1Error
+from .fake_server import FakeDataSet, FakeV1Server
+
+
+class TestFakeV1Server(TestCase):
+    def setUp(self):
+        super(TestFakeV1Server, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=25, owners_per_story=3, seed=1)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+
+    def test_paging_reports_total_and_page_start(self):
+        page = self.v1.Story.select("Name").sort("Number").page(size=10, start=20)
+        self.assertEqual(5, len(page))
+        self.assertEqual(25, page.max_length())
+        self.assertEqual("Story 20", page.first().Name)
+
+    def test_relation_fan_out(self):
+        story = self.v1.Story.select("Owners.Name").first()
+        self.assertEqual(3, len(story.data["Owners"]))
+
+    def test_where_filter_and_aggregates(self):
+        numbers = ["S-00001", "S-00003"]
+        found = self.v1.Story.select("Number").filter(
+            "Number='S-00001','S-00003';Estimate>'0'"
+        )
+        self.assertEqual(numbers, sorted(found.Number))
+        timebox = self.v1.Timebox.select("Workitems.@Count").first()
+        expected = len(self.v1.Story.where(Timebox=timebox.idref).select("Name"))
+        self.assertEqual(str(expected), timebox.data["Workitems.@Count"])
+
+    def test_create_update_and_history(self):
+        story = self.v1.Story.create(Name="Created", Scope=self.v1.Scope(1010))
+        before = self.dataset.assets["Story"][int(story.intid)]["ChangeDateUTC"]
+        # change dates have a millisecond resolution
+        time.sleep(0.002)
+        story.Name = "Updated"
+        self.v1.commit()
+        self.assertEqual("Updated", story.Name)
+        names = [s.Name for s in self.v1.Story.asof(before).where(ID=story.idref)]
+        self.assertEqual(["Created"], names)
+
+    def test_unknown_asset_is_not_found(self):
+        self.assertRaises(V1Error, lambda: self.v1.Story(1).Name)
+
+    def test_latency_and_error_injection(self):
+        self.server.latency = 0.05
+        t0 = time.time()
+        self.v1.Story.select("Name").page(size=1).first()
+        self.assertTrue(time.time() - t0 >= 0.05)
+        self.server.fail_next(status=503)
+        self.assertRaises(HTTPError, self.v1.Story.select("Name").first)
+        self.assertEqual(2, self.server.request_counts["Data"])
+
+    def test_credentials_are_checked_when_configured(self):
+        self.server.username, self.server.password = "admin", "admin"
+        good = V1Server(
+            instance_url=self.server.url, username="admin", password="admin"
+        )
+        bad = V1Server(instance_url=self.server.url, username="admin", password="x")
+        self.assertEqual("Assets", good.get_xml("/rest-1.v1/Data/Scope").tag)
+        error = self.assertRaises(HTTPError, bad.get_xml, "/rest-1.v1/Data/Scope")
+        self.assertEqual(401, error.code)
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+from testtools import TestCase
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# modules only needed once a request is made or an optional feature is used
+DEFERRED = [
+    "ntlm3",
+    "yaml",
+    "future",
+    "urllib.request",
+    "http.cookiejar",
+    "sqlite3",
+    "unittest",
+    "pprint",
+    "concurrent.futures",
+]
+
+
+class TestImportCost(TestCase):
+    def loaded(self, code):
+        """The DEFERRED modules loaded by *code* in a fresh interpreter"""
+        report = "import sys\nprint(' '.join(m for m in %r if m in sys.modules))"
+        output = subprocess.run(
+            [sys.executable, "-c", code + "\n" + report % (DEFERRED,)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return output.stdout.split()
+
+    def test_import_defers_optional_modules(self):
+        self.assertEqual([], self.loaded("import v1pysdk"))
+
+    def test_creating_a_v1meta_makes_no_opener(self):
+        code = (
+            "from v1pysdk import V1Meta\n"
+            "v1 = V1Meta(instance_url='http://localhost:1', username='u', password='p')"
+        )
+        self.assertEqual([], self.loaded(code))
+
+    def test_lazy_exports_resolve(self):
+        loaded = self.loaded("import v1pysdk\nv1pysdk.V1Poll")
+        self.assertIn("sqlite3", loaded)
@@ -0,0 +1,78 @@
+from urllib.parse import urlparse
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.query import DEFAULT_MAX_QUERY_LENGTH
+
+
+class TestInLists(TestCase):
+    def setUp(self):
+        super(TestInLists, self).setUp()
+        self.server = FakeV1Server(FakeDataSet.generate(stories=300, seed=2)).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        self.numbers = [story.Number for story in self.v1.Story.select("Number")]
+        self.server.reset_counters()
+
+    def query_lengths(self):
+        return [len(urlparse(path).query) for _, path in self.server.request_log]
+
+    def test_short_lists_make_one_request(self):
+        query = self.v1.Story.select("Number").where(Number=self.numbers[:3])
+        self.assertEqual(
+            "Number='%s','%s','%s'" % tuple(self.numbers[:3]), query.get_where_string()
+        )
+        self.assertEqual(self.numbers[:3], [story.Number for story in query])
+        self.assertEqual(1, self.server.request_counts["Data"])
+
+    def test_long_lists_are_split_under_the_url_limit(self):
+        wanted = self.numbers + self.numbers[:10]
+        query = self.v1.Story.select("Number").where(Number=wanted, AssetState="64")
+        found = [story.Number for story in query]
+        self.assertEqual(sorted(self.numbers), sorted(found))
+        self.assertEqual(300, len(query))
+        self.assertTrue(self.server.request_counts["Data"] > 1)
+        self.assertTrue(max(self.query_lengths()) <= DEFAULT_MAX_QUERY_LENGTH)
+
+    def test_split_queries_keep_their_asof_moments(self):
+        ids = ["Story:%s" % story.intid for story in self.v1.Story.select("Number")]
+        self.server.reset_counters()
+        query = (
+            self.v1.Story.select("Number")
+            .where(ID=ids)
+            .asof("2030-01-01", "2040-01-01")
+            .max_query_length(600)
+        )
+        rows = query.timeseries()
+        self.assertEqual(600, len(rows))
+        self.assertEqual(["2030-01-01"] * 300, [asof for asof, _, _ in rows[:300]])
+        self.assertTrue(max(self.query_lengths()) <= 600)
+
+    def test_paged_walks_every_chunk(self):
+        query = self.v1.Story.select("Number").where(Number=self.numbers)
+        found = [story.Number for story in query.max_query_length(500).paged(40)]
+        self.assertEqual(sorted(self.numbers), sorted(found))
+        self.assertTrue(max(self.query_lengths()) <= 500)
+        self.assertRaises(ValueError, list, query.page(size=10))
+
+    def test_split_queries_cannot_be_sorted(self):
+        query = self.v1.Story.select("Number").where(Number=self.numbers)
+        self.assertRaises(ValueError, list, query.sort("-Estimate"))
+        self.assertRaises(ValueError, list, query.paged(40))
+        # a list short enough for one request is sorted by the server
+        query = self.v1.Story.select("Estimate").where(Number=self.numbers[:20])
+        estimates = [float(story.Estimate) for story in query.sort("-Estimate")]
+        self.assertEqual(sorted(estimates, reverse=True), estimates)
+
+    def test_empty_lists_match_nothing(self):
+        self.assertEqual([], list(self.v1.Story.where(Number=[])))
+        self.assertEqual([], list(self.v1.Story.where(Number=[]).backend("query.v1")))
+        self.assertEqual(0, sum(self.server.request_counts.values()))
+
+    def test_query_v1_sends_lists_in_the_body(self):
+        query = self.v1.Story.select("Number").where(Number=self.numbers)
+        found = [story.Number for story in query.backend("query.v1")]
+        self.assertEqual(sorted(self.numbers), sorted(found))
+        self.assertEqual(1, self.server.request_counts["query.v1"])
@@ -0,0 +1,66 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.instrumentation import Instrumentation, endpoint_of
+
+
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        super(TestInstrumentation, self).setUp()
+        self.server = FakeV1Server(FakeDataSet.generate(stories=10)).start()
+        self.addCleanup(self.server.stop)
+        self.instrumentation = Instrumentation()
+        self.v1 = V1Meta(
+            instance_url=self.server.url, instrumentation=self.instrumentation
+        )
+
+    def test_endpoint_names(self):
+        self.assertEqual("Data", endpoint_of("/rest-1.v1/Data/Story/1005"))
+        self.assertEqual("Hist", endpoint_of("/rest-1.oauth.v1/Hist/Story"))
+        self.assertEqual("meta.v1", endpoint_of("/meta.v1/Story"))
+        self.assertEqual("attachment.v1", endpoint_of("/attachment.v1/12"))
+
+    def test_requests_are_recorded_per_endpoint_and_phase(self):
+        records = []
+        self.instrumentation.add_hook("after_request", records.append)
+        list(self.v1.Story.select("Name"))
+        self.assertEqual(["meta.v1", "Data"], [r.endpoint for r in records])
+        data = records[1]
+        self.assertEqual(200, data.status)
+        self.assertTrue(data.bytes > 0)
+        for phase in ("connect", "first_byte", "download", "parse", "total"):
+            self.assertIsNotNone(getattr(data, phase), phase)
+        self.assertTrue(data.total >= data.first_byte + data.download)
+        counters = self.instrumentation.snapshot()["counters"]
+        key = ("v1_requests_total", (("endpoint", "Data"), ("status", 200)))
+        self.assertEqual(1, counters[key])
+
+    def test_unpack_and_commit_hooks(self):
+        unpacked = []
+        commits = []
+        self.instrumentation.add_hook("unpack", lambda t, s: unpacked.append(t))
+        self.instrumentation.add_hook("commit", lambda n, e, s: commits.append((n, e)))
+        stories = list(self.v1.Story.select("Name"))
+        self.assertEqual(["Story"] * 10, unpacked)
+        stories[0].Name = "Changed"
+        self.v1.commit()
+        self.assertEqual([(1, [])], commits)
+
+    def test_error_statuses_are_counted(self):
+        self.server.fail_next(status=500)
+        self.assertRaises(Exception, lambda: list(self.v1.Story.select("Name")))
+        text = self.instrumentation.to_prometheus()
+        self.assertIn('v1_requests_total{endpoint="meta.v1",status="500"} 1', text)
+
+    def test_prometheus_export(self):
+        list(self.v1.Story.select("Name"))
+        text = self.instrumentation.to_prometheus()
+        self.assertIn("# TYPE v1_request_duration_seconds histogram", text)
+        self.assertIn(
+            'v1_request_duration_seconds_count{endpoint="Data",phase="total"} 1', text
+        )
+        self.assertIn(
+            'v1_request_duration_seconds_bucket{endpoint="Data",phase="parse",le="+Inf"} 1',
+            text,
+        )
@@ -0,0 +1,76 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.client import V1AssetNotFoundError
+from .fake_server import FakeDataSet, FakeV1Server
+
+SELECT = ("Number", "Estimate", "Scope", "Scope.Name", "Owners", "Owners.Name")
+
+
+class TestJsonResponses(TestCase):
+    def setUp(self):
+        super(TestJsonResponses, self).setUp()
+        dataset = FakeDataSet.generate(stories=20, owners_per_story=2, seed=7)
+        self.server = FakeV1Server(dataset).start()
+        self.addCleanup(self.server.stop)
+
+    def meta(self, response_format):
+        return V1Meta(instance_url=self.server.url, response_format=response_format)
+
+    def snapshot(self, query):
+        return [
+            (
+                story.idref,
+                story.Number,
+                story.Estimate,
+                story.Scope.idref,
+                story.Scope.Name,
+                [owner.idref for owner in story.Owners],
+                [owner.Name for owner in story.Owners],
+            )
+            for story in query
+        ]
+
+    def test_query_results_match_xml(self):
+        def query(v1):
+            return v1.Story.select(*SELECT).filter("Estimate>'1'").sort("-Estimate")
+
+        expected = self.snapshot(query(self.meta("xml")))
+        found = query(self.meta("json"))
+        self.assertEqual(expected, self.snapshot(found))
+        self.assertEqual(len(expected), len(found))
+        self.assertNotEqual([], expected)
+
+    def test_timeseries_match_xml(self):
+        def timeseries(v1):
+            query = v1.Story.select("Number", "Estimate", "Owners", "Owners.Name")
+            return query.asof("2015-01-01", "2030-01-01").timeseries()
+
+        self.assertEqual(timeseries(self.meta("xml")), timeseries(self.meta("json")))
+
+    def test_assets_and_attributes_are_read_as_json(self):
+        xml, v1 = self.meta("xml"), self.meta("json")
+        idref = xml.Story.select("Number").first().idref
+        oid = idref.split(":")[1]
+        expected = xml.read_asset("Story", oid)
+        found = v1.read_asset("Story", oid)
+        self.assertEqual(sorted(expected), sorted(found))
+        self.assertEqual(expected["Estimate"], found["Estimate"])
+        self.assertEqual(
+            [owner.idref for owner in expected["Owners"]],
+            [owner.idref for owner in found["Owners"]],
+        )
+        self.assertEqual(
+            xml.get_attr("Story", oid, "Scope")[0].idref,
+            v1.get_attr("Story", oid, "Scope")[0].idref,
+        )
+        self.assertEqual(
+            xml.get_attr("Story", oid, "Name"), v1.get_attr("Story", oid, "Name")
+        )
+
+    def test_missing_assets_raise(self):
+        v1 = self.meta("json")
+        self.assertRaises(V1AssetNotFoundError, v1.read_asset, "Story", "999999")
+
+    def test_unknown_format_is_refused(self):
+        self.assertRaises(ValueError, V1Meta, response_format="yaml")
@@ -0,0 +1,158 @@
+import threading
+import time
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.client import V1TimeoutError
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.instrumentation import Instrumentation
+from v1pysdk.lanes import BATCH, INTERACTIVE, Lane, RequestLanes, use_lane
+
+
+class TestRequestLanes(TestCase):
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.002)
+        self.fail("Condition never met")
+
+    def test_reserved_slots_are_kept_for_their_lane(self):
+        lanes = RequestLanes(
+            capacity=3, lanes=[Lane(INTERACTIVE, reserved=1), Lane(BATCH)]
+        )
+        held = [lanes.acquire(BATCH), lanes.acquire(BATCH)]
+        self.assertIsNone(lanes.acquire(BATCH, timeout=0.01))
+        held.append(lanes.acquire(INTERACTIVE, timeout=0))
+        self.assertEqual(INTERACTIVE, held[-1].name)
+        self.assertIsNone(lanes.acquire(INTERACTIVE, timeout=0.01))
+        for lane in held:
+            lanes.release(lane)
+        self.assertEqual(0, lanes.in_flight)
+        self.assertEqual(
+            {"in_flight": 0, "waiting": 0, "started": 2, "queued": 1},
+            lanes.stats()[BATCH],
+        )
+
+    def test_waiting_requests_start_by_weighted_fair_queuing(self):
+        lanes = RequestLanes(
+            capacity=1, lanes=[Lane(INTERACTIVE, weight=3), Lane(BATCH, weight=1)]
+        )
+        holder = lanes.acquire()
+        order = []
+
+        def request(name):
+            lane = lanes.acquire(name)
+            order.append(lane.name)
+            lanes.release(lane)
+
+        threads = [
+            threading.Thread(target=request, args=(name,))
+            for name in [BATCH] * 4 + [INTERACTIVE] * 4
+        ]
+        for thread in threads:
+            thread.start()
+        self.wait_for(lambda: sum(s["waiting"] for s in lanes.stats().values()) == 8)
+        lanes.release(holder)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            ["batch", "interactive", "interactive", "interactive"], order[:4]
+        )
+        self.assertEqual(4, order.count(BATCH))
+
+    def test_lane_of_the_context_is_used(self):
+        lanes = RequestLanes()
+        with use_lane(BATCH):
+            self.assertEqual(BATCH, lanes.acquire().name)
+        self.assertEqual(INTERACTIVE, lanes.acquire().name)
+        with use_lane("unknown"):
+            self.assertEqual(INTERACTIVE, lanes.acquire().name)
+
+    def test_reservations_fit_the_capacity(self):
+        self.assertRaises(
+            ValueError, RequestLanes, capacity=1, lanes=[Lane(INTERACTIVE, reserved=2)]
+        )
+
+
+class TestServerLanes(TestCase):
+    def test_interactive_requests_skip_the_batch_queue(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=1), latency=0.2).start()
+        self.addCleanup(server.stop)
+        lanes = RequestLanes(
+            capacity=2, lanes=[Lane(INTERACTIVE, reserved=1), Lane(BATCH)]
+        )
+        instrumentation = Instrumentation()
+        v1 = V1Meta(
+            instance_url=server.url,
+            lanes=lanes,
+            single_flight=False,
+            instrumentation=instrumentation,
+        )
+
+        def sync():
+            with v1.server.lane(BATCH):
+                v1.server.get_meta_xml("Story")
+
+        threads = [threading.Thread(target=sync) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        self.assertEqual(1, lanes.stats()[BATCH]["in_flight"])
+        t0 = time.perf_counter()
+        v1.server.get_meta_xml("Story")
+        self.assertTrue(time.perf_counter() - t0 < 0.35)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, lanes.stats()[BATCH]["started"])
+        histograms = instrumentation.snapshot()["histograms"]
+        self.assertIn(("v1_lane_wait_seconds", (("lane", BATCH),)), histograms)
+
+    def test_requests_time_out_waiting_for_a_slot(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=1), latency=0.3).start()
+        self.addCleanup(server.stop)
+        lanes = RequestLanes(capacity=1, lanes=[Lane(INTERACTIVE)])
+        v1 = V1Meta(instance_url=server.url, lanes=lanes, single_flight=False)
+        thread = threading.Thread(target=v1.server.get_meta_xml, args=("Story",))
+        thread.start()
+        self.addCleanup(thread.join)
+        time.sleep(0.05)
+        self.assertRaises(
+            V1TimeoutError, v1.server.get_xml, "/meta.v1/Story", timeout=0.05
+        )
+        self.assertRaises(ValueError, v1.server.lane, BATCH)
+
+    def test_identical_gets_are_only_shared_within_a_lane(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=1), latency=0.3).start()
+        self.addCleanup(server.stop)
+        lanes = RequestLanes(capacity=2, lanes=[Lane(INTERACTIVE), Lane(BATCH)])
+        v1 = V1Meta(instance_url=server.url, lanes=lanes)
+
+        def sync():
+            with v1.server.lane(BATCH):
+                v1.server.get_meta_xml("Story")
+
+        thread = threading.Thread(target=sync)
+        thread.start()
+        self.addCleanup(thread.join)
+        time.sleep(0.05)
+        v1.server.get_meta_xml("Story")
+        self.assertEqual(0, v1.server.single_flight.stats()["collapsed"])
+        self.assertEqual(2, server.request_counts["meta.v1"])
+
+    def test_the_wait_for_a_slot_counts_against_the_timeout(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=1), latency=0.3).start()
+        self.addCleanup(server.stop)
+        lanes = RequestLanes(capacity=1, lanes=[Lane(INTERACTIVE)])
+        v1 = V1Meta(instance_url=server.url, lanes=lanes, single_flight=False)
+        thread = threading.Thread(target=v1.server.get_meta_xml, args=("Story",))
+        thread.start()
+        self.addCleanup(thread.join)
+        time.sleep(0.05)
+        t0 = time.perf_counter()
+        # about 0.25s in the queue leaves less than the 0.3s the server takes
+        self.assertRaises(
+            V1TimeoutError, v1.server.get_xml, "/meta.v1/Story", timeout=0.4
+        )
+        self.assertTrue(time.perf_counter() - t0 < 0.5)
@@ -0,0 +1,99 @@
+from testtools import TestCase
+
+from xml.etree.ElementTree import fromstring
+
+from v1pysdk import V1Meta
+from v1pysdk.lazy_relations import LazyRelationList
+
+META_XML = """
+<AssetType name="{0}">
+  <AttributeDefinition name="Name" attributetype="Text" ismultivalue="False" />
+  <AttributeDefinition name="Owners" attributetype="Relation" ismultivalue="True" />
+  <AttributeDefinition name="Scope" attributetype="Relation" ismultivalue="False" />
+</AssetType>
+"""
+
+ASSET_XML = """
+<Asset id="Story:1005">
+  <Attribute name="Name">Lazy story</Attribute>
+  <Relation name="Owners">
+    <Asset idref="Member:20" />
+    <Asset idref="Member:21" />
+    <Asset idref="Member:22:3301" />
+  </Relation>
+  <Relation name="Scope">
+    <Asset idref="Scope:0" />
+  </Relation>
+</Asset>
+"""
+
+
+class TestLazyRelations(TestCase):
+    def setUp(self):
+        super(TestLazyRelations, self).setUp()
+        self.v1 = V1Meta()
+        self.meta_requests = []
+
+        def get_meta_xml(asset_type_name):
+            self.meta_requests.append(asset_type_name)
+            return fromstring(META_XML.format(asset_type_name))
+
+        self.v1.server.get_meta_xml = get_meta_xml
+
+    def test_unpack_does_not_build_related_assets(self):
+        data = self.v1.unpack_asset(fromstring(ASSET_XML))
+        self.assertIsInstance(data["Owners"], LazyRelationList)
+        self.assertEqual(
+            ["Member:20", "Member:21", "Member:22:3301"], data["Owners"].idrefs
+        )
+        self.assertEqual([], self.meta_requests)
+
+    def test_entries_materialize_on_access(self):
+        data = self.v1.unpack_asset(fromstring(ASSET_XML))
+        owners = data["Owners"]
+        self.assertEqual(3, len(owners))
+        self.assertIs(self.v1.Member("20"), owners[0])
+        self.assertIs(self.v1.Member("22"), owners[-1])
+        self.assertIs(owners[0], owners[0])
+        self.assertEqual(["Member"], self.meta_requests)
+        self.assertEqual(
+            [self.v1.Member("20"), self.v1.Member("21"), self.v1.Member("22")], owners
+        )
+
+    def test_out_of_range_raises_index_error(self):
+        empty = LazyRelationList(self.v1, [])
+        self.assertFalse(empty)
+        self.assertRaises(IndexError, lambda: empty[0])
+
+    def test_update_doc_accepts_lazy_relations(self):
+        data = self.v1.unpack_asset(fromstring(ASSET_XML))
+        update_doc = self.v1.generate_update_doc({"Owners": data["Owners"]})
+        idrefs = [a.get("idref") for a in update_doc.find("Relation")]
+        self.assertEqual(["Member:20", "Member:21", "Member:22"], idrefs)
+
+    def test_relations_can_still_be_changed_as_lists(self):
+        data = self.v1.unpack_asset(fromstring(ASSET_XML))
+        owners = data["Owners"]
+        self.assertIsInstance(owners, list)
+        owners.append(self.v1.Member("23"))
+        owners += [self.v1.Member("24")]
+        owners.extend([self.v1.Member("25")])
+        owners.remove(self.v1.Member("20"))
+        self.assertEqual(
+            ["Member:21", "Member:22", "Member:23", "Member:24", "Member:25"],
+            [member.idref for member in owners],
+        )
+        self.assertEqual(
+            ["Member:20", "Member:21", "Member:22:3301"], owners.read_idrefs
+        )
+        self.assertEqual([self.v1.Member("21")], [] + owners[:1])
+
+    def test_update_doc_of_a_list_changed_in_place(self):
+        data = self.v1.unpack_asset(fromstring(ASSET_XML))
+        data["Owners"].append(self.v1.Member("23"))
+        del data["Owners"][0]
+        update_doc = self.v1.generate_update_doc({"Owners": data["Owners"]}, data)
+        self.assertEqual(
+            [("Member:23", "add"), ("Member:20", "remove")],
+            [(a.get("idref"), a.get("act")) for a in update_doc.find("Relation")],
+        )
@@ -0,0 +1,50 @@
+import logging
+
+from email.message import Message
+
+from testtools import TestCase
+
+from v1pysdk.client import V1Server
+
+
+class ExplodingHeaders(Message):
+    def items(self):
+        raise AssertionError("headers were formatted while debug logging is off")
+
+
+class ExplodingBody(bytes):
+    def __str__(self):
+        raise AssertionError("body was formatted while debug logging is off")
+
+
+class TestDebugLogging(TestCase):
+    def setUp(self):
+        super(TestDebugLogging, self).setUp()
+        self.headers = Message()
+        self.headers["Content-Type"] = "text/xml"
+
+    def make_server(self, loglevel, **kw):
+        return V1Server(logparent="logging_tests", loglevel=loglevel, **kw)
+
+    def test_nothing_is_formatted_when_debug_is_disabled(self):
+        server = self.make_server(logging.ERROR)
+        server._debug_headers(ExplodingHeaders())
+        server._debug_body(ExplodingBody(b"<Assets />" * 1000), self.headers)
+
+    def test_body_is_truncated_to_the_limit(self):
+        server = self.make_server(logging.DEBUG, log_body_limit=10)
+        with self.assertLogs(server.logger, logging.DEBUG) as logs:
+            server._debug_body(b"0123456789abcdef\nsecond line", self.headers)
+        self.assertEqual(
+            ["Body (first 10 of 28 bytes):", "  0123456789"],
+            [record.getMessage() for record in logs.records],
+        )
+
+    def test_full_body_without_limit(self):
+        server = self.make_server(logging.DEBUG, log_body_limit=None)
+        with self.assertLogs(server.logger, logging.DEBUG) as logs:
+            server._debug_body(b"first\nsecond", self.headers)
+        self.assertEqual(
+            ["Body:", "  first", "  second"],
+            [record.getMessage() for record in logs.records],
+        )
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+from urllib.parse import unquote
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.mirror import V1Mirror
+
+
+class TestV1Mirror(TestCase):
+    def setUp(self):
+        super(TestV1Mirror, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=40, owners_per_story=2, seed=7)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.filename = os.path.join(directory, "mirror.sqlite")
+        self.mirror = self.open_mirror()
+        self.mirror.track("Story", ["Name", "Number", "Estimate", "Scope", "Owners"])
+
+    def open_mirror(self):
+        mirror = V1Mirror(self.v1, self.filename, page_size=15)
+        self.addCleanup(mirror.close)
+        return mirror
+
+    def data_requests(self):
+        return self.server.request_counts["Data"]
+
+    def test_refresh_is_incremental(self):
+        self.assertEqual(40, self.mirror.refresh())
+        story = self.v1.Story.where(Number="S-00002").select("Name").first()
+        story.Name = "Renamed"
+        self.v1.commit()
+        # the assets changed at the last mirrored instant are read again
+        written = self.mirror.refresh()
+        self.assertTrue(1 <= written < 40, written)
+        self.assertEqual(
+            ["Renamed"],
+            [s.Name for s in self.mirror.query("Story").where(Number="S-00002")],
+        )
+
+    def test_changes_during_a_refresh_are_not_skipped(self):
+        dataset = self.dataset
+        get_xml = self.v1.server.get_xml
+        requests = []
+
+        def get_xml_and_change(*args, **kw):
+            xml = get_xml(*args, **kw)
+            if "/Data/" not in args[0]:
+                return xml
+            if not requests:
+                # the first story read changes at the instant the first page ends with
+                found = xml.findall("Asset")
+                newest = found[-1].find("Attribute[@name='ChangeDateUTC']").text
+                with dataset.lock:
+                    record = dataset.get(found[0].get("id"))
+                    dataset.touch(record)
+                    record["Name"] = "Changed during the refresh"
+                    record["ChangeDateUTC"] = newest
+            requests.append(args)
+            return xml
+
+        self.v1.server.get_xml = get_xml_and_change
+        self.mirror.refresh()
+        self.assertEqual(
+            ["Changed during the refresh"],
+            [s.Name for s in self.mirror.query("Story").where(Number="S-00001")],
+        )
+        self.assertEqual(40, len(self.mirror.query("Story")))
+
+    def test_local_queries_match_the_server(self):
+        self.mirror.refresh()
+        scope = self.v1.Scope.select("Name").first()
+        owner = self.v1.Member.select("Name").first()
+        for criteria in ({"Scope": scope}, {"Owners": owner}):
+            local = (
+                self.mirror.query("Story").where(**criteria).sort("-Estimate", "Number")
+            )
+            remote = (
+                self.v1.Story.select("Number")
+                .where(**dict((k, v.idref) for k, v in criteria.items()))
+                .sort("-Estimate", "Number")
+            )
+            before = self.data_requests()
+            numbers = [story.Number for story in local]
+            self.assertEqual(before, self.data_requests())
+            self.assertEqual([story.Number for story in remote], numbers)
+            self.assertTrue(numbers)
+
+    def test_unmirrored_attributes_come_from_the_server(self):
+        self.mirror.refresh()
+        query = self.mirror.query("Story").where(Number="S-00003")
+        self.assertTrue(query.is_local())
+        story = query.first()
+        self.assertTrue(story.Scope.idref.startswith("Scope:"))
+        self.assertEqual(2, len(story.Owners))
+        before = self.data_requests()
+        self.assertIsNotNone(story.CreateDateUTC)
+        self.assertEqual(before + 1, self.data_requests())
+
+        remote = (
+            self.mirror.query("Story").where(Number="S-00003").select("CreateDateUTC")
+        )
+        self.assertFalse(remote.is_local())
+        before = self.data_requests()
+        self.assertEqual([story], list(remote))
+        self.assertEqual(before + 1, self.data_requests())
+
+    def test_state_is_kept_in_the_file(self):
+        self.mirror.refresh()
+        reopened = self.open_mirror()
+        self.assertEqual(
+            self.mirror.last_change("Story"), reopened.last_change("Story")
+        )
+        self.assertEqual(40, len(reopened.query("Story")))
+        self.assertEqual(5, len(reopened.query("Story").sort("Number").page(5, 10)))
+
+    def test_deleted_assets_are_removed(self):
+        self.mirror.refresh()
+        self.v1.Story.where(Number="S-00005").select("Name").first().Delete()
+        self.mirror.refresh()
+        self.assertEqual(0, len(self.mirror.query("Story").where(Number="S-00005")))
+        self.assertEqual(39, len(self.mirror.query("Story")))
+        # the server leaves deleted assets out unless they are asked for
+        self.assertEqual(0, len(self.v1.Story.where(Number="S-00005")))
+        self.mirror.refresh()
+        self.assertEqual(39, len(self.mirror.query("Story")))
+        # deleted assets are only asked for since the previous refresh
+        _, path = self.server.request_log[-1]
+        self.assertIn("AssetState='255'", unquote(path))
+        self.assertIn("ChangeDateUTC>=", unquote(path))
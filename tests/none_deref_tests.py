@@ -0,0 +1,28 @@
+import pickle
+
+from testtools import TestCase
+
+from v1pysdk.none_deref import NoneDeref
+
+
+class TestNoneDeref(TestCase):
+    def setUp(self):
+        super(TestNoneDeref, self).setUp()
+        self.object = NoneDeref()
+
+    def test_any_attribute_is_present_and_falsy(self):
+        self.assertFalse(self.object.foo)
+        self.assertFalse(self.object.bar)
+
+    def test_object_is_falsy(self):
+        self.assertFalse(self.object)
+
+    def test_object_can_be_pickled(self):
+        s = pickle.dumps(self.object)
+        n = pickle.loads(s)
+        self.assertFalse(n)
+        self.assertFalse(self.object.foo)
+        self.assertFalse(self.object.bar)
+
+    def test_object_converts_to_None_string(self):
+        self.assertEqual(str(self.object), "None")
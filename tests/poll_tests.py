@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import time
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.v1poll import V1Poll
+
+
+class TestV1Poll(TestCase):
+    def setUp(self):
+        super(TestV1Poll, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=30, owners_per_story=1, seed=3)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.state_file = os.path.join(directory, "poll.sqlite")
+        self.changed = []
+        self.created = []
+
+    def on_change(self, story):
+        self.changed.append(story.Name)
+
+    def on_new(self, story):
+        self.created.append(story.Name)
+
+    def make_poll(self):
+        poll = V1Poll(self.v1, filename=self.state_file, page_size=7)
+        self.addCleanup(poll.close)
+        poll.run_on_change("Story", self.on_change, select=["Name"])
+        poll.run_on_new("Story", self.on_new, select=["Name"])
+        return poll
+
+    def test_first_poll_does_not_replay_history(self):
+        poll = self.make_poll()
+        self.assertEqual(0, poll.poll())
+        self.assertEqual([], self.changed + self.created)
+
+    def test_changes_are_delivered_once(self):
+        poll = self.make_poll()
+        poll.poll()
+        story = self.v1.Story.where(Number="S-00004").select("Name").first()
+        story.Name = "Renamed story"
+        self.v1.commit()
+        self.v1.Story.create(
+            Name="New story", Scope=self.v1.Scope.select("Name").first()
+        )
+
+        self.assertEqual(3, poll.poll())
+        self.assertEqual(["Renamed story", "New story"], self.changed)
+        self.assertEqual(["New story"], self.created)
+        self.assertEqual(0, poll.poll())
+
+    def test_nested_handlers_need_a_name(self):
+        poll = V1Poll(self.v1, filename=self.state_file, page_size=7)
+        self.addCleanup(poll.close)
+        self.assertRaises(ValueError, poll.run_on_change, "Story", lambda story: None)
+        poll.run_on_change("Story", lambda story: None, name="first")
+        poll.run_on_change("Story", lambda story: None, name="second")
+        self.assertRaises(
+            ValueError, poll.run_on_change, "Story", self.on_change, name="second"
+        )
+        poll.run_on_new("Story", self.on_new, select="Name")
+        self.assertEqual({"Name"}, poll.selections["Story"])
+        self.assertEqual(
+            ["first", "second", V1Poll.handler_id(self.on_new)],
+            [handler_id for handler_id, _, _ in poll.registrations["Story"]],
+        )
+
+    def test_state_persists_across_instances(self):
+        self.make_poll().poll()
+        self.v1.Story.create(
+            Name="Created in between", Scope=self.v1.Scope.select("Name").first()
+        )
+        self.assertEqual(2, self.make_poll().poll())
+        self.assertEqual(["Created in between"], self.created)
+        self.assertEqual(0, self.make_poll().poll())
+
+    def rename(self, v1, number, name):
+        story = v1.Story.where(Number=number).select("Name").first()
+        story.Name = name
+        v1.commit()
+        # change dates have a millisecond resolution
+        time.sleep(0.002)
+
+    def test_changes_made_during_a_poll_are_not_skipped(self):
+        poll = V1Poll(self.v1, filename=self.state_file, page_size=3)
+        self.addCleanup(poll.close)
+        poll.run_on_change("Story", self.on_change, select=["Name"])
+        poll.poll()
+        numbers = ["S-%05d" % n for n in range(1, 9)]
+        for number in numbers:
+            self.rename(self.v1, number, "Changed " + number)
+        writer = V1Meta(instance_url=self.server.url)
+
+        def on_change(story):
+            if not self.changed:
+                # moves the story being delivered behind the others, the later stories
+                # shift back while the poll pages
+                self.rename(writer, "S-00001", "Changed again")
+            self.changed.append(story.Name)
+
+        poll.registrations["Story"] = [
+            (V1Poll.handler_id(self.on_change), "change", on_change)
+        ]
+        self.assertEqual(9, poll.poll())
+        self.assertEqual(
+            ["Changed " + number for number in numbers] + ["Changed again"],
+            self.changed,
+        )
+        self.assertEqual(0, poll.poll())
+
+    def test_new_handlers_move_past_updates(self):
+        poll = V1Poll(self.v1, filename=self.state_file, page_size=3)
+        self.addCleanup(poll.close)
+        poll.run_on_new("Story", self.on_new, select=["Name"])
+        poll.poll()
+        for number in ["S-00001", "S-00002", "S-00003", "S-00004"]:
+            self.rename(self.v1, number, "Changed " + number)
+        self.assertEqual(0, poll.poll())
+        self.assertEqual(
+            poll._latest_watermark("Story"),
+            poll._load_watermark(V1Poll.handler_id(self.on_new), "Story", "new"),
+        )
+        self.server.reset_counters()
+        self.assertEqual(0, poll.poll())
+        # only the last change is read again
+        self.assertEqual(1, self.server.request_counts["Data"])
+
+
+class TestPagedQuery(TestCase):
+    def setUp(self):
+        super(TestPagedQuery, self).setUp()
+        self.server = FakeV1Server(FakeDataSet.generate(stories=23, seed=5)).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+
+    def test_paged_fetches_every_page(self):
+        query = self.v1.Story.select("Number").sort("Number")
+        numbers = [story.Number for story in query.paged(page_size=5)]
+        self.assertEqual(23, len(numbers))
+        self.assertEqual(sorted(numbers), numbers)
+        self.assertEqual(5, self.server.request_counts["Data"])
@@ -0,0 +1,86 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.client import V1Error
+from .fake_server import FakeDataSet, FakeV1Server
+
+SELECT = ("Number", "Estimate", "Scope", "Scope.Name", "Owners", "Owners.Name")
+
+
+class TestQueryV1Backend(TestCase):
+    def setUp(self):
+        super(TestQueryV1Backend, self).setUp()
+        dataset = FakeDataSet.generate(stories=20, owners_per_story=2, seed=4)
+        self.server = FakeV1Server(dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+
+    def fresh_meta(self):
+        return V1Meta(instance_url=self.server.url)
+
+    def snapshot(self, query):
+        return [
+            (
+                story.idref,
+                story.Number,
+                story.Estimate,
+                story.Scope.idref,
+                story.Scope.Name,
+                [owner.idref for owner in story.Owners],
+                sorted(owner.Name for owner in story.Owners),
+            )
+            for story in query
+        ]
+
+    def test_results_match_rest_1(self):
+        def query(v1):
+            return (
+                v1.Story.select(*SELECT)
+                .filter("Estimate>'2'")
+                .sort("-Estimate", "Number")
+                .page(size=7, start=2)
+            )
+
+        expected = self.snapshot(query(self.fresh_meta()))
+        self.server.reset_counters()
+        found = self.snapshot(query(self.fresh_meta()).backend("query.v1"))
+        self.assertEqual(expected, found)
+        self.assertEqual(7, len(found))
+        self.assertEqual(0, self.server.request_counts["Data"])
+        self.assertEqual(1, self.server.request_counts["query.v1"])
+
+    def test_asof_moments_share_one_request(self):
+        asofs = ["2015-01-01", "2030-01-01"]
+        timeseries = self.v1.Story.select("Number", "Owners").asof(asofs).timeseries()
+        self.server.reset_counters()
+        query = self.fresh_meta().Story.select("Number", "Owners").asof(asofs)
+        self.assertEqual(timeseries, query.backend("query.v1").timeseries())
+        self.assertEqual(1, self.server.request_counts["query.v1"])
+
+    def test_batch_runs_queries_in_one_request(self):
+        v1 = self.fresh_meta()
+        self.server.reset_counters()
+        called = []
+        with v1.batch() as batch:
+            stories = batch.add(v1.Story.select("Number").where(Estimate="3"))
+            scopes = batch.add(
+                v1.Scope.select("Name", "Workitems.@Count"), callback=called.append
+            )
+            self.assertEqual(2, len(batch))
+        self.assertEqual([scopes], called)
+        self.assertEqual(1, self.server.request_counts["query.v1"])
+        self.assertEqual(
+            sorted(self.v1.Story.select("Number").where(Estimate="3").Number),
+            sorted(stories.Number),
+        )
+        counts = dict((scope.Name, scope.data["Workitems.@Count"]) for scope in scopes)
+        expected = self.v1.Scope.select("Name", "Workitems.@Count")
+        self.assertEqual(
+            dict((s.Name, s.data["Workitems.@Count"]) for s in expected), counts
+        )
+        self.assertEqual(1, self.server.request_counts["query.v1"])
+
+    def test_errors_raise_v1error(self):
+        query = self.v1.Story.select("Number").backend("query.v1")
+        self.server.fail_next(status=400)
+        self.assertRaises(V1Error, list, query)
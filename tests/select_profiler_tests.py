@@ -0,0 +1,57 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.select_profiler import SelectProfiler, SingleAttributeFetchError
+
+
+class TestSelectProfiler(TestCase):
+    def setUp(self):
+        super(TestSelectProfiler, self).setUp()
+        self.server = FakeV1Server(FakeDataSet.generate(stories=10, seed=3)).start()
+        self.addCleanup(self.server.stop)
+
+    def meta(self, profiler):
+        return V1Meta(instance_url=self.server.url, select_profiler=profiler)
+
+    def estimates(self, v1):
+        v1.global_cache.clear()
+        return [story.Estimate for story in v1.Story.select("Name")]
+
+    def test_attributes_fetched_singly_are_selected_next_time(self):
+        profiler = SelectProfiler()
+        v1 = self.meta(profiler)
+        v1.Story  # the asset class is fetched once
+        self.server.reset_counters()
+        first = self.estimates(v1)
+        self.assertEqual(11, self.server.request_counts["Data"])
+
+        self.server.reset_counters()
+        self.assertEqual(first, self.estimates(v1))
+        self.assertEqual(1, self.server.request_counts["Data"])
+        [entry] = profiler.report()
+        self.assertEqual(
+            ("Story", "Estimate", 10),
+            (entry.site.asset_type, entry.attribute, entry.count),
+        )
+        self.assertEqual(__file__, entry.site.filename)
+
+    def test_learning_can_be_disabled(self):
+        v1 = self.meta(SelectProfiler(learn=False))
+        self.estimates(v1)
+        self.server.reset_counters()
+        self.estimates(v1)
+        self.assertEqual(11, self.server.request_counts["Data"])
+
+    def test_warn_mode_logs_once_per_attribute(self):
+        v1 = self.meta(SelectProfiler(mode="warn", threshold=3))
+        with self.assertLogs("v1pysdk.select_profiler") as logs:
+            self.estimates(v1)
+        self.assertEqual(1, len(logs.records))
+        self.assertIn("3 single-attribute fetches of Story.Estimate", logs.output[0])
+
+    def test_strict_mode_raises(self):
+        v1 = self.meta(SelectProfiler(mode="strict"))
+        self.assertRaises(SingleAttributeFetchError, self.estimates, v1)
+        # the attribute was learned, the next run selects it
+        self.assertEqual(10, len(self.estimates(v1)))
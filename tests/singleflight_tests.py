@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.instrumentation import Instrumentation
+from v1pysdk.singleflight import SingleFlight
+
+THREADS = 6
+
+
+class TestSingleFlight(TestCase):
+    def run_together(self, function):
+        barrier = threading.Barrier(THREADS)
+
+        def call(i):
+            barrier.wait()
+            return function()
+
+        with ThreadPoolExecutor(THREADS) as executor:
+            return list(executor.map(call, range(THREADS)))
+
+    def test_concurrent_calls_share_one_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return object()
+
+        def call():
+            return flight.do("key", slow)
+
+        with ThreadPoolExecutor(3) as executor:
+            first = executor.submit(call)
+            started.wait(5)
+            others = [executor.submit(call) for i in range(2)]
+            while flight.collapsed < 2:
+                time.sleep(0.01)
+            release.set()
+            results = [first.result()] + [f.result() for f in others]
+        self.assertEqual([False, True, True], [shared for _, shared in results])
+        self.assertEqual(1, len(set(id(result) for result, _ in results)))
+        self.assertEqual({"calls": 1, "collapsed": 2}, flight.stats())
+        # nothing is cached once the call is over
+        self.assertFalse(flight.do("key", lambda: 1)[1])
+
+    def test_each_caller_gets_a_copy(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return ["result"]
+
+        def call():
+            return flight.do("key", slow, copy=list)
+
+        with ThreadPoolExecutor(3) as executor:
+            first = executor.submit(call)
+            started.wait(5)
+            others = [executor.submit(call) for i in range(2)]
+            while flight.collapsed < 2:
+                time.sleep(0.01)
+            release.set()
+            results = [first.result()[0]] + [f.result()[0] for f in others]
+        self.assertEqual([["result"]] * 3, results)
+        self.assertEqual(3, len(set(id(result) for result in results)))
+
+    def test_calls_after_forget_dont_share_the_calls_in_flight(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "before"
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(flight.do, "key", slow)
+            started.wait(5)
+            flight.forget()
+            self.assertEqual(("after", False), flight.do("key", lambda: "after"))
+            release.set()
+            self.assertEqual(("before", False), leader.result())
+        self.assertEqual({}, flight._calls)
+
+    def test_callers_sharing_a_call_wait_at_most_their_timeout(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(flight.do, "key", slow)
+            started.wait(5)
+            t0 = time.perf_counter()
+            self.assertRaises(TimeoutError, flight.do, "key", slow, 0.05)
+            self.assertTrue(time.perf_counter() - t0 < 1)
+            release.set()
+            self.assertEqual(("done", False), leader.result())
+
+    def test_errors_are_raised_and_the_call_released(self):
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("boom")
+
+        self.assertRaises(ValueError, flight.do, "key", failing)
+        self.assertEqual({}, flight._calls)
+
+    def test_concurrent_refreshes_make_one_request(self):
+        dataset = FakeDataSet.generate(stories=3)
+        server = FakeV1Server(dataset, latency=0.2).start()
+        self.addCleanup(server.stop)
+        instrumentation = Instrumentation()
+        v1 = V1Meta(instance_url=server.url, instrumentation=instrumentation)
+        oid = v1.Story.select("Name").first().intid
+        server.reset_counters()
+
+        results = self.run_together(lambda: v1.read_asset("Story", oid)["Name"])
+        self.assertEqual(1, len(set(results)))
+        self.assertEqual(1, server.request_counts["Data"])
+        self.assertEqual(THREADS - 1, v1.server.single_flight.collapsed)
+        counters = instrumentation.snapshot()["counters"]
+        key = ("v1_requests_collapsed_total", (("endpoint", "Data"),))
+        self.assertEqual(THREADS - 1, counters[key])
+
+    def test_callers_of_a_shared_request_get_their_own_document(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=1), latency=0.2).start()
+        self.addCleanup(server.stop)
+        v1 = V1Meta(instance_url=server.url)
+        documents = self.run_together(lambda: v1.server.get_meta_xml("Story"))
+        self.assertEqual(1, server.request_counts["meta.v1"])
+        self.assertEqual(THREADS, len(set(id(document) for document in documents)))
+        documents[0].set("name", "Changed")
+        self.assertEqual(["Story"], list(set(d.get("name") for d in documents[1:])))
+
+    def test_can_be_disabled(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=1), latency=0.1).start()
+        self.addCleanup(server.stop)
+        v1 = V1Meta(instance_url=server.url, single_flight=False)
+        self.run_together(lambda: v1.server.get_meta_xml("Story"))
+        self.assertEqual(THREADS, server.request_counts["meta.v1"])
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.client import V1TimeoutError
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.instrumentation import Instrumentation
+from v1pysdk.lanes import current_lane, use_lane
+from v1pysdk.timeouts import Deadline, Hedging, current_deadline, use_deadline
+
+
+class TestTimeouts(TestCase):
+    def start_server(self, latency):
+        server = FakeV1Server(FakeDataSet.generate(stories=12), latency=latency)
+        self.addCleanup(server.stop)
+        return server.start()
+
+    def test_requests_time_out(self):
+        server = self.start_server(0.5)
+        v1 = V1Meta(instance_url=server.url, timeout=0.1)
+        self.assertRaises(V1TimeoutError, v1.server.get_meta_xml, "Story")
+        # the timeout of a call overrides the one of the server
+        meta = v1.server.get_xml("/meta.v1/Story", timeout=5)
+        self.assertEqual("Story", meta.get("name"))
+
+    def test_deadline_is_carried_through_pages(self):
+        server = self.start_server(0.1)
+        v1 = V1Meta(instance_url=server.url)
+        v1.Story
+        server.reset_counters()
+        query = v1.Story.select("Name").deadline(0.35)
+        found = []
+        self.assertRaises(V1TimeoutError, found.extend, query.paged(page_size=2))
+        self.assertTrue(2 <= len(found) <= 6, found)
+        self.assertTrue(server.request_counts["Data"] < 6)
+        # without a deadline every page is read
+        self.assertEqual(12, len(list(query.deadline().paged(page_size=2))))
+
+    def test_shared_requests_keep_the_deadline_of_each_caller(self):
+        server = self.start_server(1.0)
+        v1 = V1Meta(instance_url=server.url)
+        leader = threading.Thread(target=v1.server.get_xml, args=("/meta.v1/Story",))
+        leader.start()
+        self.addCleanup(leader.join)
+        while not v1.server.single_flight.stats()["calls"]:
+            time.sleep(0.005)
+        t0 = time.perf_counter()
+        self.assertRaises(
+            V1TimeoutError, v1.server.get_xml, "/meta.v1/Story", deadline=0.2
+        )
+        self.assertTrue(time.perf_counter() - t0 < 0.5)
+        self.assertEqual(1, v1.server.single_flight.stats()["collapsed"])
+
+    def test_deadline_stops_a_slow_response_body(self):
+        server = FakeV1Server(FakeDataSet.generate(stories=12), trickle=0.05)
+        self.addCleanup(server.stop)
+        v1 = V1Meta(instance_url=server.start().url)
+        t0 = time.perf_counter()
+        self.assertRaises(
+            V1TimeoutError, v1.server.get_xml, "/rest-1.v1/Data/Story", deadline=0.2
+        )
+        self.assertTrue(time.perf_counter() - t0 < 0.45)
+        # every read is quick, so the socket timeout alone doesn't stop it
+        self.assertEqual(
+            12, len(v1.server.get_xml("/rest-1.v1/Data/Story", timeout=0.2))
+        )
+
+    def test_expired_deadlines_make_no_request(self):
+        server = self.start_server(0)
+        v1 = V1Meta(instance_url=server.url)
+        deadline = Deadline(0)
+        self.assertTrue(deadline.expired)
+        self.assertRaises(
+            V1TimeoutError, v1.server.get_xml, "/meta.v1/Story", deadline=deadline
+        )
+        self.assertEqual(0, server.request_counts["meta.v1"])
+
+
+class TestHedging(TestCase):
+    def test_slow_requests_are_hedged(self):
+        delays = iter([1.0])
+        server = FakeV1Server(
+            FakeDataSet.generate(stories=1), latency=lambda: next(delays, 0)
+        ).start()
+        self.addCleanup(server.stop)
+        hedging = Hedging(delay=0.05, budget=1)
+        self.addCleanup(hedging.close)
+        instrumentation = Instrumentation()
+        v1 = V1Meta(
+            instance_url=server.url, hedging=hedging, instrumentation=instrumentation
+        )
+        t0 = time.perf_counter()
+        self.assertEqual("Story", v1.server.get_meta_xml("Story").get("name"))
+        self.assertTrue(time.perf_counter() - t0 < 0.8)
+        self.assertEqual({"calls": 1, "hedged": 1, "wins": 1}, hedging.stats())
+        self.assertEqual(2, server.request_counts["meta.v1"])
+        counters = instrumentation.snapshot()["counters"]
+        self.assertEqual(
+            1, counters["v1_requests_hedged_total", (("endpoint", "meta.v1"),)]
+        )
+
+    def test_attempts_run_in_the_context_of_the_caller(self):
+        hedging = Hedging(delay=0, budget=1)
+        self.addCleanup(hedging.close)
+        deadline = Deadline(5)
+        seen = []
+
+        def attempt():
+            seen.append((current_lane(), current_deadline()))
+            time.sleep(0.05)
+            return "done"
+
+        with use_lane("batch"), use_deadline(deadline):
+            self.assertEqual(("done", True), hedging.call(attempt))
+        time.sleep(0.1)
+        self.assertEqual([("batch", deadline)] * 2, seen)
+
+    def test_budget_limits_hedging(self):
+        hedging = Hedging(delay=0.01, budget=0)
+        self.addCleanup(hedging.close)
+        self.assertEqual(
+            ("done", False), hedging.call(lambda: time.sleep(0.05) or "done")
+        )
+        self.assertEqual(0, hedging.stats()["hedged"])
+
+    def test_delay_follows_the_latency_percentile(self):
+        hedging = Hedging(percentile=95, min_samples=10)
+        self.addCleanup(hedging.close)
+        self.assertIsNone(hedging.hedge_delay())
+        hedging._latencies.extend(range(1, 101))
+        self.assertEqual(95, hedging.hedge_delay())
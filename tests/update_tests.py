@@ -0,0 +1,108 @@
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk.bulk import BulkWriter
+from .fake_server import FakeDataSet, FakeV1Server
+
+
+class TestDeltaUpdates(TestCase):
+    def setUp(self):
+        super(TestDeltaUpdates, self).setUp()
+        self.dataset = FakeDataSet.generate(stories=3, owners_per_story=3, seed=5)
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        self.story = self.v1.Story.select("Name", "Estimate", "Scope", "Owners").first()
+
+    def server_owners(self):
+        return self.dataset.get(self.story.idref)["Owners"]
+
+    def test_relation_changes_only_send_the_difference(self):
+        owners = list(self.story.Owners)
+        newcomer = [m for m in self.v1.Member.select("Name") if m not in owners][0]
+        newdata = {"Owners": owners[1:] + [newcomer], "Name": self.story.Name}
+        update_doc = self.v1.generate_update_doc(newdata, self.story.data)
+        self.assertEqual(
+            [(newcomer.idref, "add"), (owners[0].idref, "remove")],
+            [(a.get("idref"), a.get("act")) for a in update_doc.find("Relation")],
+        )
+        # the unchanged name is left out
+        self.assertEqual(["Relation"], [node.tag for node in update_doc])
+
+        self.story.Owners = owners[1:] + [newcomer]
+        self.assertEqual([], self.v1.commit())
+        self.assertEqual(
+            sorted(o.idref for o in owners[1:] + [newcomer]),
+            sorted(self.server_owners()),
+        )
+
+    def test_unchanged_assets_are_not_sent(self):
+        self.server.reset_counters()
+        self.story.Name = self.story.Name
+        self.story.Estimate = int(self.story.Estimate)
+        self.story.Scope = self.story.Scope
+        self.story.Owners = list(self.story.Owners)
+        self.assertEqual([], self.v1.commit())
+        self.assertEqual([], [m for m, path in self.server.request_log if m == "POST"])
+
+    def test_without_current_data_everything_is_sent(self):
+        owners = list(self.story.Owners)
+        update_doc = self.v1.generate_update_doc({"Owners": owners, "Name": "x"})
+        self.assertEqual(
+            [(o.idref, "add") for o in owners],
+            [(a.get("idref"), a.get("act")) for a in update_doc.find("Relation")],
+        )
+        self.assertEqual("x", update_doc.find("Attribute").text)
+
+
+class TestMultiValueAttributes(TestCase):
+    def setUp(self):
+        super(TestMultiValueAttributes, self).setUp()
+        self.dataset = FakeDataSet().add_type("Story", multi_value=["TaggedWith"])
+        oid = self.dataset.add_asset("Story", Name="Tagged", TaggedWith=["a", "b"])
+        self.idref = "Story:%d" % oid
+        self.server = FakeV1Server(self.dataset).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        self.story = self.v1.Story.select("Name", "TaggedWith").first()
+
+    def test_tags_are_added_and_removed(self):
+        self.assertEqual(["a", "b"], self.story.TaggedWith)
+        update_doc = self.v1.generate_update_doc(
+            {"TaggedWith": ["b", "c"]}, self.story.data
+        )
+        node = update_doc.find("Attribute")
+        self.assertEqual("TaggedWith", node.get("name"))
+        self.assertEqual(
+            [("c", "add"), ("a", "remove")],
+            [(value.text, value.get("act")) for value in node.findall("Value")],
+        )
+        self.assertEqual(
+            {"TaggedWith": {"add": ["c"], "remove": ["a"]}},
+            self.v1.generate_update_command(
+                {"TaggedWith": ["b", "c"]}, self.story.data
+            ),
+        )
+
+        self.story.TaggedWith = ["b", "c"]
+        self.assertEqual([], self.v1.commit())
+        self.assertEqual(["b", "c"], self.dataset.get(self.idref)["TaggedWith"])
+        self.assertEqual(["b", "c"], self.story.TaggedWith)
+
+    def test_all_tags_can_be_removed(self):
+        self.story.TaggedWith = []
+        self.assertEqual([], self.v1.commit())
+        self.assertEqual([], self.dataset.get(self.idref)["TaggedWith"])
+
+    def test_unchanged_tags_are_not_sent(self):
+        self.server.reset_counters()
+        self.story.TaggedWith = ["b", "a"]
+        self.assertEqual([], self.v1.commit())
+        self.assertEqual([], [m for m, path in self.server.request_log if m == "POST"])
+
+    def test_bulk_commits_send_the_difference(self):
+        v1 = V1Meta(instance_url=self.server.url, bulk_writer=BulkWriter())
+        story = v1.Story.select("TaggedWith").first()
+        story.TaggedWith = story.TaggedWith + ["c"]
+        self.assertEqual([], v1.commit())
+        self.assertEqual(["a", "b", "c"], self.dataset.get(self.idref)["TaggedWith"])
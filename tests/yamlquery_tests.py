@@ -0,0 +1,91 @@
+import contextlib
+import importlib
+import io
+
+from testtools import TestCase
+
+from v1pysdk import V1Meta
+from v1pysdk import yamlquery
+from .fake_server import FakeDataSet, FakeV1Server
+from v1pysdk.yamlquery import YamlQueries, query_from_yaml
+
+REPORT = """
+from: Story
+select:
+  - Number
+  - Estimate
+filter:
+  - Estimate>'2'
+sort:
+  - +Number
+"""
+
+
+class TestYamlQuery(TestCase):
+    def test_import_has_no_side_effects(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            importlib.reload(yamlquery)
+        self.assertEqual("", output.getvalue())
+
+    def test_documents_are_loaded_safely(self):
+        self.assertRaises(
+            Exception, query_from_yaml, "from: !!python/object/apply:os.getcwd []"
+        )
+
+    def test_url_from_yaml(self):
+        self.assertEqual(
+            "/Story?where=Name%3D%27It%27%27s%27&sel=Name",
+            query_from_yaml("from: Story\nselect: Name\nwhere:\n  Name: It's\n"),
+        )
+
+    def test_operations_are_not_executed(self):
+        queries = YamlQueries(V1Meta())
+        self.assertRaises(ValueError, queries.compile, "from: Story\nop: Delete\n")
+
+
+class TestYamlQueries(TestCase):
+    def setUp(self):
+        super(TestYamlQueries, self).setUp()
+        self.server = FakeV1Server(FakeDataSet.generate(stories=30, seed=2)).start()
+        self.addCleanup(self.server.stop)
+        self.v1 = V1Meta(instance_url=self.server.url)
+        self.queries = YamlQueries(self.v1)
+
+    def test_documents_are_compiled_once(self):
+        plan = self.queries.compile(REPORT)
+        self.assertIs(plan, self.queries.compile(str(REPORT)))
+        self.assertEqual(("Number",), plan.sort)
+        self.assertIsNot(plan, self.queries.compile(REPORT + "find: x\n"))
+
+    def test_run_matches_the_equivalent_query(self):
+        expected = self.v1.Story.select("Number").filter("Estimate>'2'").sort("Number")
+        self.assertEqual(
+            list(expected.Number), [s.Number for s in self.queries.run(REPORT)]
+        )
+
+    def test_stream_pages_through_results(self):
+        expected = len(self.v1.Story.filter("Estimate>'2'"))
+        self.server.reset_counters()
+        numbers = [story.Number for story in self.queries.stream(REPORT, page_size=4)]
+        self.assertEqual(expected, len(numbers))
+        self.assertEqual(sorted(numbers), numbers)
+        self.assertEqual((expected + 3) // 4, self.server.request_counts["Data"])
+
+    def test_stream_uses_the_document_page_size(self):
+        expected = len(self.v1.Story.filter("Estimate>'2'"))
+        self.server.reset_counters()
+        report = REPORT + "page:\n  size: 3\n"
+        self.assertEqual(expected, len(list(self.queries.stream(report))))
+        self.assertEqual((expected + 2) // 3, self.server.request_counts["Data"])
+        self.server.reset_counters()
+        self.assertEqual(expected, len(list(self.queries.stream(report, page_size=5))))
+        self.assertEqual((expected + 4) // 5, self.server.request_counts["Data"])
+
+    def test_asof_fan_out(self):
+        report = REPORT + "asof:\n  - 2015-01-01\n  - 2030-01-01\n"
+        results = list(self.queries.run(report))
+        self.assertEqual(2, self.server.request_counts["Hist"])
+        self.assertEqual(["2030-01-01"], sorted(set(s.data["AsOf"] for s in results)))
+        streamed = list(self.queries.stream(report, page_size=100))
+        self.assertEqual(len(results), len(streamed))
@@ -7,4 +7,12 @@ VersionOne server (defaulting to localhost/VersionOne.Web).
 
 
 from .v1meta import V1Meta
-from .v1poll import V1Poll
+
+
+def __getattr__(name):
+    # V1Poll needs sqlite3, only imported when it's used
+    if name == "V1Poll":
+        from .v1poll import V1Poll
+
+        return V1Poll
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,61 @@
+"""
+Command line entry point:
+
+    python -m v1pysdk export Story --select Name,Estimate --format jsonl --output stories.jsonl
+
+Connection settings come from --url, --username, --password and --token, or from the
+V1_INSTANCE_URL, V1_USERNAME, V1_PASSWORD and V1_TOKEN environment variables.
+"""
+
+import argparse
+import os
+import sys
+
+from .client import V1Error
+from .v1meta import V1Meta
+from . import export
+
+
+def connect(args):
+    """V1Meta for the connection arguments"""
+    if args.token:
+        return V1Meta(
+            instance_url=args.url, password=args.token, use_password_as_token=True
+        )
+    return V1Meta(instance_url=args.url, username=args.username, password=args.password)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="v1pysdk", description="VersionOne API client"
+    )
+    parser.add_argument("--url", default=os.environ.get("V1_INSTANCE_URL"))
+    parser.add_argument("--username", default=os.environ.get("V1_USERNAME", ""))
+    parser.add_argument("--password", default=os.environ.get("V1_PASSWORD", ""))
+    parser.add_argument("--token", default=os.environ.get("V1_TOKEN"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    export.add_export_arguments(
+        commands.add_parser("export", help="stream asset types to CSV or JSON Lines")
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.url:
+        parser.error("--url (or V1_INSTANCE_URL) is required")
+    v1 = connect(args)
+    try:
+        if args.command == "export":
+            results = export.run_export(v1, args)
+            if any(result.errors for result in results):
+                return 1
+    except (ValueError, V1Error) as e:
+        sys.stderr.write("v1pysdk: {0}\n".format(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Server-side aggregates.
+
+VersionOne computes aggregates of the assets related to each result of a query when they are
+selected, e.g. "Workitems:PrimaryWorkitem[Status.Name='Done'].Estimate.@Sum".  The classes
+here build these select terms and convert their values, so reductions don't need every
+related asset to be read:
+
+    rows = v1.Timebox.where(Schedule="Schedule:1010").aggregate(
+        done=Sum("Workitems:PrimaryWorkitem.Estimate", filter={"Status.Name": "Done"}),
+        items=Count("Workitems"),
+    )
+    for row in rows:
+        print(row.asset, row.values["done"], row.values["items"])
+
+The *filter* applies to the relation the path starts with and is either a filter expression
+or a dict of Equals terms, like V1Query.where().
+"""
+
+from collections import namedtuple
+
+from .string_utils import split_attribute
+
+# an asset of an aggregate() query, at one of its asof moments, and its aggregate values
+AggregateRow = namedtuple("AggregateRow", "asset asof values")
+
+
+class Aggregate(object):
+    """An aggregate of the values at the end of *path*, a relation path from the queried
+    asset type"""
+
+    function = None
+
+    def __init__(self, path, filter=None):
+        self.path = path
+        self.filter = filter
+
+    def filter_string(self):
+        if isinstance(self.filter, dict):
+            return ";".join(
+                "{0}='{1}'".format(attrname, criteria)
+                for attrname, criteria in self.filter.items()
+            )
+        return self.filter
+
+    def term(self):
+        """The select term computing the aggregate"""
+        parts = split_attribute(self.path)
+        condition = self.filter_string()
+        if condition:
+            head = parts[0]
+            if head.endswith("]"):
+                # merged with a filter already in the path
+                parts[0] = head[:-1] + ";" + condition + "]"
+            else:
+                parts[0] = head + "[" + condition + "]"
+        return ".".join(parts + ["@" + self.function])
+
+    def convert(self, value):
+        """The typed value of the aggregate from its raw value"""
+        if value is None or value == "":
+            return None
+        return float(value)
+
+    def __repr__(self):
+        if self.filter is None:
+            return "%s(%r)" % (self.__class__.__name__, self.path)
+        return "%s(%r, filter=%r)" % (self.__class__.__name__, self.path, self.filter)
+
+
+class Count(Aggregate):
+    function = "Count"
+
+    def convert(self, value):
+        if value is None or value == "":
+            return 0
+        return int(float(value))
+
+
+class DistinctCount(Count):
+    function = "DistinctCount"
+
+
+class Sum(Aggregate):
+    function = "Sum"
+
+    def convert(self, value):
+        # the sum of no values
+        if value is None or value == "":
+            return 0.0
+        return float(value)
+
+
+class Min(Aggregate):
+    function = "Min"
+
+
+class Max(Aggregate):
+    function = "Max"
+
+
+class MinDate(Aggregate):
+    """The earliest date, as the text the server gives"""
+
+    function = "MinDate"
+
+    def convert(self, value):
+        return value or None
+
+
+class MaxDate(MinDate):
+    """The latest date, as the text the server gives"""
+
+    function = "MaxDate"
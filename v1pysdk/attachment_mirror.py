@@ -0,0 +1,114 @@
+"""
+Copies attachment bodies from a VersionOne server into a local directory.
+
+Each attachment is streamed to disk in bounded chunks, several attachments at a
+time, so mirroring tens of gigabytes only ever holds a few chunks in memory.
+Files already present in the target directory are skipped, so an interrupted
+mirror can simply be started again.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import DEFAULT_CHUNK_SIZE
+from .lanes import current_lane, use_lane
+
+
+def attachment_filename(attachment):
+    """Local file name of an attachment: its id followed by its (sanitized) file name"""
+    filename = os.path.basename(attachment.Filename or "") or "attachment"
+    filename = re.sub(r"[^\w.\- ]", "_", filename)
+    return "{0}-{1}".format(attachment.intid, filename)
+
+
+class AttachmentMirror(object):
+    """Downloads the attachments matched by a query into *directory*.
+
+    mirror = AttachmentMirror(v1, "/backup/attachments", max_workers=8)
+    mirrored, errors = mirror.run(v1.Attachment.where(Asset="Story:1005"))
+    """
+
+    def __init__(
+        self,
+        v1meta,
+        directory,
+        max_workers=8,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        progress=None,
+    ):
+        """
+        :param v1meta: V1Meta instance to read the attachments from
+        :param directory: target directory, created if needed
+        :param max_workers: number of attachments downloaded at the same time
+        :param chunk_size: number of bytes copied at a time for each attachment
+        :param progress: optional callable, called as progress(copied_files, copied_bytes)
+                         each time an attachment is completed
+        """
+        self.v1meta = v1meta
+        self.directory = directory
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self._lock = threading.Lock()
+
+    def target_path(self, attachment):
+        return os.path.join(self.directory, attachment_filename(attachment))
+
+    def mirror_one(self, attachment):
+        """Downloads a single attachment unless it's already mirrored, returns its path"""
+        path = self.target_path(attachment)
+        if os.path.exists(path):
+            return path
+        partial_path = path + ".part"
+        try:
+            with open(partial_path, "wb") as fileobj:
+                copied = attachment.download_to(fileobj, chunk_size=self.chunk_size)
+        except BaseException:
+            # a failed download leaves nothing behind
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+            raise
+        # only complete downloads get their final name, which makes re-runs resume safely
+        os.replace(partial_path, path)
+        with self._lock:
+            self.copied_files += 1
+            self.copied_bytes += copied
+            if self.progress is not None:
+                self.progress(self.copied_files, self.copied_bytes)
+        return path
+
+    def run(self, attachments=None):
+        """
+        Mirrors every attachment of *attachments*, all the attachments of the server if not given.
+        :return: (list of mirrored paths, list of (attachment, exception) for the failed ones)
+        """
+        if attachments is None:
+            attachments = self.v1meta.Attachment.select("Filename")
+        os.makedirs(self.directory, exist_ok=True)
+        mirrored = []
+        errors = []
+        # the downloads run in the request lane of the caller
+        lane = current_lane()
+
+        def mirror(attachment):
+            try:
+                with use_lane(lane):
+                    mirrored.append(self.mirror_one(attachment))
+            except Exception as e:
+                errors.append((attachment, e))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # consume the map so that every submitted download is waited for
+            list(executor.map(mirror, attachments))
+        return mirrored, errors
+
+
+def mirror_attachments(v1meta, directory, attachments=None, **kw):
+    """Shortcut for AttachmentMirror(v1meta, directory, **kw).run(attachments)"""
+    return AttachmentMirror(v1meta, directory, **kw).run(attachments)
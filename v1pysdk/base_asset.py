@@ -1,8 +1,5 @@
-from future.utils import with_metaclass
-
-from pprint import pformat as pf
-
 from .query import V1Query
+from .none_deref import NoneDeref
 
 
 class IterableType(type):
@@ -16,15 +13,13 @@ class IterableType(type):
             yield instance
 
 
-# Required dummy for with_metaclass to work properly
-class DummyBaseAsset(object):
-    pass
-
-
-class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
+class BaseAsset(metaclass=IterableType):
     """Provides common methods for the dynamically derived asset type classes
     built by V1Meta.asset_class"""
 
+    # call site of the query that returned the asset, see select_profiler
+    _v1_query_site = None
+
     @classmethod
     def query(cls, where=None, sel=None):
         """Takes a V1 Data query string and returns an iterable of all matching items"""
@@ -46,6 +41,10 @@ class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
     def asof(cls, *asofs):
         return V1Query(cls).asof(*asofs)
 
+    @classmethod
+    def aggregate(cls, **aggregates):
+        return V1Query(cls).aggregate(**aggregates)
+
     @classmethod
     def from_query_select(cls, xml, asof=None):
         """Find or instantiate an object and fill it with data that just came back from query"""
@@ -56,11 +55,34 @@ class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
         data["AsOf"] = asof
         return instance.with_data(data)
 
+    @classmethod
+    def from_query_json(cls, asset, asof=None):
+        """from_query_select() for an asset of a rest-1.v1 JSON response"""
+        data = cls._v1_v1meta.unpack_asset_json(asset)
+        instance = cls._v1_v1meta.asset_from_oid(asset["id"])
+        instance.AsOf = asof
+        data["AsOf"] = asof
+        return instance.with_data(data)
+
+    @classmethod
+    def from_query_v1(cls, result, asof=None):
+        """from_query_select() for a result object of the query.v1 endpoint"""
+        data = cls._v1_v1meta.unpack_query_v1(result)
+        instance = cls._v1_v1meta.asset_from_oid(result["_oid"])
+        instance.AsOf = asof
+        data["AsOf"] = asof
+        return instance.with_data(data)
+
     @classmethod
     def create(cls, **newdata):
         """create new asset on server and return created asset proxy instance"""
         return cls._v1_v1meta.create_asset(cls._v1_asset_type_name, newdata)
 
+    @classmethod
+    def create_many(cls, newdatas):
+        """create an asset per dict of newdatas in bulk and return their proxy instances"""
+        return cls._v1_v1meta.create_assets(cls._v1_asset_type_name, newdatas)
+
     def __new__(cls, oid, moment=None):
         """Tries to get an instance out of the cache first, otherwise creates one"""
         cache_key = (cls._v1_asset_type_name, oid, moment)
@@ -125,6 +147,8 @@ class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
             return v
 
     def repr_shallow(self, d):
+        from pprint import pformat as pf
+
         # patch up the dict that pformat sees to avoid repr loops
         return pf(dict((k, self.repr_dummy(v)) for (k, v) in d.items() if v))
 
@@ -148,6 +172,10 @@ class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
             if self._v1_needs_refresh:
                 self._v1_refresh()
             if attr not in list(self._v1_current_data.keys()):
+                if self._v1_query_site is not None:
+                    self._v1_v1meta.select_profiler.single_attr_fetched(
+                        self._v1_query_site, attr
+                    )
                 self._v1_current_data[attr] = self._v1_get_single_attr(attr)
             value = self._v1_current_data[attr]
         return value
@@ -181,12 +209,32 @@ class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
         """Commits the object to the server and invalidates its sync state"""
         if self._v1_needs_commit:
             self._v1_v1meta.update_asset(
-                self._v1_asset_type_name, self._v1_oid, self._v1_new_data
+                self._v1_asset_type_name,
+                self._v1_oid,
+                self._v1_new_data,
+                self._v1_read_data(),
             )
-            self._v1_needs_commit = False
-            self._v1_new_data = {}
-            self._v1_current_data = {}
-            self._v1_needs_refresh = True
+            self._v1_committed()
+
+    def _v1_read_data(self):
+        # only what differs from the data read from the server is sent
+        return None if self._v1_needs_refresh else self._v1_current_data
+
+    def _v1_update_command(self):
+        """The api/asset command of the pending changes, None when nothing changed"""
+        update = self._v1_v1meta.generate_update_command(
+            self._v1_new_data, self._v1_read_data()
+        )
+        if not update:
+            return None
+        return {"from": self.idref, "update": update}
+
+    def _v1_committed(self):
+        """Invalidates the sync state once the changes are written"""
+        self._v1_needs_commit = False
+        self._v1_new_data = {}
+        self._v1_current_data = {}
+        self._v1_needs_refresh = True
 
     def _v1_refresh(self):
         """Syncs the objects from current server data"""
@@ -206,3 +254,51 @@ class BaseAsset(with_metaclass(IterableType, DummyBaseAsset)):
         )
         self._v1_needs_refresh = True
         return result
+
+
+class AssetAttribute(object):
+    """Property of an attribute of the asset classes built by V1Meta.asset_class.  One
+    instance per attribute, holding only its name, so building a class with hundreds of
+    attributes doesn't create a property and closures for each of them."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance._v1_getattr(self.name)
+
+    def __set__(self, instance, value):
+        instance._v1_setattr(self.name, value)
+
+    def __delete__(self, instance):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.name)
+
+
+class SingleRelationAttribute(AssetAttribute):
+    """Single-value relation: the related asset, or a NoneDeref when there is none"""
+
+    __slots__ = ()
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance._v1_getattr(self.name)
+        if value:
+            return value[0]
+        return NoneDeref()
+
+
+class MultiRelationAttribute(AssetAttribute):
+    """Multi-value relation, set from any iterable of assets"""
+
+    __slots__ = ()
+
+    def __set__(self, instance, value):
+        instance._v1_setattr(self.name, list(value))
@@ -0,0 +1,183 @@
+"""
+Writing many assets through the bulk api/asset endpoint.
+
+rest-1.v1 takes one POST per created or updated asset.  Newer VersionOne servers also have
+an api/asset endpoint running a list of commands in a single request: a command with an
+"AssetType" creates an asset, one with "from" and "update" changes the assets it selects.
+A BulkWriter sends the dirty assets of V1Meta.commit() and the assets of create_assets()
+that way, in batches bounded by a number of commands and a payload size:
+
+    v1 = V1Meta(instance_url=url, username=user, password=pw, bulk_writer=BulkWriter())
+    for story in v1.Story.select("Estimate"):
+        story.Estimate = 3
+    errors = v1.commit()   # one request per 500 stories
+    stories = v1.Story.create_many([{"Name": name, "Scope": scope} for name in names])
+
+The results are mapped back to the assets: an updated asset whose command failed keeps its
+changes and its V1CommandError is returned by commit(), created assets are returned in the
+order of their data.  Commands are sent as JSON, the YAML form of the endpoint isn't used.
+"""
+
+import json
+
+from .client import V1Error
+
+DEFAULT_BATCH_SIZE = 500
+
+# encoded size of the commands of a request, a single larger command is sent on its own
+DEFAULT_BATCH_BYTES = 1 << 20
+
+
+class V1CommandError(V1Error):
+    """A command of a bulk request failed.  *asset* is the asset it updated, None for a
+    creation, *index* the position of the command among the commands written"""
+
+    def __init__(self, message, command, asset=None, index=None):
+        super(V1CommandError, self).__init__(message)
+        self.command = command
+        self.asset = asset
+        self.index = index
+
+
+class V1BulkCreateError(V1Error):
+    """Some assets of create_assets() couldn't be created.  *assets* holds the created
+    assets in the order of their data, with None for the failed ones, *errors* the
+    V1CommandError of these"""
+
+    def __init__(self, assets, errors):
+        super(V1BulkCreateError, self).__init__(
+            "%d of %d assets could not be created: %s"
+            % (len(errors), len(assets), errors[0])
+        )
+        self.assets = assets
+        self.errors = errors
+
+
+def command_failures(response):
+    """The (command, message) pairs of the failed commands of an api/asset response"""
+    failures = (response.get("commandFailures") or {}).get("commands") or ()
+    found = []
+    for failure in failures:
+        error = failure.get("error")
+        if isinstance(error, dict):
+            error = error.get("message")
+        found.append((failure.get("command"), error or "Command failed"))
+    return found
+
+
+def created_oids(response):
+    """The oid tokens of the assets created by an api/asset request, in order"""
+    return list((response.get("assetsCreated") or {}).get("oidTokens") or ())
+
+
+class BulkWriter(object):
+    """Writes the creations and updates of a V1Meta through api/asset"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, batch_bytes=DEFAULT_BATCH_BYTES):
+        """
+        :param batch_size: maximum number of commands per request
+        :param batch_bytes: maximum JSON encoded size of the commands of a request
+        """
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+
+    def batches(self, items):
+        """Splits (item, command) pairs in the batches sent in one request each"""
+        batch, size = [], 0
+        for item, command in items:
+            length = len(json.dumps(command))
+            if batch and (
+                len(batch) >= self.batch_size or size + length > self.batch_bytes
+            ):
+                yield batch
+                batch, size = [], 0
+            batch.append((item, command))
+            size += length
+        if batch:
+            yield batch
+
+    def commit(self, v1meta, assets):
+        """Sends the pending changes of *assets*.
+        :return: the errors, the assets of failed commands or requests keep their changes
+        """
+        pending = []
+        seen = set()
+        for asset in assets:
+            if id(asset) in seen or not asset._v1_needs_commit:
+                continue
+            seen.add(id(asset))
+            command = asset._v1_update_command()
+            if command is None:
+                asset._v1_committed()
+            else:
+                pending.append((asset, command))
+        errors = []
+        index = 0
+        for batch in self.batches(pending):
+            try:
+                response = v1meta.server.bulk_assets([c for _, c in batch])
+            except V1Error as e:
+                errors.append(e)
+                index += len(batch)
+                continue
+            failed = {}
+            for command, message in command_failures(response):
+                failed[(command or {}).get("from")] = message
+            for asset, command in batch:
+                if asset.idref in failed:
+                    errors.append(
+                        V1CommandError(failed[asset.idref], command, asset, index)
+                    )
+                else:
+                    asset._v1_committed()
+                index += 1
+        return errors
+
+    def create(self, v1meta, asset_type_name, newdatas):
+        """Creates an asset of *asset_type_name* per dict of *newdatas*.
+        :return: the created assets, in order
+        :raise V1BulkCreateError: when some of them couldn't be created
+        """
+        items = []
+        for index, newdata in enumerate(newdatas):
+            command = {"AssetType": asset_type_name}
+            command.update(v1meta.generate_update_command(newdata))
+            items.append((index, command))
+        assets = [None] * len(items)
+        errors = []
+        for batch in self.batches(items):
+            commands = [c for _, c in batch]
+            try:
+                response = v1meta.server.bulk_assets(commands)
+            except V1Error as e:
+                errors.extend(
+                    V1CommandError(str(e), command, None, index)
+                    for index, command in batch
+                )
+                continue
+            # failures echo their command, the others are created in order
+            failed = {}
+            for command, message in command_failures(response):
+                for position, candidate in enumerate(commands):
+                    if candidate == command and position not in failed:
+                        failed[position] = message
+                        break
+            created = created_oids(response)
+            if len(created) != len(batch) - len(failed):
+                # a failure that couldn't be matched to its command
+                message = "The created assets could not be matched to their data"
+                failed = dict((position, message) for position in range(len(batch)))
+            created = iter(created)
+            for position, (index, command) in enumerate(batch):
+                if position in failed:
+                    errors.append(
+                        V1CommandError(failed[position], command, None, index)
+                    )
+                else:
+                    oidtoken = next(created)
+                    assets[index] = v1meta.asset_from_oid(
+                        ":".join(oidtoken.split(":")[:2])
+                    )
+        if errors:
+            raise V1BulkCreateError(assets, errors)
+        return assets
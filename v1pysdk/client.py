@@ -1,50 +1,24 @@
+import copy
+import json
 import logging
+import threading
+import time
+from contextlib import contextmanager
 
-from urllib.request import (
-    Request,
-    HTTPBasicAuthHandler,
-    HTTPCookieProcessor,
-    HTTPPasswordMgrWithDefaultRealm,
-    build_opener,
-)
-from urllib.error import HTTPError
 from urllib.parse import urlencode
 from urllib.parse import urlunparse, urlparse
 
 from xml.etree import ElementTree
 
-NTLM_FOUND = False
-
-try:
-    from ntlm3.HTTPNtlmAuthHandler import HTTPNtlmAuthHandler
-except ImportError:
-    logging.warn("Windows integrated authentication module (ntlm) not found.")
-else:
-    NTLM_FOUND = True
-
-    class CustomHTTPNtlmAuthHandler(HTTPNtlmAuthHandler):
-        # The following code was a recommended change to the existing.  However unittesting proves that it
-        # and the existing obscure authentication failures.  There seems to be no actual reason to be doing
-        # this unless there was a particular issue with the HTTPNtlmAuthHandler in some specific version of
-        # urllib2 for Python2 that no longer exists.  Using the default handler provably works correctly
-        pass
-
-    # """ A version of HTTPNtlmAuthHandler that handles errors (better).
-    #    The default version doesn't use `self.parent.open` in it's
-    #    error handler, and completely bypasses the normal `OpenerDirector`
-    #    call chain, most importantly `HTTPErrorProcessor.http_response`,
-    #    which normally raises an error for 'bad' http status codes..
-    # """
-    # def http_error_401(self, req, fp, code, msg, hdrs):
-    #    response = HTTPNtlmAuthHandler.http_error_401(self, req, fp, code, msg, hdrs)
-    #    if not (200 <= response.code < 300):
-    #        if response.code == 401:
-    #            raise HTTPError(req.get_full_url(), response.code, response.msg, response.info(), fp)
-    #        else:
-    #            response = self.parent.error(
-    #                'http', req, response, response.code, response.msg,
-    #                response.info())
-    #    return response
+from .lanes import current_lane, use_lane
+from .singleflight import SingleFlight
+from .timeouts import as_deadline, current_deadline, use_deadline
+
+# number of bytes of a response body written to the debug log by default
+DEFAULT_LOG_BODY_LIMIT = 4096
+
+# size of the blocks attachment bodies are copied in when streaming to or from files
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
 
 class V1Error(Exception):
@@ -55,6 +29,56 @@ class V1AssetNotFoundError(V1Error):
     pass
 
 
+class V1TimeoutError(V1Error):
+    pass
+
+
+class UploadBody(object):
+    """Request body streaming a binary file object one chunk at a time.  Every send starts
+    again from the position the file had, so urllib can send the body a second time when the
+    server answers with an authentication challenge.  A file that can't seek can only be
+    sent once."""
+
+    def __init__(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.progress = progress
+        # start position and size, None for non seekable files
+        self.start = None
+        self.total = None
+        try:
+            start = fileobj.tell()
+            self.total = fileobj.seek(0, 2) - start
+            fileobj.seek(start)
+            self.start = start
+        except (AttributeError, OSError):
+            pass
+        self._sent = False
+
+    def __iter__(self):
+        if self._sent:
+            if self.start is None:
+                raise V1Error(
+                    "The attachment body must be sent again (the server asked for "
+                    "authentication) but its file can't seek back: upload from a "
+                    "seekable file, or send the credentials preemptively"
+                )
+            self.fileobj.seek(self.start)
+        self._sent = True
+        return self._chunks()
+
+    def _chunks(self):
+        sent = 0
+        while True:
+            chunk = self.fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            sent += len(chunk)
+            yield chunk
+            if self.progress is not None:
+                self.progress(sent, self.total)
+
+
 class V1Server(object):
     """Accesses a V1 HTTP server as a client of the XML API protocol"""
 
@@ -70,6 +94,15 @@ class V1Server(object):
         loglevel=logging.ERROR,
         use_password_as_token=False,
         use_oauth_path=False,
+        instrumentation=None,
+        log_body_limit=DEFAULT_LOG_BODY_LIMIT,
+        single_flight=True,
+        timeout=None,
+        hedging=None,
+        preemptive_auth=None,
+        cookie_jar=None,
+        cookie_file=None,
+        lanes=None,
     ):
         """
         scheme and object's instance_url attributes.
@@ -84,11 +117,31 @@ class V1Server(object):
         :param loglevel: logging level
         :param use_password_as_token: Use password as token
         :param use_oauth_path: Use OAuth path
+        :param instrumentation: optional v1pysdk.instrumentation.Instrumentation collecting
+                                request metrics and running request hooks
+        :param log_body_limit: maximum number of bytes of a response body written to the
+                               debug log, None for no limit
+        :param single_flight: concurrent identical GETs share one request, each getting a
+                              copy of its parsed result, see v1pysdk.singleflight
+        :param timeout: socket timeout of the requests in seconds, None to wait forever
+        :param hedging: optional v1pysdk.timeouts.Hedging sending a second attempt of the
+                        GETs that are slow to answer
+        :param preemptive_auth: send the Basic credentials with the first request instead of
+                                waiting for a 401 challenge.  None (the default) only does so
+                                over https, as the credentials are sent in clear.
+        :param cookie_jar: http.cookiejar.CookieJar to share the session cookies of other
+                           V1Server instances
+        :param cookie_file: file the session cookies are loaded from and saved to, so short
+                            lived processes can reuse an authenticated session
+        :param lanes: optional v1pysdk.lanes.RequestLanes bounding the requests in flight
+                      and sharing them between priority lanes, see lane()
         """
         modulelogname = "v1pysdk.client"
         logname = "%s.%s" % (logparent, modulelogname) if logparent else None
+        self.logparent = logparent
         self.logger = logging.getLogger(logname)
         self.logger.setLevel(loglevel)
+        self.log_body_limit = log_body_limit
         if instance_url:
             self.instance_url = instance_url
             parsed = urlparse(instance_url)
@@ -100,47 +153,92 @@ class V1Server(object):
             self.instance = instance.strip("/")
             self.scheme = scheme
             self.instance_url = self.build_url("")
-        self.AUTH_HANDLERS = [HTTPBasicAuthHandler]
-        if NTLM_FOUND:
-            self.AUTH_HANDLERS.append(CustomHTTPNtlmAuthHandler)
         self.username = username
         self.password = password
         self.use_password_as_token = use_password_as_token
-        self._install_opener()
+        self.instrumentation = instrumentation
+        self.single_flight = SingleFlight() if single_flight else None
+        self.timeout = timeout
+        self.hedging = hedging
+        self.lanes = lanes
+        self.preemptive_auth = preemptive_auth
+        self.cookie_file = cookie_file
+        # the cookie jar and the opener are only made for the first request, see v1pysdk.opener
+        self._cookie_jar = cookie_jar
+        # the opener authenticates with the credentials given here, even when built later
+        self._credentials = (username, password)
+        self._opener = None
+        self._opener_lock = threading.Lock()
         # On-premise installations will not allow token based auth on usual path
         if use_oauth_path is True:
             self.rest_api_path = "rest-1.oauth.v1"
         else:
             self.rest_api_path = "rest-1.v1"
 
-    def _install_opener(self):
-        base_url = self.build_url("")
-        password_manager = HTTPPasswordMgrWithDefaultRealm()
-        password_manager.add_password(
-            realm=None, uri=base_url, user=self.username, passwd=self.password
-        )
-        handlers = [
-            HandlerClass(password_manager) for HandlerClass in self.AUTH_HANDLERS
-        ]
-        self.opener = build_opener(*handlers)
-        if self.use_password_as_token:
-            self.opener.addheaders.append(("Authorization", "Bearer " + self.password))
-        self.opener.add_handler(HTTPCookieProcessor())
-
-    def http_get(self, url):
+    @property
+    def cookie_jar(self):
+        """The cookie jar of the session cookies, loaded from cookie_file if there is one"""
+        with self._opener_lock:
+            if self._cookie_jar is None:
+                from .opener import load_cookie_jar
+
+                self._cookie_jar = load_cookie_jar(self.cookie_file, self.logger)
+            return self._cookie_jar
+
+    @property
+    def opener(self):
+        """The urllib opener of the requests, built on first use"""
+        opener = self._opener
+        if opener is None:
+            from .opener import build_server_opener
+
+            jar = self.cookie_jar
+            with self._opener_lock:
+                if self._opener is None:
+                    self._opener = build_server_opener(self, jar, *self._credentials)
+                opener = self._opener
+        return opener
+
+    @opener.setter
+    def opener(self, opener):
+        """Replaces the opener of the requests, e.g. with one carrying handlers of its own"""
+        with self._opener_lock:
+            self._opener = opener
+
+    def _open(self, request, timeout=None):
+        if timeout is None:
+            return self.opener.open(request)
+        return self.opener.open(request, timeout=timeout)
+
+    def http_get(self, url, accept=None, timeout=None):
+        from urllib.request import Request
+
         request = Request(url)
         request.add_header("Content-Type", "text/xml;charset=UTF-8")
-        response = self.opener.open(request)
+        if accept is not None:
+            request.add_header("Accept", accept)
+        response = self._open(request, timeout)
         return response
 
-    def http_post(self, url, data=""):
+    def http_post(
+        self,
+        url,
+        data="",
+        content_type="text/xml;charset=UTF-8",
+        accept=None,
+        timeout=None,
+    ):
+        from urllib.request import Request
+
         encoded_data = data
         # encode to byte data as is needed if  it's a string
         if isinstance(data, str):
             encoded_data = data.encode("utf-8")
         request = Request(url, encoded_data)
-        request.add_header("Content-Type", "text/xml;charset=UTF-8")
-        response = self.opener.open(request)
+        request.add_header("Content-Type", content_type)
+        if accept is not None:
+            request.add_header("Accept", accept)
+        response = self._open(request, timeout)
         return response
 
     def build_url(self, path, query="", fragment="", params=""):
@@ -153,72 +251,380 @@ class V1Server(object):
         return url
 
     def _debug_headers(self, headers):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         self.logger.debug("Headers:")
-        for hdr in str(headers).split("\n"):
-            self.logger.debug("  %s" % hdr)
+        for name, value in headers.items():
+            self.logger.debug("  %s: %s", name, value)
 
     def _debug_body(self, body, headers):
+        # bodies can be several megabytes, only look at them when they'll be logged
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         try:
             ctype = headers["content-type"]
-        except AttributeError:
+        except (AttributeError, TypeError):
             ctype = None
-        if ctype is not None and ctype[:5] == "text/":
-            self.logger.debug("Body:")
-            for line in str(body).split("\n"):
-                self.logger.debug("  %s" % line)
+        if ctype is not None and (ctype[:5] == "text/" or "json" in ctype):
+            limit = self.log_body_limit
+            # slicing a memoryview doesn't copy, only the logged part is decoded
+            logged = memoryview(body)[:limit] if limit is not None else body
+            text = bytes(logged).decode("utf-8", errors="replace")
+            if limit is not None and len(body) > limit:
+                self.logger.debug(
+                    "Body (first %d of %d bytes):", len(logged), len(body)
+                )
+            else:
+                self.logger.debug("Body:")
+            for line in text.split("\n"):
+                self.logger.debug("  %s", line)
         else:
             self.logger.debug(
-                "Body: non-textual content (Content-Type: %s). Not logged." % ctype
+                "Body: non-textual content (Content-Type: %s). Not logged.", ctype
             )
 
-    def fetch(self, path, query="", postdata=None):
+    def request_timeout(self, timeout=None, deadline=None):
+        """Socket timeout of a request: *timeout*, or the timeout of the server, capped by
+        what's left of *deadline*.  Raises V1TimeoutError once the deadline is past."""
+        if timeout is None:
+            timeout = self.timeout
+        deadline = as_deadline(deadline)
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise V1TimeoutError("Deadline of %ss exceeded" % deadline.seconds)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def lane(self, name):
+        """Context manager running the requests made by the current thread in the block in
+        lane *name* of the RequestLanes of the server, e.g. "batch" for background work
+        """
+        if self.lanes is not None and name not in self.lanes.lanes:
+            raise ValueError("Unknown request lane: %r" % (name,))
+        return use_lane(name)
+
+    @contextmanager
+    def _lane_slot(self, timeout=None):
+        """Holds a slot of the request lanes of the server, if it has some, in the block.
+        Gives the seconds waited for it."""
+        lanes = self.lanes
+        if lanes is None:
+            yield 0.0
+            return
+        t0 = time.perf_counter()
+        lane = lanes.acquire(timeout=timeout)
+        if lane is None:
+            raise V1TimeoutError("No request slot free within %ss" % timeout)
+        try:
+            waited = time.perf_counter() - t0
+            if self.instrumentation is not None:
+                self.instrumentation.request_queued(lane.name, waited)
+            yield waited
+        finally:
+            lanes.release(lane)
+
+    def fetch(
+        self, path, query="", postdata=None, accept=None, timeout=None, deadline=None
+    ):
         """Perform an HTTP GET or POST depending on whether postdata is present"""
+        deadline = as_deadline(deadline)
+        timeout = self.request_timeout(timeout, deadline)
+        instrumentation = self.instrumentation
+        with use_deadline(deadline):
+            if instrumentation is None:
+                return self._fetch(
+                    path, query, postdata, accept=accept, timeout=timeout
+                )
+            record = instrumentation.request_started(
+                "GET" if postdata is None else "POST", path, self.build_url(path, query)
+            )
+            try:
+                return self._fetch(
+                    path, query, postdata, record, accept=accept, timeout=timeout
+                )
+            finally:
+                instrumentation.request_finished(record)
+
+    def _fetch(
+        self,
+        path,
+        query="",
+        postdata=None,
+        record=None,
+        content_type=None,
+        accept=None,
+        timeout=None,
+    ):
+        with self._lane_slot(timeout) as waited:
+            if waited and timeout is not None:
+                # the wait for the slot is part of the time the request was given
+                timeout -= waited
+                if timeout <= 0:
+                    raise V1TimeoutError(
+                        "No time left after waiting for a request slot"
+                    )
+            try:
+                return self._fetch_now(
+                    path, query, postdata, record, content_type, accept, timeout
+                )
+            finally:
+                if postdata is not None and self.single_flight is not None:
+                    # the GETs made after a change don't share those made before it
+                    self.single_flight.forget()
+
+    def _fetch_now(
+        self,
+        path,
+        query="",
+        postdata=None,
+        record=None,
+        content_type=None,
+        accept=None,
+        timeout=None,
+    ):
+        if postdata is None and self.hedging is not None:
+            # the attempts run concurrently, only the outcome is recorded
+            (exception, body), hedged = self.hedging.call(
+                lambda: self._fetch_once(
+                    path, query, None, None, content_type, accept, timeout
+                )
+            )
+            if record is not None:
+                record.status = exception.code if exception else 200
+                record.bytes = len(body)
+            if hedged and self.instrumentation is not None:
+                self.instrumentation.request_hedged(path)
+            return exception, body
+        return self._fetch_once(
+            path, query, postdata, record, content_type, accept, timeout
+        )
+
+    def _fetch_once(
+        self,
+        path,
+        query="",
+        postdata=None,
+        record=None,
+        content_type=None,
+        accept=None,
+        timeout=None,
+    ):
+        from urllib.error import HTTPError, URLError
+
         url = self.build_url(path, query=query)
-        self.logger.debug("URL: %s" % url)
+        self.logger.debug("URL: %s", url)
         try:
             if postdata is not None:
                 if isinstance(postdata, dict):
                     postdata = urlencode(postdata)
-                    self.logger.debug("postdata: %s" % postdata)
-                response = self.http_post(url, postdata)
+                    self.logger.debug("postdata: %s", postdata)
+                if content_type is None:
+                    response = self.http_post(
+                        url, postdata, accept=accept, timeout=timeout
+                    )
+                else:
+                    response = self.http_post(
+                        url, postdata, content_type, accept, timeout
+                    )
             else:
-                response = self.http_get(url)
-            body = response.read()
+                response = self.http_get(url, accept=accept, timeout=timeout)
+            if record is not None:
+                record.first_byte = time.perf_counter() - record.started
+                record.status = response.status
+            body = self._read_body(response, url)
+            if record is not None:
+                record.download = (
+                    time.perf_counter() - record.started - record.first_byte
+                )
+                record.bytes = len(body)
             self._debug_headers(response.headers)
             self._debug_body(body, response.headers)
             return None, body
         except HTTPError as e:
+            if record is not None:
+                record.status = e.code
+                record.error = e
             if e.code == 401:
                 raise
             body = e.fp.read()
+            if record is not None:
+                record.bytes = len(body)
             self._debug_headers(e.headers)
             self._debug_body(body, e.headers)
             return e, body
+        except (TimeoutError, URLError) as e:
+            if record is not None:
+                record.error = e
+            if isinstance(e, TimeoutError) or isinstance(e.reason, TimeoutError):
+                raise V1TimeoutError("Timed out after %ss: %s" % (timeout, url)) from e
+            raise
+        except Exception as e:
+            if record is not None:
+                record.error = e
+            raise
+
+    def _read_body(self, response, url):
+        """The body of *response*.  Within a deadline it's read a chunk at a time, and given
+        up once the deadline is past: the socket timeout only bounds each read."""
+        deadline = current_deadline()
+        if deadline is None:
+            return response.read()
+        chunks = []
+        try:
+            while True:
+                chunk = response.read1(DEFAULT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if deadline.remaining() <= 0:
+                    raise V1TimeoutError(
+                        "Deadline of %ss exceeded reading %s" % (deadline.seconds, url)
+                    )
+        except BaseException:
+            response.close()
+            raise
+        return b"".join(chunks)
 
     def handle_non_xml_response(self, body, exception, msg, postdata):
         if exception.code >= 500:
             # 5XX error codes mean we won't have an XML response to parse
-            self.logger.error("{0} during {1}".format(exception, msg))
+            self.logger.error("%s during %s", exception, msg)
             if postdata is not None:
                 self.logger.error(postdata)
             raise exception
 
-    def get_xml(self, path, query="", postdata=None):
+    def _shared_get(self, kind, path, query, function, timeout=None):
+        """function() for a GET, shared with the identical GETs in flight.  A caller sharing
+        the GET of another waits for it at most *timeout* seconds."""
+        if self.single_flight is None:
+            return function()
+        key = (kind, self.build_url(path, query))
+        if self.lanes is not None:
+            # a GET of the interactive lane doesn't wait behind one queued as batch
+            key += (self.lanes.lane_of(current_lane()).name,)
+        try:
+            document, shared = self.single_flight.do(
+                key, function, timeout, copy.deepcopy
+            )
+        except TimeoutError as e:
+            raise V1TimeoutError(
+                "Timed out after %ss waiting for %s" % (timeout, key[1])
+            ) from e
+        if shared and self.instrumentation is not None:
+            self.instrumentation.request_collapsed(path)
+        return document
+
+    def get_xml(self, path, query="", postdata=None, timeout=None, deadline=None):
+        """The parsed XML response of a request.
+        :param timeout: socket timeout in seconds, the timeout of the server by default
+        :param deadline: Deadline (or seconds) the request must be done by
+        """
+        deadline = as_deadline(deadline)
+        timeout = self.request_timeout(timeout, deadline)
+        with use_deadline(deadline):
+            if postdata is None:
+                return self._shared_get(
+                    "xml",
+                    path,
+                    query,
+                    lambda: self._get_xml(path, query, None, timeout),
+                    timeout,
+                )
+            return self._get_xml(path, query, postdata, timeout)
+
+    def _get_xml(self, path, query="", postdata=None, timeout=None):
         verb = "HTTP POST to " if postdata else "HTTP GET from "
-        msg = verb + path
-        self.logger.info(msg)
+        self.logger.info("%s%s", verb, path)
         # print(path, query)
-        exception, body = self.fetch(path, query=query, postdata=postdata)
+        instrumentation = self.instrumentation
+        record = None
+        if instrumentation is not None:
+            record = instrumentation.request_started(
+                "GET" if postdata is None else "POST", path, self.build_url(path, query)
+            )
+        try:
+            exception, body = self._fetch(
+                path, query=query, postdata=postdata, record=record, timeout=timeout
+            )
+            if exception:
+                msg = verb + path
+                self.handle_non_xml_response(body, exception, msg, postdata)
+                self.logger.warning("%s during %s", exception, msg)
+                if postdata is not None:
+                    self.logger.warning(postdata)
+
+            if record is None:
+                document = ElementTree.fromstring(body)
+            else:
+                t0 = time.perf_counter()
+                document = ElementTree.fromstring(body)
+                record.parse = time.perf_counter() - t0
+        finally:
+            if record is not None:
+                instrumentation.request_finished(record)
         if exception:
-            self.handle_non_xml_response(body, exception, msg, postdata)
-
-        self.logger.warning("{0} during {1}".format(exception, msg))
-        if postdata is not None:
-            self.logger.warning(postdata)
+            exception.xmldoc = document
+            if exception.code == 404:
+                raise V1AssetNotFoundError(exception)
+            elif exception.code == 400:
+                raise V1Error("\n" + str(body))
+            else:
+                raise V1Error(exception)
+        return document
 
-        document = ElementTree.fromstring(body)
+    def get_json(self, path, payload=None, query="", timeout=None, deadline=None):
+        """POSTs *payload* encoded as JSON (or GETs when there is none) and returns the decoded
+        JSON response, raising V1Error like get_xml() does for error responses.  The response
+        is asked for as JSON, which rest-1.v1 honours as well."""
+        deadline = as_deadline(deadline)
+        timeout = self.request_timeout(timeout, deadline)
+        with use_deadline(deadline):
+            if payload is None:
+                return self._shared_get(
+                    "json",
+                    path,
+                    query,
+                    lambda: self._get_json(path, None, query, timeout),
+                    timeout,
+                )
+            postdata = json.dumps(payload).encode("utf-8")
+            return self._get_json(path, postdata, query, timeout)
+
+    def _get_json(self, path, postdata, query="", timeout=None):
+        verb = "HTTP POST to " if postdata else "HTTP GET from "
+        self.logger.info("%s%s", verb, path)
+        instrumentation = self.instrumentation
+        record = None
+        if instrumentation is not None:
+            record = instrumentation.request_started(
+                "GET" if postdata is None else "POST", path, self.build_url(path, query)
+            )
+        try:
+            exception, body = self._fetch(
+                path,
+                query=query,
+                postdata=postdata,
+                record=record,
+                content_type="application/json",
+                accept="application/json",
+                timeout=timeout,
+            )
+            if exception:
+                msg = verb + path
+                self.handle_non_xml_response(body, exception, msg, postdata)
+                self.logger.warning("%s during %s", exception, msg)
+                if postdata is not None:
+                    self.logger.warning(postdata)
+            else:
+                t0 = time.perf_counter()
+                document = json.loads(body)
+                if record is not None:
+                    record.parse = time.perf_counter() - t0
+        finally:
+            if record is not None:
+                instrumentation.request_finished(record)
         if exception:
-            exception.xmldoc = document
             if exception.code == 404:
                 raise V1AssetNotFoundError(exception)
             elif exception.code == 400:
@@ -227,29 +633,49 @@ class V1Server(object):
                 raise V1Error(exception)
         return document
 
-    def get_asset_xml(self, asset_type_name, oid, moment="none"):
+    def get_query_v1_json(self, queries, deadline=None):
+        """Runs one or several query.v1 queries (dicts) in a single request.
+        :return: a list of results for each query, in order"""
+        return self.get_json("/query.v1", list(queries), deadline=deadline)
+
+    def bulk_assets(self, commands, deadline=None):
+        """Runs api/asset commands (dicts) in a single request, see v1pysdk.bulk.
+        :return: the decoded response, with the oid tokens of the assets created and
+                 modified and the commands that failed
         """
-        Returns an array of asset xmls. possible moment values are:
+        return self.get_json("/api/asset", list(commands), deadline=deadline)
+
+    def asset_path(self, asset_type_name, oid, moment="none"):
+        """
+        Path of an asset. possible moment values are:
         'every' or 'none' or the specific moment
         """
         if moment == "none" or moment is None:
-            path = "/{0}/Data/{1}/{2}".format(self.rest_api_path, asset_type_name, oid)
-            # return self.get_xml(path) # old style, not history-aware
-            return self.get_xml(path)
+            # old style, not history-aware
+            return "/{0}/Data/{1}/{2}".format(self.rest_api_path, asset_type_name, oid)
 
         elif moment == "every":
-            path = "/{0}/Hist/{1}/{2}".format(self.rest_api_path, asset_type_name, oid)
-            return self.get_xml(path)
+            return "/{0}/Hist/{1}/{2}".format(self.rest_api_path, asset_type_name, oid)
 
         elif isinstance(moment, int):
-            path = "/{0}/Data/{1}/{2}/{3}".format(
+            return "/{0}/Data/{1}/{2}/{3}".format(
                 self.rest_api_path, asset_type_name, oid, moment
             )
-            return self.get_xml(path)
 
         else:
             raise V1Error("Invalid moment passed for asset.")
 
+    def get_asset_xml(self, asset_type_name, oid, moment="none"):
+        """
+        Returns an array of asset xmls. possible moment values are:
+        'every' or 'none' or the specific moment
+        """
+        return self.get_xml(self.asset_path(asset_type_name, oid, moment))
+
+    def get_asset_json(self, asset_type_name, oid, moment="none"):
+        """get_asset_xml() returning the JSON document of the asset"""
+        return self.get_json(self.asset_path(asset_type_name, oid, moment))
+
     def get_query_xml(self, api, asset_type_name, where=None, sel=None):
         path = "/{0}/{1}/{2}".format(self.rest_api_path, api, asset_type_name)
         query = {}
@@ -268,16 +694,21 @@ class V1Server(object):
         query = {"op": opname}
         return self.get_xml(path, query=query, postdata={})
 
-    def get_attr(self, asset_type_name, oid, attrname, moment=None):
+    def attr_path(self, asset_type_name, oid, attrname, moment=None):
         if moment:
-            path = "/{0}/Data/{1}/{2}/{4}/{3}".format(
+            return "/{0}/Data/{1}/{2}/{4}/{3}".format(
                 self.rest_api_path, asset_type_name, oid, attrname, moment
             )
-        else:
-            path = "/{0}/Data/{1}/{2}/{3}".format(
-                self.rest_api_path, asset_type_name, oid, attrname
-            )
-        return self.get_xml(path)
+        return "/{0}/Data/{1}/{2}/{3}".format(
+            self.rest_api_path, asset_type_name, oid, attrname
+        )
+
+    def get_attr(self, asset_type_name, oid, attrname, moment=None):
+        return self.get_xml(self.attr_path(asset_type_name, oid, attrname, moment))
+
+    def get_attr_json(self, asset_type_name, oid, attrname, moment=None):
+        """get_attr() returning the JSON document of the attribute or relation"""
+        return self.get_json(self.attr_path(asset_type_name, oid, attrname, moment))
 
     def create_asset(self, asset_type_name, xmldata, context_oid=""):
         body = ElementTree.tostring(xmldata, encoding="utf-8")
@@ -301,15 +732,90 @@ class V1Server(object):
 
     set_attachment_blob = get_attachment_blob
 
-    def get(self, url):
+    def download_attachment(
+        self, attachment_id, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, progress=None
+    ):
+        """
+        Copies the attachment body into the binary file object *fileobj* one chunk at a
+        time, so memory use is bounded by *chunk_size* whatever the size of the attachment.
+        :param attachment_id: attachment id
+        :param fileobj: writable binary file object
+        :param chunk_size: number of bytes read and written at a time
+        :param progress: optional callable, called as progress(bytes_copied, total_bytes)
+                         after each chunk. total_bytes is None when the server doesn't tell.
+        :return: number of bytes copied
+        """
+        url = self.build_url("/attachment.v1/{0}".format(attachment_id))
+        with self._lane_slot(self.timeout):
+            return self._download(url, fileobj, chunk_size, progress)
+
+    def _download(self, url, fileobj, chunk_size, progress):
+        response = self.http_get(url, timeout=self.timeout)
         try:
-            request = Request(url)
-            request.add_header("Content-Type", "text/xml;charset=UTF-8")
-            response = self.opener.open(request)
-            body = response.read()
-            return None, body
-        except HTTPError as e:
-            if e.code == 401:
-                raise
-            body = e.fp.read()
-            return e, body
+            length = response.headers.get("Content-Length")
+            total = int(length) if length is not None else None
+            copied = 0
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                fileobj.write(chunk)
+                copied += len(chunk)
+                if progress is not None:
+                    progress(copied, total)
+        finally:
+            response.close()
+        return copied
+
+    def upload_attachment(
+        self,
+        attachment_id,
+        fileobj,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        progress=None,
+        content_type="application/octet-stream",
+    ):
+        """
+        Sends the content of the binary file object *fileobj* as the attachment body, reading
+        it one chunk at a time.  Seekable files are sent with a Content-Length, anything else
+        with a chunked transfer encoding.  A seekable file is read again when the body has to
+        be resent after an authentication challenge, for anything else V1Error is raised.
+        :param attachment_id: attachment id
+        :param fileobj: readable binary file object
+        :param chunk_size: number of bytes read and sent at a time
+        :param progress: optional callable, called as progress(bytes_sent, total_bytes)
+                         after each chunk. total_bytes is None for non seekable files.
+        :param content_type: content type of the attachment body
+        :return: response body
+        """
+        from urllib.request import Request
+
+        body = UploadBody(fileobj, chunk_size, progress)
+        url = self.build_url("/attachment.v1/{0}".format(attachment_id))
+        request = Request(url, body, method="POST")
+        request.add_header("Content-Type", content_type)
+        if body.total is not None:
+            request.add_header("Content-Length", str(body.total))
+        with self._lane_slot(self.timeout):
+            response = self._open(request, self.timeout)
+            try:
+                return response.read()
+            finally:
+                response.close()
+
+    def get(self, url):
+        from urllib.error import HTTPError
+        from urllib.request import Request
+
+        request = Request(url)
+        request.add_header("Content-Type", "text/xml;charset=UTF-8")
+        with self._lane_slot(self.timeout):
+            try:
+                response = self._open(request, self.timeout)
+                body = response.read()
+                return None, body
+            except HTTPError as e:
+                if e.code == 401:
+                    raise
+                body = e.fp.read()
+                return e, body
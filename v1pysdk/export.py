@@ -0,0 +1,565 @@
+"""
+Streams whole asset types out of VersionOne into CSV or JSON Lines files.
+
+Results are requested a page at a time, the next pages being fetched and parsed
+on a background thread while the current one is written, and nothing but the
+pages in flight is kept in memory, so the size of an export is only bounded by
+the disk.  A checkpoint file next to the output records the next page after
+every written page, and an interrupted export started again with resume=True
+continues from there.
+
+Parsing the XML is CPU bound and runs on a single core under the GIL.  With
+processes > 1 the results are split in ranges of pages, each exported by a
+worker process with its own V1Server into a temporary shard file, and the
+shards are appended to the output in order as they complete.
+
+    python -m v1pysdk export Story Defect --select Name,Estimate,Owners \\
+        --where "AssetState!='Closed'" --format jsonl --output export/ \\
+        --url https://www14.v1host.com/v1sdktesting --token ...
+"""
+
+import csv
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .opener import load_cookie_jar
+from .query import DEFAULT_PAGE_SIZE
+from .v1meta import V1Meta
+
+FORMATS = ("csv", "jsonl")
+
+# number of pages fetched ahead of the one being written
+DEFAULT_PREFETCH = 2
+
+# separator of the values of multi-value attributes and relations in CSV cells
+LIST_SEPARATOR = ";"
+
+# number of pages exported by each worker process task
+DEFAULT_SHARD_PAGES = 4
+
+# errors: list of (start, stop, message) for the failed ranges of a sharded export
+ExportResult = namedtuple(
+    "ExportResult", "asset_type rows pages seconds next_start errors"
+)
+
+
+def prefetch(iterable, depth=DEFAULT_PREFETCH):
+    """Iterate over *iterable* on a background thread, keeping up to *depth* items ready.
+    Exceptions raised by the iterable are raised again by the returned generator."""
+    items = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+        else:
+            put((done, None))
+
+    thread = threading.Thread(target=produce, name="v1pysdk-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # the consumer stopped early: let the producer thread finish
+        stop.set()
+        thread.join()
+
+
+def asset_rows(xml, unpack):
+    """The flat values of every asset of a query result, with its idref under "id" """
+    for asset in xml.findall("Asset"):
+        values = unpack(asset)
+        values["id"] = asset.get("id")
+        yield values
+
+
+class CsvRowWriter(object):
+    """Writes the selected values as CSV, multi-values joined with LIST_SEPARATOR"""
+
+    def __init__(self, fileobj, columns):
+        self.columns = columns
+        self.writer = csv.writer(fileobj)
+
+    def write_header(self):
+        self.writer.writerow(self.columns)
+
+    def write(self, values):
+        row = []
+        for column in self.columns:
+            value = values.get(column)
+            if value is None:
+                value = ""
+            elif isinstance(value, list):
+                value = LIST_SEPARATOR.join(v for v in value if v is not None)
+            row.append(value)
+        self.writer.writerow(row)
+
+
+class JsonlRowWriter(object):
+    """Writes one JSON object per line, multi-values as lists"""
+
+    def __init__(self, fileobj, columns):
+        self.fileobj = fileobj
+        self.columns = columns
+
+    def write_header(self):
+        pass
+
+    def write(self, values):
+        row = dict((column, values.get(column)) for column in self.columns)
+        self.fileobj.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+ROW_WRITERS = {"csv": CsvRowWriter, "jsonl": JsonlRowWriter}
+
+
+class Export(object):
+    """Export of one asset type.
+
+    export = Export(v1, "Story", ["Name", "Estimate", "Owners"], where="Estimate>'3'")
+    result = export.to_file("stories.csv", resume=True)
+    """
+
+    def __init__(
+        self,
+        v1meta,
+        asset_type_name,
+        select,
+        where=None,
+        sort=None,
+        format="csv",
+        page_size=DEFAULT_PAGE_SIZE,
+        prefetch=DEFAULT_PREFETCH,
+        progress=None,
+    ):
+        """
+        :param v1meta: V1Meta instance to read from
+        :param asset_type_name: the asset type to export
+        :param select: attribute names exported, after the asset "id"
+        :param where: optional filter expression, as for V1Query.filter()
+        :param sort: sort attributes, by ID by default so that pages are stable for resuming
+        :param format: "csv" or "jsonl"
+        :param page_size: number of assets requested at a time
+        :param prefetch: number of pages fetched ahead of the one being written
+        :param progress: optional callable, called as progress(asset_type_name, rows,
+                         rows_per_second) after each page
+        """
+        if format not in FORMATS:
+            raise ValueError("Unknown export format: " + format)
+        self.v1meta = v1meta
+        self.asset_type_name = asset_type_name
+        self.select = list(select)
+        self.where = where
+        self.sort = list(sort or ["ID"])
+        self.format = format
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.progress = progress
+        self.columns = ["id"] + self.select
+
+    def query(self):
+        query = (
+            self.v1meta.asset_class(self.asset_type_name)
+            .select(*self.select)
+            .sort(*self.sort)
+        )
+        if self.where:
+            query.filter(self.where)
+        return query
+
+    def settings(self):
+        """What a checkpoint must match to be resumed"""
+        return {
+            "asset_type": self.asset_type_name,
+            "select": self.select,
+            "where": self.where,
+            "sort": self.sort,
+            "format": self.format,
+            "page_size": self.page_size,
+        }
+
+    def pages(self, start=0, stop=None):
+        """(page start, xml) of the pages from *start*, up to the one ending at *stop*"""
+        for page_start, xml in self.query().page_xml(self.page_size, start):
+            yield page_start, xml
+            if stop is not None and page_start + self.page_size >= stop:
+                return
+
+    def _report_progress(self, rows, exported, t0):
+        if self.progress is not None:
+            elapsed = time.perf_counter() - t0
+            self.progress(
+                self.asset_type_name, rows, exported / elapsed if elapsed else 0.0
+            )
+
+    def run(self, fileobj, start=0, rows=0, header=True, on_page=None, stop=None):
+        """Write the results from *start* on to the text file *fileobj*.
+
+        :param start: index of the first asset to export
+        :param rows: number of rows already exported, when resuming
+        :param header: write the CSV header first
+        :param on_page: optional callable, called as on_page(next_start, rows) after each
+                        page has been written
+        :param stop: index where to stop, the end of the results by default
+        :return: ExportResult
+        """
+        writer = ROW_WRITERS[self.format](fileobj, self.columns)
+        if header:
+            writer.write_header()
+        unpack = self.v1meta.unpack_asset_values
+        t0 = time.perf_counter()
+        exported = 0
+        pages = 0
+        next_start = start
+        for page_start, xml in prefetch(self.pages(start, stop), self.prefetch):
+            for values in asset_rows(xml, unpack):
+                writer.write(values)
+                exported += 1
+            pages += 1
+            next_start = page_start + self.page_size
+            if on_page is not None:
+                on_page(next_start, rows + exported)
+            self._report_progress(rows + exported, exported, t0)
+        return ExportResult(
+            self.asset_type_name,
+            rows + exported,
+            pages,
+            time.perf_counter() - t0,
+            next_start,
+            [],
+        )
+
+    def run_sharded(
+        self,
+        fileobj,
+        processes,
+        start=0,
+        rows=0,
+        header=True,
+        on_page=None,
+        shard_pages=DEFAULT_SHARD_PAGES,
+    ):
+        """Like run(), with the pages exported by *processes* worker processes.
+
+        The results are cut in ranges of *shard_pages* pages.  Each range is exported by a
+        worker into a temporary file and appended to *fileobj* in order, so the output is
+        the same as run() would write.  A failed range is reported in the result errors
+        along with the failures of the ranges already running; the output stops before
+        it, so resuming from the checkpoint completes the export.
+        """
+        writer = ROW_WRITERS[self.format](fileobj, self.columns)
+        if header:
+            writer.write_header()
+        t0 = time.perf_counter()
+        total = self.query().page(size=1).max_length()
+        shard_size = self.page_size * shard_pages
+        ranges = deque(
+            (shard_start, min(shard_start + shard_size, total))
+            for shard_start in range(start, total, shard_size)
+        )
+        connection = connection_settings(self.v1meta)
+        directory = tempfile.mkdtemp(prefix="v1pysdk-export-")
+        exported = 0
+        pages = 0
+        next_start = start
+        errors = []
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                running = deque()
+
+                def submit():
+                    shard_start, shard_stop = ranges.popleft()
+                    path = os.path.join(directory, "{0}.part".format(shard_start))
+                    future = pool.submit(
+                        export_shard,
+                        connection,
+                        self.settings(),
+                        shard_start,
+                        shard_stop,
+                        path,
+                    )
+                    running.append((shard_start, shard_stop, path, future))
+
+                # a few ranges ahead of the one being merged, to bound the temporary files
+                while ranges and len(running) < processes * 2:
+                    submit()
+                while running:
+                    shard_start, shard_stop, path, future = running.popleft()
+                    shard_rows, shard_pages_done, error = future.result()
+                    if error is not None:
+                        errors.append((shard_start, shard_stop, error))
+                        ranges.clear()
+                    if errors:
+                        continue
+                    with open(path, newline="", encoding="utf-8") as shard:
+                        shutil.copyfileobj(shard, fileobj)
+                    os.remove(path)
+                    exported += shard_rows
+                    pages += shard_pages_done
+                    next_start = shard_stop
+                    if on_page is not None:
+                        on_page(next_start, rows + exported)
+                    self._report_progress(rows + exported, exported, t0)
+                    if ranges:
+                        submit()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return ExportResult(
+            self.asset_type_name,
+            rows + exported,
+            pages,
+            time.perf_counter() - t0,
+            next_start,
+            errors,
+        )
+
+    def to_file(self, path, resume=False, processes=1):
+        """Export to *path*, checkpointing progress in *path*.checkpoint.
+
+        With *resume*, an existing checkpoint made with the same settings is continued:
+        the file is cut back to the last complete page and the export goes on from the
+        page after it.  The checkpoint is removed once the export is complete.
+
+        :param processes: number of worker processes, see run_sharded()
+        """
+        checkpoint_path = path + ".checkpoint"
+        checkpoint = None
+        if resume and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint["settings"] != self.settings():
+                raise ValueError(
+                    "{0} was made by an export with different settings".format(
+                        checkpoint_path
+                    )
+                )
+        if checkpoint:
+            with open(path, "r+b") as f:
+                f.truncate(checkpoint["bytes"])
+            mode, start, rows = "a", checkpoint["next_start"], checkpoint["rows"]
+        else:
+            mode, start, rows = "w", 0, 0
+
+        with open(path, mode, newline="", encoding="utf-8") as fileobj:
+
+            def on_page(next_start, rows):
+                fileobj.flush()
+                save_checkpoint(
+                    checkpoint_path,
+                    {
+                        "settings": self.settings(),
+                        "next_start": next_start,
+                        "rows": rows,
+                        # the tell() of a text file is an opaque cookie, not a size
+                        "bytes": os.fstat(fileobj.fileno()).st_size,
+                    },
+                )
+
+            if processes > 1:
+                result = self.run_sharded(
+                    fileobj, processes, start, rows, checkpoint is None, on_page
+                )
+            else:
+                result = self.run(fileobj, start, rows, checkpoint is None, on_page)
+        if not result.errors and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return result
+
+
+def connection_settings(v1meta):
+    """V1Meta arguments connecting a worker process the way *v1meta* is connected.
+    The hedging, lanes, instrumentation and select profiler are copied with their settings
+    only, and the session cookies are passed on when *v1meta* has some."""
+    server = v1meta.server
+    settings = {
+        "instance_url": server.instance_url,
+        "username": server.username,
+        "password": server.password,
+        "logparent": server.logparent,
+        "loglevel": server.logger.level,
+        "use_password_as_token": server.use_password_as_token,
+        "use_oauth_path": server.rest_api_path == "rest-1.oauth.v1",
+        "instrumentation": server.instrumentation,
+        "log_body_limit": server.log_body_limit,
+        "single_flight": server.single_flight is not None,
+        "timeout": server.timeout,
+        "hedging": server.hedging,
+        "preemptive_auth": server.preemptive_auth,
+        "cookie_file": server.cookie_file,
+        "lanes": server.lanes,
+        "response_format": v1meta.response_format,
+        "select_profiler": v1meta.select_profiler,
+        "bulk_writer": v1meta.bulk_writer,
+    }
+    # a cookie jar can't be pickled, its cookies can
+    if server._cookie_jar is not None:
+        settings["cookies"] = list(server._cookie_jar)
+    return settings
+
+
+def connect(connection):
+    """The V1Meta of the connection_settings() *connection*"""
+    connection = dict(connection)
+    cookies = connection.pop("cookies", None)
+    if cookies is not None:
+        jar = load_cookie_jar(connection["cookie_file"])
+        for cookie in cookies:
+            jar.set_cookie(cookie)
+        connection["cookie_jar"] = jar
+    return V1Meta(**connection)
+
+
+def export_shard(connection, settings, start, stop, path):
+    """Worker process side of Export.run_sharded(): exports the results from *start* to
+    *stop* into *path* with a V1Server of its own.
+    :return: (rows, pages, None), or (0, 0, error message) when the export failed
+    """
+    try:
+        export = Export(
+            connect(connection),
+            settings["asset_type"],
+            settings["select"],
+            where=settings["where"],
+            sort=settings["sort"],
+            format=settings["format"],
+            page_size=settings["page_size"],
+            prefetch=1,
+        )
+        with open(path, "w", newline="", encoding="utf-8") as fileobj:
+            result = export.run(fileobj, start, header=False, stop=stop)
+        return result.rows, result.pages, None
+    except Exception as e:
+        return 0, 0, "{0}: {1}".format(type(e).__name__, e)
+
+
+def save_checkpoint(path, state):
+    """Replace the checkpoint file atomically, so an interruption never leaves half of one"""
+    partial_path = path + ".part"
+    with open(partial_path, "w") as f:
+        json.dump(state, f)
+    os.replace(partial_path, path)
+
+
+def output_path(output, asset_type_name, format, several):
+    """File an asset type is exported to: *output* itself, or a file named after the
+    asset type in the *output* directory when exporting several types"""
+    if several or os.path.isdir(output):
+        return os.path.join(output, "{0}.{1}".format(asset_type_name, format))
+    return output
+
+
+def add_export_arguments(parser):
+    """Register the arguments of the export command on an argparse parser"""
+    parser.add_argument("asset_types", nargs="+", metavar="ASSET_TYPE")
+    parser.add_argument(
+        "--select", default="Name", help="comma separated attributes to export"
+    )
+    parser.add_argument("--where", help="filter expression, e.g. \"Estimate>'3'\"")
+    parser.add_argument("--sort", help="comma separated sort attributes (ID)")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="output file, or directory for several asset types (- for stdout)",
+    )
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="worker processes parsing the results in parallel",
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="continue from the checkpoints found"
+    )
+    parser.add_argument("--quiet", action="store_true", help="no progress on stderr")
+
+
+def run_export(v1meta, args, stdout=None, stderr=None):
+    """Run the export command for parsed arguments, returns the ExportResults.  The output
+    and progress go to sys.stdout and sys.stderr, as they are at the time of the call, by
+    default."""
+    stdout = sys.stdout if stdout is None else stdout
+    stderr = sys.stderr if stderr is None else stderr
+    select = [name.strip() for name in args.select.split(",") if name.strip()]
+    sort = [name.strip() for name in (args.sort or "").split(",") if name.strip()]
+    several = len(args.asset_types) > 1
+    if args.output == "-" and several:
+        raise ValueError("Exporting several asset types needs an output directory")
+    if several:
+        os.makedirs(args.output, exist_ok=True)
+
+    def progress(asset_type_name, rows, rows_per_second):
+        stderr.write(
+            "\r{0}: {1} rows, {2:.0f} rows/s".format(
+                asset_type_name, rows, rows_per_second
+            )
+        )
+        stderr.flush()
+
+    results = []
+    for asset_type_name in args.asset_types:
+        export = Export(
+            v1meta,
+            asset_type_name,
+            select,
+            where=args.where,
+            sort=sort,
+            format=args.format,
+            page_size=args.page_size,
+            prefetch=args.prefetch,
+            progress=None if args.quiet else progress,
+        )
+        if args.output == "-" and args.processes > 1:
+            result = export.run_sharded(stdout, args.processes)
+        elif args.output == "-":
+            result = export.run(stdout)
+        else:
+            path = output_path(args.output, asset_type_name, args.format, several)
+            result = export.to_file(path, args.resume, args.processes)
+        results.append(result)
+        if not args.quiet:
+            stderr.write(
+                "\r{0}: {1} rows in {2:.1f}s ({3:.0f} rows/s)\n".format(
+                    result.asset_type,
+                    result.rows,
+                    result.seconds,
+                    result.rows / result.seconds if result.seconds else 0.0,
+                )
+            )
+        for error_start, error_stop, message in result.errors:
+            stderr.write(
+                "{0}: rows {1} to {2} failed: {3}\n".format(
+                    asset_type_name, error_start, error_stop, message
+                )
+            )
+    return results
@@ -0,0 +1,321 @@
+"""
+Optional per-request instrumentation for V1Server and V1Meta.
+
+Pass an Instrumentation instance to V1Meta (or V1Server) to collect request
+counters and latency histograms per endpoint and to run hooks around requests,
+asset unpacking and commits:
+
+    instrumentation = Instrumentation()
+    instrumentation.add_hook("after_request", lambda record: print(record))
+    v1 = V1Meta(instance_url=url, username=user, password=pw,
+                instrumentation=instrumentation)
+    ...
+    print(instrumentation.to_prometheus())
+
+When no instrumentation is given, the SDK only pays a None check per request.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.request import HTTPHandler, HTTPSHandler
+
+# seconds, the upper bounds of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+PHASES = ("connect", "first_byte", "download", "parse", "total")
+
+HOOK_EVENTS = ("before_request", "after_request", "unpack", "commit")
+
+# connect durations measured by the timed connection classes, per thread
+_timing = threading.local()
+
+
+def endpoint_of(path):
+    """Names the VersionOne endpoint of a request path: Data, Hist, meta.v1, attachment.v1..."""
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    for i, part in enumerate(parts):
+        if part.startswith("rest-1."):
+            return parts[i + 1] if i + 1 < len(parts) else part
+        if part.endswith(".v1") or part == "api":
+            return part
+    return "other"
+
+
+class RequestRecord(object):
+    """What is known about one request.  Durations are in seconds, None when not measured."""
+
+    __slots__ = (
+        "method",
+        "endpoint",
+        "url",
+        "started",
+        "connect",
+        "first_byte",
+        "download",
+        "parse",
+        "total",
+        "bytes",
+        "status",
+        "retries",
+        "error",
+    )
+
+    def __init__(self, method, endpoint, url):
+        self.method = method
+        self.endpoint = endpoint
+        self.url = url
+        self.started = time.perf_counter()
+        self.connect = None
+        self.first_byte = None
+        self.download = None
+        self.parse = None
+        self.total = None
+        self.bytes = 0
+        self.status = None
+        self.retries = 0
+        self.error = None
+
+    def __repr__(self):
+        return "RequestRecord(%s)" % ", ".join(
+            "%s=%r" % (name, getattr(self, name)) for name in self.__slots__
+        )
+
+
+class Histogram(object):
+    """Cumulative bucket histogram in the Prometheus style"""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[(upper bound, cumulative count)], ending with (inf, count)"""
+        total = 0
+        out = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class Instrumentation(object):
+    """Collects counters and histograms for the requests made through a V1Server, and
+    dispatches the hooks registered with add_hook():
+
+    - before_request(record) and after_request(record) with a RequestRecord
+    - unpack(asset_type_name, seconds) for every unpacked asset
+    - commit(asset_count, errors, seconds) for every V1Meta.commit()
+
+    Hooks run on the thread making the request and must not raise.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.hooks = dict((event, []) for event in HOOK_EVENTS)
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # a copy (e.g. for a worker process) collects its own metrics, and the hooks,
+        # often closures, stay with the original
+        return Instrumentation, (self.buckets,)
+
+    def add_hook(self, event, hook):
+        if event not in self.hooks:
+            raise ValueError("Unknown instrumentation event: " + event)
+        self.hooks[event].append(hook)
+        return hook
+
+    def remove_hook(self, event, hook):
+        self.hooks[event].remove(hook)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    # -- events, called by the SDK
+
+    def request_started(self, method, path, url):
+        record = RequestRecord(method, endpoint_of(path), url)
+        _timing.connect = None
+        for hook in self.hooks["before_request"]:
+            hook(record)
+        return record
+
+    def request_finished(self, record):
+        record.total = time.perf_counter() - record.started
+        if record.connect is None:
+            record.connect = getattr(_timing, "connect", None)
+        endpoint = ("endpoint", record.endpoint)
+        status = record.status if record.status is not None else "error"
+        self.inc("v1_requests_total", (endpoint, ("status", status)))
+        if record.bytes:
+            self.inc("v1_response_bytes_total", (endpoint,), record.bytes)
+        if record.retries:
+            self.inc("v1_request_retries_total", (endpoint,), record.retries)
+        for phase in PHASES:
+            value = getattr(record, phase)
+            if value is not None:
+                self.observe(
+                    "v1_request_duration_seconds", (endpoint, ("phase", phase)), value
+                )
+        for hook in self.hooks["after_request"]:
+            hook(record)
+
+    def request_collapsed(self, path):
+        """A GET shared the request of an identical one in flight"""
+        self.inc("v1_requests_collapsed_total", (("endpoint", endpoint_of(path)),))
+
+    def request_hedged(self, path):
+        """A GET was sent a second time because the first attempt was slow"""
+        self.inc("v1_requests_hedged_total", (("endpoint", endpoint_of(path)),))
+
+    def request_queued(self, lane, seconds):
+        """A request waited *seconds* for a slot of its lane, see v1pysdk.lanes"""
+        self.observe("v1_lane_wait_seconds", (("lane", lane),), seconds)
+
+    def asset_unpacked(self, asset_type_name, seconds):
+        self.observe("v1_unpack_duration_seconds", (), seconds)
+        for hook in self.hooks["unpack"]:
+            hook(asset_type_name, seconds)
+
+    def commit_finished(self, asset_count, errors, seconds):
+        self.inc("v1_commit_assets_total", (), asset_count)
+        if errors:
+            self.inc("v1_commit_errors_total", (), len(errors))
+        self.observe("v1_commit_duration_seconds", (), seconds)
+        for hook in self.hooks["commit"]:
+            hook(asset_count, errors, seconds)
+
+    # -- export
+
+    def snapshot(self):
+        """Plain data copy of all the metrics, e.g. to hand to a metrics callback"""
+        with self._lock:
+            return {
+                "counters": dict(
+                    ((name, labels), value)
+                    for (name, labels), value in self.counters.items()
+                ),
+                "histograms": dict(
+                    (
+                        (name, labels),
+                        {
+                            "count": h.count,
+                            "sum": h.sum,
+                            "buckets": h.cumulative(),
+                        },
+                    )
+                    for (name, labels), h in self.histograms.items()
+                ),
+            }
+
+    def export(self, callback):
+        """Calls callback(snapshot) and returns what it returns"""
+        return callback(self.snapshot())
+
+    def to_prometheus(self):
+        """All the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted(set(name for name, _ in self.counters)):
+                lines.append("# TYPE %s counter" % name)
+                for (key_name, labels), value in sorted(
+                    self.counters.items(), key=lambda i: str(i[0])
+                ):
+                    if key_name == name:
+                        lines.append("%s%s %s" % (name, _format_labels(labels), value))
+            for name in sorted(set(name for name, _ in self.histograms)):
+                lines.append("# TYPE %s histogram" % name)
+                for (key_name, labels), h in sorted(
+                    self.histograms.items(), key=lambda i: str(i[0])
+                ):
+                    if key_name != name:
+                        continue
+                    for bound, count in h.cumulative():
+                        bucket_labels = labels + (("le", _format_bound(bound)),)
+                        lines.append(
+                            "%s_bucket%s %d"
+                            % (name, _format_labels(bucket_labels), count)
+                        )
+                    lines.append("%s_sum%s %r" % (name, _format_labels(labels), h.sum))
+                    lines.append(
+                        "%s_count%s %d" % (name, _format_labels(labels), h.count)
+                    )
+        return "\n".join(lines) + "\n"
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super(_TimedHTTPConnection, self).connect()
+        _timing.connect = time.perf_counter() - t0
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super(_TimedHTTPSConnection, self).connect()
+        _timing.connect = time.perf_counter() - t0
+
+
+class TimedHTTPHandler(HTTPHandler):
+    """HTTP handler measuring the connection setup time of each request"""
+
+    def http_open(self, req):
+        return self.do_open(_TimedHTTPConnection, req)
+
+
+class TimedHTTPSHandler(HTTPSHandler):
+    """HTTPS handler measuring the connection setup (TCP and TLS) time of each request"""
+
+    def https_open(self, req):
+        return self.do_open(_TimedHTTPSConnection, req, context=self._context)
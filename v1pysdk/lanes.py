@@ -0,0 +1,191 @@
+"""
+Priority lanes for the requests of a V1Server.
+
+RequestLanes bounds the number of requests a V1Server has in flight and shares them between
+lanes, so interactive lookups don't queue behind the hundreds of page fetches of a
+background sync running through the same V1Meta:
+
+    v1 = V1Meta(instance_url=url, lanes=RequestLanes(capacity=8))
+    with v1.server.lane("batch"):
+        for story in v1.Story.select("Name").paged(500):
+            ...
+    v1.Story.where(Number="S-01001").first()    # the "interactive" lane, by default
+
+Each lane reserves slots that the other lanes can't take, so a lane with a reservation
+always gets a request started when it has fewer than that in flight.  The remaining slots go
+to the waiting requests by weighted fair queuing: a lane of weight 4 starts four requests
+for every request of a lane of weight 1 while both are waiting, and a lane that was idle
+doesn't get to catch up.  Within a lane requests start in the order they came.
+
+The lane is chosen by the context of the calling thread, see use_lane().  Requests outside
+of a lane() block, or in a lane the scheduler doesn't have, use its default lane.
+"""
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_current_lane = ContextVar("v1pysdk_lane", default=None)
+
+
+def current_lane():
+    """Name of the lane of the requests made in the current context, None for the default"""
+    return _current_lane.get()
+
+
+@contextmanager
+def use_lane(name):
+    """Runs the requests made in the block, on the current thread, in lane *name*"""
+    token = _current_lane.set(name)
+    try:
+        yield name
+    finally:
+        _current_lane.reset(token)
+
+
+class Lane(object):
+    """A class of requests, with *reserved* slots and a *weight* in the fair share of the
+    other slots"""
+
+    def __init__(self, name, reserved=0, weight=1):
+        if weight <= 0:
+            raise ValueError("The weight of a lane must be positive")
+        self.name = name
+        self.reserved = reserved
+        self.weight = weight
+        self.in_flight = 0
+        self.waiting = deque()
+        # virtual time of the fair queuing, advanced by 1/weight per started request
+        self.vtime = 0.0
+        # number of requests started, and of requests that had to wait for a slot
+        self.started = 0
+        self.queued = 0
+
+    def __repr__(self):
+        return "Lane(%r, reserved=%r, weight=%r)" % (
+            self.name,
+            self.reserved,
+            self.weight,
+        )
+
+
+def default_lanes():
+    """An interactive lane with 2 reserved slots and 4 times the share of a batch lane"""
+    return [Lane(INTERACTIVE, reserved=2, weight=4), Lane(BATCH, reserved=0, weight=1)]
+
+
+class RequestLanes(object):
+    """Runs at most *capacity* requests at a time, shared between lanes"""
+
+    def __init__(self, capacity=8, lanes=None, default=INTERACTIVE):
+        """
+        :param capacity: maximum number of requests in flight
+        :param lanes: Lane list, in priority order for ties, default_lanes() by default
+        :param default: name of the lane of the requests made outside of a lane
+        """
+        lanes = default_lanes() if lanes is None else list(lanes)
+        self.lanes = dict((lane.name, lane) for lane in lanes)
+        if default not in self.lanes:
+            raise ValueError("Unknown default lane: %r" % (default,))
+        if sum(lane.reserved for lane in lanes) > capacity:
+            raise ValueError(
+                "The lanes reserve more than the capacity of %d" % capacity
+            )
+        self.capacity = capacity
+        self.default = default
+        self.in_flight = 0
+        self._order = lanes
+        self._vclock = 0.0
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # a copy (e.g. for a worker process) has the same lanes, with no request in flight
+        return RequestLanes, (
+            self.capacity,
+            [Lane(lane.name, lane.reserved, lane.weight) for lane in self._order],
+            self.default,
+        )
+
+    def lane_of(self, name):
+        """The Lane the requests of lane *name* run in"""
+        return self.lanes.get(name) or self.lanes[self.default]
+
+    def _can_start(self, lane):
+        free = self.capacity - self.in_flight
+        # the free slots the other lanes reserved and aren't using
+        held = 0
+        for other in self._order:
+            if other is not lane and other.in_flight < other.reserved:
+                held += other.reserved - other.in_flight
+        return free > held
+
+    def _start(self, lane):
+        lane.in_flight += 1
+        lane.started += 1
+        self.in_flight += 1
+        self._vclock = lane.vtime
+        lane.vtime += 1.0 / lane.weight
+
+    def _dispatch(self):
+        """Starts waiting requests while there are slots for them"""
+        while True:
+            best = None
+            for lane in self._order:
+                if lane.waiting and self._can_start(lane):
+                    if best is None or lane.vtime < best.vtime:
+                        best = lane
+            if best is None:
+                return
+            self._start(best)
+            best.waiting.popleft().set()
+
+    def acquire(self, name=None, timeout=None):
+        """Waits for a slot in lane *name* (the lane of the context by default).
+        :return: the Lane to release(), None when no slot was free within *timeout* seconds
+        """
+        lane = self.lane_of(current_lane() if name is None else name)
+        with self._lock:
+            if not lane.waiting:
+                # an idle lane rejoins at the current virtual time, without its credit
+                lane.vtime = max(lane.vtime, self._vclock)
+                # waiting requests of the other lanes can't use the free slots, or
+                # they'd have been started
+                if self._can_start(lane):
+                    self._start(lane)
+                    return lane
+            waiter = threading.Event()
+            lane.waiting.append(waiter)
+            lane.queued += 1
+        if waiter.wait(timeout):
+            return lane
+        with self._lock:
+            if waiter.is_set():
+                # started while the wait timed out
+                return lane
+            lane.waiting.remove(waiter)
+        return None
+
+    def release(self, lane):
+        with self._lock:
+            lane.in_flight -= 1
+            self.in_flight -= 1
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                (
+                    lane.name,
+                    {
+                        "in_flight": lane.in_flight,
+                        "waiting": len(lane.waiting),
+                        "started": lane.started,
+                        "queued": lane.queued,
+                    },
+                )
+                for lane in self._order
+            )
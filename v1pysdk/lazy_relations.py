@@ -0,0 +1,138 @@
+class LazyRelationList(list):
+    """A list of related assets that keeps the raw idrefs returned by the server and
+    only builds the asset proxies for the entries that are accessed.
+
+    Relations such as Owners, Children or Workitems can hold hundreds of entries
+    per asset, most of which are never looked at, so materializing them all while
+    unpacking a query result is wasted work.
+
+    Until the list is changed its entries are held as the idref tokens and built on
+    access.  The first change (append, extend, +=, item assignment...) builds them all,
+    after which it is a plain list of assets.  read_idrefs keeps the idrefs it was read
+    with, so the update of an edited list only adds and removes what changed."""
+
+    __slots__ = ("_v1meta", "_read_idrefs", "_lazy")
+
+    def __init__(self, v1meta, idrefs):
+        list.__init__(self, idrefs)
+        self._v1meta = v1meta
+        self._read_idrefs = list(idrefs)
+        self._lazy = True
+
+    @property
+    def idrefs(self):
+        """The oid tokens of the related assets, without materializing them while the list
+        is unchanged"""
+        if self._lazy:
+            return list(self._read_idrefs)
+        return [item.idref for item in list.__iter__(self) if hasattr(item, "idref")]
+
+    @property
+    def read_idrefs(self):
+        """The oid tokens the list was read with, before any change made to it"""
+        return list(self._read_idrefs)
+
+    def _materialize(self, index):
+        asset = list.__getitem__(self, index)
+        if self._lazy and isinstance(asset, str):
+            asset = self._v1meta.history_aware_asset_from_oid(asset)
+            list.__setitem__(self, index, asset)
+        return asset
+
+    def _materialize_all(self):
+        if self._lazy:
+            for i in range(len(self)):
+                self._materialize(i)
+            self._lazy = False
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("relation index out of range")
+        return self._materialize(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._materialize(i)
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self._materialize(i)
+
+    def __contains__(self, item):
+        return any(asset == item for asset in self)
+
+    def index(self, item, *args):
+        self._materialize_all()
+        return list.index(self, item, *args)
+
+    def count(self, item):
+        self._materialize_all()
+        return list.count(self, item)
+
+    def copy(self):
+        return list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyRelationList) and self._lazy and other._lazy:
+            return self._read_idrefs == other._read_idrefs
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    __rmul__ = __mul__
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _materializing(method):
+    def wrapper(self, *args, **kw):
+        self._materialize_all()
+        return method(self, *args, **kw)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+# the changes to the list work on the built assets
+for _name in (
+    "append",
+    "extend",
+    "insert",
+    "remove",
+    "pop",
+    "clear",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+):
+    setattr(LazyRelationList, _name, _materializing(getattr(list, _name)))
+del _name
@@ -0,0 +1,436 @@
+"""
+Local SQLite mirror of selected asset types.
+
+Reporting jobs that read the same assets over and over can keep a copy of the
+attributes they use in indexed sqlite tables, refresh it incrementally, and run
+their where/select/sort queries locally:
+
+    mirror = V1Mirror(v1, "v1_mirror.sqlite")
+    mirror.track("Story", ["Name", "Estimate", "Status", "Scope", "Owners"])
+    mirror.refresh()
+    for story in mirror.query("Story").where(Scope="Scope:1052").sort("-Estimate"):
+        print(story.Name, story.Estimate, story.Description)
+
+Each refresh only asks the server for the assets changed since the previous one
+(by ChangeDateUTC).  Queries naming an attribute that isn't mirrored are sent to
+the server instead, and the assets returned by a local query still read the
+attributes that aren't mirrored (Description above) from the server on access.
+"""
+
+import json
+import sqlite3
+from collections import namedtuple
+
+from .base_asset import BaseAsset
+from .lazy_relations import LazyRelationList
+from .query import DEFAULT_PAGE_SIZE
+
+# attribute types compared and sorted as numbers by local queries
+NUMERIC_ATTRIBUTE_TYPES = ("Numeric", "Rank", "Int", "LongInt", "Duration")
+
+# value of the AssetState attribute of deleted assets
+DELETED_ASSET_STATE = "255"
+
+# how a mirrored attribute is stored:
+# - text: the attribute text
+# - numeric: the attribute text, compared and sorted as a number
+# - values: a multi-value attribute, as a JSON list
+# - relation: a single-value relation, as the related idref
+# - relations: a multi-value relation, as the space separated related idrefs
+Column = namedtuple("Column", "name kind")
+
+
+def quote(name):
+    """SQL identifier for a table or column name"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def columns_from_meta(meta_xml, attributes):
+    """Column descriptions for *attributes*, from the meta.v1 document of their asset type"""
+    definitions = dict(
+        (definition.get("name"), definition)
+        for definition in meta_xml.findall("AttributeDefinition")
+    )
+    columns = []
+    for name in attributes:
+        definition = definitions.get(name)
+        if definition is None:
+            raise ValueError(
+                "{0} is not an attribute of {1}, only the asset's own attributes "
+                "can be mirrored".format(name, meta_xml.get("name"))
+            )
+        multi = definition.get("ismultivalue") == "True"
+        attribute_type = definition.get("attributetype")
+        if attribute_type == "Relation":
+            kind = "relations" if multi else "relation"
+        elif multi:
+            kind = "values"
+        elif attribute_type in NUMERIC_ATTRIBUTE_TYPES:
+            kind = "numeric"
+        else:
+            kind = "text"
+        columns.append(Column(name, kind))
+    return columns
+
+
+def to_column_value(column, value):
+    """Stored form of a value returned by V1Meta.unpack_asset_values"""
+    if column.kind == "relations":
+        return " ".join(value or [])
+    if column.kind == "relation":
+        return value[0] if value else None
+    if column.kind == "values":
+        return json.dumps(value if isinstance(value, list) else [value])
+    return value
+
+
+def to_criteria(value):
+    """Stored form of a where() value: assets by idref, booleans as the server writes them"""
+    if isinstance(value, BaseAsset):
+        return value.idref
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return None if value is None else str(value)
+
+
+class V1Mirror(object):
+    """Keeps the tracked attributes of the tracked asset types in a sqlite file.
+
+    The file remembers what is tracked and how far each asset type was refreshed, so
+    a V1Mirror opened on an existing file can be queried and refreshed right away.
+    """
+
+    def __init__(
+        self, v1meta, filename="v1_mirror.sqlite", page_size=DEFAULT_PAGE_SIZE
+    ):
+        """
+        :param v1meta: V1Meta instance to refresh the mirror from
+        :param filename: sqlite database file, created if needed
+        :param page_size: number of assets requested at a time when refreshing
+        """
+        self.v1meta = v1meta
+        self.filename = filename
+        self.page_size = page_size
+        self.db = sqlite3.connect(filename)
+        self.db.execute("""
+            create table if not exists v1_mirror_state (
+                asset_type text primary key,
+                columns text not null,
+                last_change text not null
+            )
+            """)
+        self.db.commit()
+        self.tracked = {}
+        for asset_type_name, columns in self.db.execute(
+            "select asset_type, columns from v1_mirror_state"
+        ):
+            self.tracked[asset_type_name] = [Column(*c) for c in json.loads(columns)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def track(self, asset_type_name, attributes):
+        """Mirror *attributes* of the asset type.  Tracking a different set of attributes
+        than the file holds rebuilds the table on the next refresh."""
+        meta_xml = self.v1meta.server.get_meta_xml(asset_type_name)
+        columns = columns_from_meta(meta_xml, attributes)
+        if self.tracked.get(asset_type_name) == columns:
+            return self
+        table = quote(asset_type_name)
+        self.db.execute("drop table if exists " + table)
+        self.db.execute(
+            "create table {0} (_oid integer primary key, _changed text not null{1})".format(
+                table, "".join(", " + quote(column.name) for column in columns)
+            )
+        )
+        for column in columns:
+            # membership in multi-value columns can't use an index
+            if column.kind in ("text", "numeric", "relation"):
+                self.db.execute(
+                    "create index {0} on {1} ({2})".format(
+                        quote("{0}_{1}".format(asset_type_name, column.name)),
+                        table,
+                        quote(column.name),
+                    )
+                )
+        self.db.execute(
+            "insert or replace into v1_mirror_state (asset_type, columns, last_change) "
+            "values (?, ?, '')",
+            (asset_type_name, json.dumps(columns)),
+        )
+        self.db.commit()
+        self.tracked[asset_type_name] = columns
+        return self
+
+    def last_change(self, asset_type_name):
+        """ChangeDateUTC of the most recent change mirrored for the asset type, '' if none"""
+        row = self.db.execute(
+            "select last_change from v1_mirror_state where asset_type = ?",
+            (asset_type_name,),
+        ).fetchone()
+        return row[0] if row else ""
+
+    def refresh(self, asset_type_name=None, full=False):
+        """Bring the mirror up to date with the server.
+
+        Only the assets changed since the previous refresh are requested, unless *full*
+        is set.  The server leaves deleted assets out of queries that don't name their
+        AssetState, so the assets deleted since the previous refresh are queried on their
+        own and removed; a full refresh also removes the assets the server no longer
+        returns at all.
+
+        :param asset_type_name: the asset type to refresh, all the tracked ones by default
+        :param full: re-read every asset of the type instead of just the changed ones
+        :return: number of assets written or removed
+        """
+        names = [asset_type_name] if asset_type_name else sorted(self.tracked)
+        return sum(self._refresh_asset_type(name, full) for name in names)
+
+    def _pages(self, asset_type_name, select, since, criteria=None):
+        """Generator of the pages of (oid, values) of the assets changed since *since*,
+        oldest change first, that match the filter *criteria*.
+
+        Keyset paging: every page restarts from the newest change read so far, so assets
+        changing while the refresh runs move further on instead of shifting the others
+        over a page boundary.  The assets of that last instant are read again, unless a
+        whole page changed in the same instant."""
+        asset_class = self.v1meta.asset_class(asset_type_name)
+        unpack = self.v1meta.unpack_asset_values
+        skip = 0
+        while True:
+            query = asset_class.select("ChangeDateUTC", *select).sort(
+                "ChangeDateUTC", "ID"
+            )
+            terms = [criteria] if criteria else []
+            if since:
+                terms.append("ChangeDateUTC>='{0}'".format(since))
+            if terms:
+                query = query.filter(";".join(terms))
+            _, xml = next(query.page_xml(self.page_size, skip))
+            found = xml.findall("Asset")
+            page = [(int(a.get("id").split(":")[1]), unpack(a)) for a in found]
+            yield page
+            if len(found) < self.page_size:
+                return
+            newest = page[-1][1]["ChangeDateUTC"]
+            if newest == since:
+                skip += len(found)
+            else:
+                since, skip = newest, 0
+
+    def _refresh_asset_type(self, asset_type_name, full):
+        columns = self.tracked[asset_type_name]
+        table = quote(asset_type_name)
+        insert = "insert or replace into {0} values (?, ?{1})".format(
+            table, ", ?" * len(columns)
+        )
+        delete = "delete from {0} where _oid = ?".format(table)
+        start = "" if full else self.last_change(asset_type_name)
+        since = start
+        # oid -> ChangeDateUTC of the rows written, the ones read again are left out
+        seen = {}
+        written = 0
+        for page in self._pages(asset_type_name, [c.name for c in columns], since):
+            rows = []
+            for oid, values in page:
+                if seen.get(oid) == values["ChangeDateUTC"]:
+                    continue
+                seen[oid] = values["ChangeDateUTC"]
+                rows.append(
+                    (oid, values["ChangeDateUTC"])
+                    + tuple(to_column_value(c, values.get(c.name)) for c in columns)
+                )
+            if page:
+                since = max(since, page[-1][1]["ChangeDateUTC"])
+            self.db.executemany(insert, rows)
+            self.db.execute(
+                "update v1_mirror_state set last_change = ? where asset_type = ?",
+                (since, asset_type_name),
+            )
+            self.db.commit()
+            written += len(rows)
+        if start:
+            # deleted assets are only returned when asked for by their AssetState
+            criteria = "AssetState='{0}'".format(DELETED_ASSET_STATE)
+            for page in self._pages(asset_type_name, [], start, criteria):
+                deleted = [(oid,) for oid, _ in page]
+                written += self.db.executemany(delete, deleted).rowcount
+                self.db.commit()
+        if full:
+            stale = [
+                (oid,)
+                for (oid,) in self.db.execute("select _oid from " + table)
+                if oid not in seen
+            ]
+            self.db.executemany(delete, stale)
+            self.db.commit()
+            written += len(stale)
+        return written
+
+    def query(self, asset_type_name):
+        """A MirrorQuery over the asset type"""
+        return MirrorQuery(self, asset_type_name)
+
+
+class MirrorQuery(object):
+    """where/select/sort/page query answered from the mirror tables when every named
+    attribute is mirrored, and by a V1Query on the server otherwise.  Iterating gives
+    asset instances, exactly like a V1Query does."""
+
+    def __init__(self, mirror, asset_type_name):
+        self._mirror = mirror
+        self._asset_type_name = asset_type_name
+        self._asset_class = mirror.v1meta.asset_class(asset_type_name)
+        self._sel_list = []
+        self._where_terms = {}
+        self._sort_list = []
+        self._page_size = None
+        self._page_start = 0
+        self._remote = None
+
+    def select(self, *args):
+        self._sel_list.extend(args)
+        self._remote = None
+        return self
+
+    def where(self, terms={}, **kw):
+        """Equality criteria, like V1Query.where().  For a multi-value relation, the
+        criteria matches the assets whose relation contains the given asset."""
+        self._where_terms.update(terms)
+        self._where_terms.update(kw)
+        self._remote = None
+        return self
+
+    def sort(self, *args):
+        """Sort attributes, prefixed by a dash for descending order"""
+        self._sort_list.extend(args)
+        self._remote = None
+        return self
+
+    def page(self, size=None, start=0):
+        self._page_size = size
+        self._page_start = start or 0
+        self._remote = None
+        return self
+
+    def _columns(self):
+        return dict(
+            (column.name, column)
+            for column in self._mirror.tracked.get(self._asset_type_name, [])
+        )
+
+    def is_local(self):
+        """True when the query can be answered from the mirror"""
+        columns = self._columns()
+        if not columns:
+            return False
+        sortable = ("text", "numeric", "relation")
+        return (
+            all(name in columns for name in self._sel_list)
+            and all(
+                name in columns and columns[name].kind != "values"
+                for name in self._where_terms
+            )
+            and all(
+                name.lstrip("-") in columns
+                and columns[name.lstrip("-")].kind in sortable
+                for name in self._sort_list
+            )
+        )
+
+    def _sql(self, what):
+        columns = self._columns()
+        terms = []
+        params = []
+        for name, value in self._where_terms.items():
+            column = columns[name]
+            criteria = to_criteria(value)
+            if criteria is None:
+                terms.append("{0} is null".format(quote(name)))
+            elif column.kind == "relations":
+                terms.append("instr(' ' || {0} || ' ', ?) > 0".format(quote(name)))
+                params.append(" " + criteria + " ")
+            elif column.kind == "numeric":
+                terms.append("cast({0} as real) = ?".format(quote(name)))
+                params.append(float(criteria))
+            else:
+                terms.append("{0} = ?".format(quote(name)))
+                params.append(criteria)
+        sql = "select {0} from {1}".format(what, quote(self._asset_type_name))
+        if terms:
+            sql += " where " + " and ".join(terms)
+        order = []
+        for term in self._sort_list:
+            name = term.lstrip("-")
+            expression = quote(name)
+            if columns[name].kind == "numeric":
+                expression = "cast({0} as real)".format(expression)
+            order.append(expression + (" desc" if term.startswith("-") else ""))
+        sql += " order by " + ", ".join(order + ["_oid"])
+        if self._page_size:
+            sql += " limit {0:d} offset {1:d}".format(self._page_size, self._page_start)
+        return sql, params
+
+    def _server_query(self):
+        if self._remote is not None:
+            return self._remote
+        query = self._asset_class.select(*self._sel_list).sort(*self._sort_list)
+        query.where(
+            dict(
+                (name, to_criteria(value)) for name, value in self._where_terms.items()
+            )
+        )
+        if self._page_size:
+            query.page(size=self._page_size, start=self._page_start)
+        self._remote = query
+        return query
+
+    def _from_row(self, columns, row):
+        instance = self._asset_class(str(row[0]))
+        data = {}
+        for column, value in zip(columns, row[1:]):
+            if column.kind == "relations":
+                data[column.name] = LazyRelationList(
+                    self._mirror.v1meta, value.split() if value else []
+                )
+            elif column.kind == "relation":
+                data[column.name] = LazyRelationList(
+                    self._mirror.v1meta, [value] if value else []
+                )
+            elif column.kind == "values":
+                data[column.name] = json.loads(value) if value else []
+            else:
+                data[column.name] = value
+        data["AsOf"] = None
+        instance.AsOf = None
+        # attributes that aren't mirrored are still read from the server on access
+        return instance.with_data(data)
+
+    def __iter__(self):
+        if not self.is_local():
+            for instance in self._server_query():
+                yield instance
+            return
+        columns = self._mirror.tracked[self._asset_type_name]
+        sql, params = self._sql(
+            ", ".join(["_oid"] + [quote(column.name) for column in columns])
+        )
+        for row in self._mirror.db.execute(sql, params).fetchall():
+            yield self._from_row(columns, row)
+
+    def __len__(self):
+        if not self.is_local():
+            return len(self._server_query())
+        sql, params = self._sql("_oid")
+        return self._mirror.db.execute(
+            "select count(*) from ({0})".format(sql), params
+        ).fetchone()[0]
+
+    def first(self):
+        return list(self)[0]
@@ -1,5 +1,41 @@
-from urllib.parse import urlencode
+from urllib.parse import quote_plus, urlencode
+from .aggregates import AggregateRow
 from .string_utils import split_attribute
+from .timeouts import Deadline
+
+# upper bound on the number of requests a single query issues at the same time
+DEFAULT_MAX_WORKERS = 8
+
+# number of results requested at a time when paging through a query
+DEFAULT_PAGE_SIZE = 500
+
+# endpoints a query can be run against
+BACKENDS = ("rest-1.v1", "query.v1")
+
+# IIS, which VersionOne runs on, rejects query strings longer than 2048 bytes by default
+DEFAULT_MAX_QUERY_LENGTH = 2048
+
+# characters held back for the page parameter added to each request of page_xml()
+PAGE_PARAM_LENGTH = 32
+
+
+def is_value_list(criteria):
+    """True for the where() criteria matching any of several values"""
+    return isinstance(criteria, (list, tuple, set, frozenset))
+
+
+def unique_values(criteria):
+    """The values of an in-list criteria as strings, without duplicates, in order"""
+    return list(dict.fromkeys(str(value) for value in criteria))
+
+
+def where_term(attrname, criteria):
+    """The filter term of a where() criteria: attr='value', or attr='a','b' for a list"""
+    if is_value_list(criteria):
+        return "{0}={1}".format(
+            attrname, ",".join("'{0}'".format(v) for v in unique_values(criteria))
+        )
+    return "{0}='{1}'".format(attrname, criteria)
 
 
 class V1Query(object):
@@ -27,6 +63,16 @@ class V1Query(object):
         self._length = 0
         self._max_length = 0  # total possible number
         self._dirty_query = False
+        self._max_workers = DEFAULT_MAX_WORKERS
+        self._max_query_length = DEFAULT_MAX_QUERY_LENGTH
+        self._backend = "rest-1.v1"
+        self._results_format = "xml"
+        self._deadline_seconds = None
+        # where the query was built, when a select profiler learns select lists
+        self._site = None
+        profiler = asset_class._v1_v1meta.select_profiler
+        if profiler is not None:
+            self._site = profiler.call_site(asset_class._v1_asset_type_name)
 
         # sel_string is used when we need to query a single attribute that wasn't retrieved by default.
         # it should add to any existing select list.
@@ -49,6 +95,24 @@ class V1Query(object):
     def __iter__(self):
         """Iterate over the results, running the query the first time if necessary."""
         self._run_query_if_needed()
+        site = self._site
+        for asset in self._iter_results():
+            if site is not None:
+                # single attribute fetches on the asset are reported for this site
+                asset._v1_query_site = site
+            yield asset
+
+    def _iter_results(self):
+        if self._backend == "query.v1":
+            for results, asof in self._query_results:
+                for result in results:
+                    yield self._asset_class.from_query_v1(result, asof)
+            return
+        if self._results_format == "json":
+            for result, asof in self._query_results:
+                for found_asset in result["Assets"]:
+                    yield self._asset_class.from_query_json(found_asset, asof)
+            return
         for result, asof in self._query_results:
             for found_asset in result.findall("Asset"):
                 yield self._asset_class.from_query_select(found_asset, asof)
@@ -98,15 +162,58 @@ class V1Query(object):
             self._sort_string = ",".join(self._sort_list)
         return self._sort_string
 
-    def get_where_string(self):
+    def get_where_string(self, where_terms=None):
+        if where_terms is None:
+            where_terms = self._where_terms
         terms = list(
-            "{0}='{1}'".format(attrname, criteria)
-            for attrname, criteria in self._where_terms.items()
+            where_term(attrname, criteria) for attrname, criteria in where_terms.items()
         )
         if self._where_string:
             terms.append(self._where_string)
         return ";".join(terms)
 
+    def get_where_chunks(self, reserve=0):
+        """The where strings of the requests the query is split in, so that the query string
+        of each fits in max_query_length() with *reserve* characters to spare: the values of
+        the longest in-list are shared out between them.  Empty when an in-list is empty, as
+        nothing can match it."""
+        lists = [n for n, c in self._where_terms.items() if is_value_list(c)]
+        if not lists:
+            return [self.get_where_string()]
+        terms = dict(self._where_terms)
+        for attrname in lists:
+            terms[attrname] = unique_values(terms[attrname])
+            if not terms[attrname]:
+                return []
+        split = max(lists, key=lambda attrname: len(terms[attrname]))
+        values = terms[split]
+        # length of the query string with no value in the split list
+        terms[split] = []
+        url_params = self.get_url_params()
+        url_params["where"] = self.get_where_string(terms)
+        room = self._max_query_length - len(urlencode(url_params)) - reserve
+        asofs = [len(urlencode({"asof": str(a)})) + 1 for a in self._asof_list if a]
+        room -= max(asofs, default=0)
+        separator = len(quote_plus(","))
+        chunks = [[]]
+        used = 0
+        for value in values:
+            length = len(quote_plus("'{0}'".format(value)))
+            if chunks[-1]:
+                if used + separator + length > room:
+                    # a single value too long for the room still gets its request
+                    chunks.append([])
+                    used = 0
+                else:
+                    length += separator
+            chunks[-1].append(value)
+            used += length
+        wheres = []
+        for chunk in chunks:
+            terms[split] = chunk
+            wheres.append(self.get_where_string(terms))
+        return wheres
+
     def get_page_size(self):
         return self._page_size
 
@@ -119,7 +226,30 @@ class V1Query(object):
     def get_findIn_string(self):
         return self._findIn_string
 
-    def run_single_query(self, url_params={}, api="Data"):
+    def get_max_workers(self):
+        return self._max_workers
+
+    def run_single_query(self, url_params={}, api="Data", deadline=None):
+        document = self._fetch_query(url_params, api, deadline)
+        self._update_length(document)
+        return document
+
+    def _query_path(self, api="Data"):
+        return "/rest-1.v1/{1}/{0}".format(self._asset_class._v1_asset_type_name, api)
+
+    def _fetch_query(self, url_params, api="Data", deadline=None):
+        """The response document of the query, XML or decoded JSON depending on the
+        response format of the V1Meta"""
+        v1meta = self._asset_class._v1_v1meta
+        if v1meta.response_format == "json":
+            urlpath = self._query_path(api)
+            urlquery = urlencode(url_params)
+            if deadline is None:
+                return v1meta.server.get_json(urlpath, query=urlquery)
+            return v1meta.server.get_json(urlpath, query=urlquery, deadline=deadline)
+        return self._fetch_query_xml(url_params, api, deadline)
+
+    def _fetch_query_xml(self, url_params, api="Data", deadline=None):
         # where = None
         # sel = None
         # if 'where' in url_params:
@@ -129,18 +259,20 @@ class V1Query(object):
         # xml = self._asset_class._v1_v1meta.server.get_query_xml(api, self._asset_class._v1_asset_type_name, where, sel)
 
         urlquery = urlencode(url_params)
-        urlpath = "/rest-1.v1/{1}/{0}".format(
-            self._asset_class._v1_asset_type_name, api
-        )
+        urlpath = self._query_path(api)
         # warning: tight coupling ahead
-        xml = self._asset_class._v1_v1meta.server.get_xml(urlpath, query=urlquery)
-
-        # xml is an elementtree::Element object so query the total of items available and determine
-        # the pageStart within that total set.
-        if "total" in xml.attrib:
-            total = int(xml.get("total"))
-            pageStart = int(xml.get("pageStart"))
-            pageSize = int(xml.get("pageSize"))
+        server = self._asset_class._v1_v1meta.server
+        if deadline is None:
+            return server.get_xml(urlpath, query=urlquery)
+        return server.get_xml(urlpath, query=urlquery, deadline=deadline)
+
+    def _update_length(self, document):
+        # document is an elementtree::Element object, or the decoded JSON object, so query the
+        # total of items available and determine the pageStart within that total set.
+        if document.get("total") is not None:
+            total = int(document.get("total"))
+            pageStart = int(document.get("pageStart"))
+            pageSize = int(document.get("pageSize"))
             if pageStart >= total:
                 # requested past end of total available
                 self._length = 0
@@ -151,10 +283,9 @@ class V1Query(object):
                 # pageSize can be met, so it is
                 self._length = pageSize
             self._max_length = total
-        return xml
 
-    def run_query(self):
-        """Actually hit the server to perform the query"""
+    def get_url_params(self):
+        """The rest-1.v1 query parameters for this query, without any asof"""
         url_params = {}
         if self.get_sel_string():
             url_params["sel"] = self.get_sel_string()
@@ -170,22 +301,173 @@ class V1Query(object):
         if self.get_find_string() and self.get_findIn_string():
             url_params["find"] = self.get_find_string()
             url_params["findIn"] = self.get_findIn_string()
-        if self._asof_list:
+        return url_params
+
+    def get_query_v1_payloads(self):
+        """The query.v1 queries (dicts) for this query, one for every asof moment"""
+        payload = {"from": self._asset_class._v1_asset_type_name}
+        if self._sel_list:
+            payload["select"] = list(self._sel_list)
+        equals = dict(
+            (attrname, str(criteria))
+            for attrname, criteria in self._where_terms.items()
+            if not is_value_list(criteria)
+        )
+        if equals:
+            payload["where"] = equals
+        # in-lists are filter terms, sent in the body without any length limit
+        filters = [
+            where_term(attrname, criteria)
+            for attrname, criteria in self._where_terms.items()
+            if is_value_list(criteria)
+        ]
+        if self._where_string:
+            filters.append(self._where_string)
+        if filters:
+            payload["filter"] = filters
+        if self._sort_list:
+            payload["sort"] = list(self._sort_list)
+        if self._page_size:
+            payload["page"] = {"size": self._page_size, "start": self._page_start or 0}
+        if self._find_string and self._findIn_string:
+            payload["find"] = self._find_string
+            payload["findIn"] = self._findIn_string.split(",")
+        payloads = []
+        for asof in self._asof_list or [None]:
+            asof_payload = dict(payload)
+            if asof:
+                asof_payload["asof"] = str(asof)
+            payloads.append(asof_payload)
+        return payloads
+
+    def set_query_v1_results(self, results):
+        """Takes the query.v1 results of get_query_v1_payloads(), in order, as the results
+        of this query.  query.v1 doesn't report totals, so max_length() is the length.
+        """
+        self._query_results = list(zip(results, self._asof_list or [None]))
+        self._length = len(results[-1]) if results else 0
+        self._max_length = self._length
+        self._query_has_run = True
+        self._dirty_query = False
+
+    def apply_select_profile(self):
+        """Adds the attributes the select profiler learned for the call site of this query to
+        its select list.  Queries without a select list are left alone, as they return the
+        default attributes of their type."""
+        if self._site is None or not self._sel_list:
+            return
+        profiler = self._asset_class._v1_v1meta.select_profiler
+        missing = [a for a in profiler.learned(self._site) if a not in self._sel_list]
+        if missing:
+            self.select(*missing)
+
+    def _new_deadline(self):
+        if self._deadline_seconds is None:
+            return None
+        return Deadline(self._deadline_seconds)
+
+    def run_query(self):
+        """Actually hit the server to perform the query"""
+        self.apply_select_profile()
+        deadline = self._new_deadline()
+        if self._backend == "query.v1":
+            if any(is_value_list(c) and not c for c in self._where_terms.values()):
+                # an empty in-list matches nothing
+                self.set_query_v1_results([[] for _ in self._asof_list or [None]])
+                return
+            server = self._asset_class._v1_v1meta.server
+            payloads = self.get_query_v1_payloads()
+            if deadline is None:
+                results = server.get_query_v1_json(payloads)
+            else:
+                results = server.get_query_v1_json(payloads, deadline)
+            self.set_query_v1_results(results)
+            return
+        self._results_format = self._asset_class._v1_v1meta.response_format
+        url_params = self.get_url_params()
+        wheres = self.get_where_chunks()
+        if len(wheres) != 1:
+            if len(wheres) > 1:
+                self._check_split()
+            self._run_chunks(url_params, wheres, deadline)
+        elif self._asof_list:
+            requests = []
             for asof in self._asof_list:
+                asof_params = dict(url_params)
                 if asof:
-                    url_params["asof"] = str(asof)
-                    api = "Hist"
+                    asof_params["asof"] = str(asof)
+                    requests.append((asof_params, "Hist", deadline))
                 else:
-                    del url_params["asof"]
-                    api = "Data"
-                xml = self.run_single_query(url_params, api=api)
-                self._query_results.append((xml, asof))
+                    requests.append((asof_params, "Data", deadline))
+            documents = self._fetch_queries(requests)
+            for document, asof in zip(documents, self._asof_list):
+                self._update_length(document)
+                self._query_results.append((document, asof))
         else:
-            xml = self.run_single_query(url_params)
+            xml = self.run_single_query(url_params, deadline=deadline)
             self._query_results.append((xml, None))
         self._query_has_run = True
         self._dirty_query = False  # results now match the query
 
+    def _fetch_queries(self, requests):
+        """The documents of the (url_params, api, deadline) *requests*, in order"""
+        from concurrent.futures import ThreadPoolExecutor
+        from contextvars import copy_context
+
+        # the requests are independent, so fetch them concurrently.  map() hands the
+        # results back in order.  Each request runs in a copy of the caller's context,
+        # which carries its request lane.
+        workers = max(1, min(self.get_max_workers(), len(requests)))
+        contexts = [copy_context() for _ in requests]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(
+                    lambda r, context: context.run(self._fetch_query, *r),
+                    requests,
+                    contexts,
+                )
+            )
+
+    def _check_split(self, paged=False):
+        """Raises ValueError for the settings that don't apply to a query split in several
+        requests: each request would be paged or sorted on its own"""
+        if self.get_page_size() and not paged:
+            raise ValueError(
+                "page() can't be used when an in-list is split in several "
+                "requests, use paged()"
+            )
+        if self._sort_list:
+            raise ValueError(
+                "sort() can't be used when an in-list is split in several requests, "
+                "the results would only be sorted within each request"
+            )
+
+    def _run_chunks(self, url_params, wheres, deadline=None):
+        """Runs the query as one request per where string and asof moment, the results of
+        every moment being the results of its requests in turn"""
+        requests = []
+        asofs = self._asof_list or [None]
+        for asof in asofs:
+            for where in wheres:
+                params = dict(url_params, where=where)
+                if asof:
+                    params["asof"] = str(asof)
+                    requests.append((params, "Hist", deadline))
+                else:
+                    requests.append((params, "Data", deadline))
+        documents = self._fetch_queries(requests) if requests else []
+        # the length is the one of the last moment, like for a single request
+        length = total = 0
+        for index, document in enumerate(documents):
+            if index % len(wheres) == 0:
+                length = total = 0
+            self._update_length(document)
+            length += self._length
+            total += self._max_length
+            self._query_results.append((document, asofs[index // len(wheres)]))
+        self._length = length
+        self._max_length = total
+
     def select(self, *args, **kw):
         """Add attribute names to the select list for this query. The attributes
         in the select list will be returned in the query results, and can be used
@@ -238,7 +520,11 @@ class V1Query(object):
 
     def where(self, terms={}, **kw):
         """Add where terms to the criteria for this query. Right now this method
-        only allows Equals comparisons."""
+        only allows Equals comparisons.  A list, tuple or set of values matches any of
+        them, e.g. where(Number=["S-01001", "S-01002"]); when the query string would get
+        longer than max_query_length() the query is split in several requests, run
+        concurrently, whose results are iterated in turn.  A split query can't be
+        sorted or paged with page(): running it raises ValueError."""
         self._where_terms.update(terms)
         self._where_terms.update(kw)
         self._dirty_query = True
@@ -296,6 +582,142 @@ class V1Query(object):
                 self._dirty_query = True
         return self
 
+    def page_xml(self, page_size=DEFAULT_PAGE_SIZE, start=None, deadline=None):
+        """Generator of the (page start, xml) of every page of the results, fetching one page
+        at a time from *start* (the page() start by default) until the total is reached.
+        Pages aren't kept by the query, so memory use doesn't grow with the number of results.
+        Every page is requested within *deadline* (a Deadline), by default the deadline() of
+        the query counted from the first page.  The requests of an in-list split by where()
+        are paged through one after the other.
+        """
+        if deadline is None:
+            deadline = self._new_deadline()
+        url_params = self.get_url_params()
+        api = "Data"
+        if self._asof_list:
+            if len(self._asof_list) > 1:
+                raise ValueError("Paging is only possible for a single asof")
+            if self._asof_list[0]:
+                url_params["asof"] = str(self._asof_list[0])
+                api = "Hist"
+        if start is None:
+            start = self.get_page_start() or 0
+        wheres = self.get_where_chunks(reserve=PAGE_PARAM_LENGTH)
+        if len(wheres) > 1:
+            if start:
+                raise ValueError("A start can't be used when an in-list is split")
+            self._check_split(paged=True)
+        for where in wheres:
+            if where:
+                url_params["where"] = where
+            page_start = start
+            while True:
+                url_params["page"] = "{0},{1}".format(page_size, page_start)
+                xml = self._fetch_query_xml(url_params, api, deadline)
+                yield page_start, xml
+                total = int(xml.get("total", 0))
+                page_start += page_size
+                if page_start >= total or not len(xml):
+                    break
+
+    def paged(self, page_size=DEFAULT_PAGE_SIZE, start=None):
+        """Iterate over all the results, requesting them *page_size* at a time, so large result
+        sets don't have to come back in a single response."""
+        asof = self._asof_list[0] if self._asof_list else None
+        self.apply_select_profile()
+        site = self._site
+        for page_start, xml in self.page_xml(page_size, start):
+            for found_asset in xml.findall("Asset"):
+                asset = self._asset_class.from_query_select(found_asset, asof)
+                if site is not None:
+                    asset._v1_query_site = site
+                yield asset
+
+    def backend(self, name):
+        """Run the query against the "rest-1.v1" endpoint (the default, XML) or "query.v1" (JSON,
+        cheaper to parse, and all asof moments are sent in one request).  page_xml() and paged()
+        always use rest-1.v1 and XML."""
+        if name not in BACKENDS:
+            raise ValueError("Unknown query backend: " + name)
+        if name != self._backend:
+            self._backend = name
+            self._dirty_query = True
+        return self
+
+    def deadline(self, seconds=None):
+        """Set the number of seconds every run of the query may take, all its requests
+        included: every page of paged(), every asof moment.  Requests time out when the
+        deadline is reached and V1TimeoutError is raised.  Call with no argument to clear it.
+        """
+        self._deadline_seconds = seconds
+        return self
+
+    def max_query_length(self, length=DEFAULT_MAX_QUERY_LENGTH):
+        """Set the longest query string of a request.  Queries with where() in-lists that
+        would be longer are split in several requests, see where()."""
+        if length != self._max_query_length:
+            self._max_query_length = length
+            self._dirty_query = True
+        return self
+
+    def concurrency(self, max_workers=DEFAULT_MAX_WORKERS):
+        """Set the maximum number of requests this query may have in flight at the same time,
+        e.g. when fetching the results for several asof() moments.  Use 1 to run them serially.
+        """
+        self._max_workers = max(1, int(max_workers))
+        return self
+
+    def timeseries(self):
+        """Run the query and return a list of (asof, idref, values) rows, one for every asset
+        found at every asof() moment, in the order of the asof list.  'values' maps each
+        returned attribute or relation name to its raw value, without building asset instances,
+        which makes this the cheap way to chart selected values over time."""
+        self._run_query_if_needed()
+        if self._backend == "query.v1":
+            unpack = self._asset_class._v1_v1meta.query_v1_values
+            return [
+                (asof, result["_oid"], unpack(result))
+                for results, asof in self._query_results
+                for result in results
+            ]
+        if self._results_format == "json":
+            unpack = self._asset_class._v1_v1meta.unpack_asset_json_values
+            return [
+                (asof, found_asset["id"], unpack(found_asset))
+                for result, asof in self._query_results
+                for found_asset in result["Assets"]
+            ]
+        unpack = self._asset_class._v1_v1meta.unpack_asset_values
+        return [
+            (asof, found_asset.get("id"), unpack(found_asset))
+            for result, asof in self._query_results
+            for found_asset in result.findall("Asset")
+        ]
+
+    def aggregate(self, **aggregates):
+        """Run the query with the server-side aggregates of v1pysdk.aggregates selected, e.g.
+        aggregate(total=Sum("Workitems.Estimate")), and return their typed values without
+        reading the aggregated assets.
+        :return: a list of AggregateRow(asset, asof, values) for every asset found at every
+                 asof() moment, values mapping the keyword names to the aggregate values
+        """
+        terms = dict((name, value.term()) for name, value in aggregates.items())
+        missing = [t for t in terms.values() if t not in self._sel_list]
+        if missing:
+            self.select(*missing)
+        self._clear_query_results()
+        asset_from_oid = self._asset_class._v1_v1meta.asset_from_oid
+        rows = []
+        for asof, idref, values in self.timeseries():
+            # historical results carry a moment
+            asset = asset_from_oid(":".join(idref.split(":")[:2]))
+            converted = dict(
+                (name, aggregates[name].convert(values.get(term)))
+                for name, term in terms.items()
+            )
+            rows.append(AggregateRow(asset, asof, converted))
+        return rows
+
     def first(self):
         return list(self)[0]
 
@@ -317,3 +739,61 @@ class V1Query(object):
         if attrname not in self._sel_list and not attrname.startswith("__"):
             self.select(attrname)
         return (getattr(i, attrname) for i in self)
+
+
+class V1QueryBatch(object):
+    """Runs several independent queries in a single query.v1 request.
+
+    with v1.batch() as batch:
+        stories = batch.add(v1.Story.select("Name").where(Scope="Scope:1052"))
+        counts = batch.add(v1.Scope.select("Name", "Workitems.@Count"))
+    for story in stories:
+        ...
+
+    Each added query is switched to the query.v1 backend and receives its own results when
+    the batch runs, so it's then used exactly as if it had run by itself.
+    """
+
+    def __init__(self, v1meta):
+        self.v1meta = v1meta
+        self._queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        if exception_type is None:
+            self.run()
+
+    def __len__(self):
+        return len(self._queries)
+
+    def add(self, query, callback=None):
+        """Add a query to the batch, returns the query.
+        :param callback: optional callable, called as callback(query) once the batch has run
+        """
+        query.backend("query.v1")
+        self._queries.append((query, callback))
+        return query
+
+    def run(self):
+        """Send every pending query in one request and hand each one its results"""
+        pending, self._queries = self._queries, []
+        if not pending:
+            return []
+        payloads = []
+        counts = []
+        for query, callback in pending:
+            query.apply_select_profile()
+            query_payloads = query.get_query_v1_payloads()
+            payloads.extend(query_payloads)
+            counts.append(len(query_payloads))
+        results = self.v1meta.server.get_query_v1_json(payloads)
+        position = 0
+        for (query, callback), count in zip(pending, counts):
+            query.set_query_v1_results(results[position : position + count])
+            position += count
+        for query, callback in pending:
+            if callback is not None:
+                callback(query)
+        return [query for query, callback in pending]
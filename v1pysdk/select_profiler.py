@@ -0,0 +1,143 @@
+"""
+Adaptive select lists for V1Meta.
+
+Reading an attribute that a query didn't select costs one HTTP GET per result (an N+1
+pattern).  A SelectProfiler remembers the attributes fetched that way on the results of each
+query call site (the line of code that built the query) and adds them to the select list of
+later executions of the queries built there:
+
+    profiler = SelectProfiler(mode="warn")
+    v1 = V1Meta(instance_url=url, username=user, password=pw, select_profiler=profiler)
+    for story in v1.Story.select("Name"):
+        print(story.Name, story.Estimate)   # the next run selects Estimate as well
+    print(profiler.format_report())
+
+With mode="warn" a warning is logged once an attribute has been fetched *threshold* times on
+the results of a site, mode="strict" raises SingleAttributeFetchError instead, which is meant
+for test suites.  Only queries with a select list learn: a query without one gets the default
+attributes of its type, which adding a select list would narrow.  Attributes read on related
+assets (story.Scope.Name) aren't tracked.
+"""
+
+import logging
+import os
+import sys
+import threading
+from collections import Counter, namedtuple
+
+from .client import V1Error
+
+MODES = (None, "warn", "strict")
+
+# number of single-attribute fetches of an attribute on the results of a site that are reported
+DEFAULT_THRESHOLD = 2
+
+_PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+logger = logging.getLogger(__name__)
+
+# where a query was built: asset type, file name and line number
+CallSite = namedtuple("CallSite", "asset_type filename lineno")
+
+# the single-attribute fetches of one attribute on the results of a call site
+FetchReport = namedtuple("FetchReport", "site attribute count")
+
+
+class SingleAttributeFetchError(V1Error):
+    pass
+
+
+def call_site(asset_type_name):
+    """The CallSite of the first caller outside of this package"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename.startswith(_PACKAGE_DIRECTORY):
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return CallSite(asset_type_name, frame.f_code.co_filename, frame.f_lineno)
+
+
+class SelectProfiler(object):
+    """Learns the select lists of query call sites from the attributes fetched one at a time
+    on their results"""
+
+    def __init__(self, mode=None, threshold=DEFAULT_THRESHOLD, learn=True):
+        """
+        :param mode: None, "warn" to log the N+1 fetches or "strict" to raise
+                     SingleAttributeFetchError for them
+        :param threshold: number of fetches of an attribute on the results of a site that
+                          makes a warning or an error
+        :param learn: add the attributes fetched singly to later queries from the same site
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown select profiler mode: " + str(mode))
+        self.mode = mode
+        self.threshold = threshold
+        self.learn = learn
+        self.counts = Counter()
+        self._learned = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # a copy (e.g. for a worker process) has the settings, and learns on its own
+        return SelectProfiler, (self.mode, self.threshold, self.learn)
+
+    def call_site(self, asset_type_name):
+        return call_site(asset_type_name)
+
+    def learned(self, site):
+        """Attributes learned for the queries built at *site*, in the order they were seen"""
+        return list(self._learned.get(site, ()))
+
+    def single_attr_fetched(self, site, attr):
+        """Records the fetch of *attr* on a result of a query built at *site*.  Raises
+        SingleAttributeFetchError in strict mode once the threshold is reached."""
+        with self._lock:
+            self.counts[site, attr] += 1
+            count = self.counts[site, attr]
+            if self.learn:
+                learned = self._learned.setdefault(site, [])
+                if attr not in learned:
+                    learned.append(attr)
+        if count < self.threshold or self.mode is None:
+            return
+        message = "%d single-attribute fetches of %s.%s on the results of %s:%d" % (
+            count,
+            site.asset_type,
+            attr,
+            site.filename,
+            site.lineno,
+        )
+        if self.mode == "strict":
+            raise SingleAttributeFetchError(message + ", add it to the select list")
+        if count == self.threshold:
+            logger.warning("%s, add it to the select list", message)
+
+    def report(self):
+        """List of FetchReport, most fetched first"""
+        with self._lock:
+            counts = list(self.counts.items())
+        return [
+            FetchReport(site, attr, count)
+            for (site, attr), count in sorted(
+                counts, key=lambda item: (-item[1], item[0])
+            )
+        ]
+
+    def format_report(self):
+        return "\n".join(
+            "%6d  %s.%s  %s:%d"
+            % (
+                entry.count,
+                entry.site.asset_type,
+                entry.attribute,
+                entry.site.filename,
+                entry.site.lineno,
+            )
+            for entry in self.report()
+        )
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self._learned.clear()
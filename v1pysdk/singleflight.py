@@ -0,0 +1,90 @@
+"""
+Coalescing of identical concurrent calls.
+
+V1Server runs its GETs through a SingleFlight keyed by the request URL, so threads asking for
+the same meta, asset or query at the same time share one request and its parsed result,
+e.g. when many stories with the same owner refresh it together.  Every caller gets a copy of
+the parsed result of its own, so changing one doesn't change the others.  Calls that start
+after the shared one finished make their own request: nothing is cached.  V1Server forgets
+the GETs in flight once a POST is done, so the GETs made after a commit don't share a GET
+that may have been answered before it.
+"""
+
+import threading
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "error", "sharers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # number of callers waiting for the result of the call
+        self.sharers = 0
+
+
+class SingleFlight(object):
+    """Runs one call per key at a time, concurrent callers with the same key wait for it and
+    get its result (or its exception)"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        # number of calls made, and of callers that shared a call instead
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key, function, timeout=None, copy=None):
+        """Calls function(), unless a call for *key* is already in flight.
+        :param timeout: seconds a caller sharing another call waits for it, None to wait
+                        as long as it takes
+        :param copy: optional copy(result) giving each caller of a shared call a result of
+                     its own.  The result of function() itself is only read.
+        :return: (result, shared), shared being True when the result came from another caller
+        :raise TimeoutError: when the shared call wasn't done within *timeout*
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.collapsed += 1
+                call.sharers += 1
+                leader = False
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("Shared call not done within %ss" % timeout)
+            if call.error is not None:
+                raise call.error
+            if copy is not None:
+                return copy(call.result), True
+            return call.result, True
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # forget() may already have dropped it
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                # no caller can join once the call is out of _calls
+                sharers = call.sharers
+            call.done.set()
+        if copy is not None and sharers:
+            return copy(call.result), False
+        return call.result, False
+
+    def forget(self):
+        """Makes the calls started from now on run on their own instead of sharing the calls
+        in flight, which go on for the callers already waiting for them"""
+        with self._lock:
+            self._calls.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "collapsed": self.collapsed}
@@ -14,6 +14,18 @@ class Attachment(object):
 
     file_data = property(get_blob, set_blob)
 
+    def download_to(self, fileobj, **kw):
+        """Streams the attachment body into a binary file object in bounded chunks.
+        Accepts the chunk_size and progress options of V1Server.download_attachment,
+        returns the number of bytes copied."""
+        return self._v1_v1meta.download_attachment(self, fileobj, **kw)
+
+    def upload_from(self, fileobj, **kw):
+        """Streams the content of a binary file object to the server as the attachment body.
+        Accepts the chunk_size, progress and content_type options of V1Server.upload_attachment.
+        """
+        return self._v1_v1meta.upload_attachment(self, fileobj, **kw)
+
 
 # the special_classes mapping will be used to lookup mixins by asset type name.
 special_classes = locals()
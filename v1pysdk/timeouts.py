@@ -0,0 +1,185 @@
+"""
+Deadlines and hedged requests for V1Server.
+
+A Deadline is the point in time all the requests of an operation must be done by, e.g. every
+page of a paged query.  Each request gets what's left of it as its socket timeout, no request
+is started once it's past, and a response body still coming in then is given up:
+
+    for story in v1.Story.select("Name").deadline(60).paged(500):
+        ...
+
+Hedging cuts the tail latency of idempotent GETs: when an attempt is slower than a percentile
+of the recent latencies, a second identical request is sent and whichever answers first is
+used.  The budget bounds the share of requests that may be sent twice:
+
+    v1 = V1Meta(instance_url=url, hedging=Hedging(percentile=95, budget=0.05))
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+_current_deadline = ContextVar("v1pysdk_deadline", default=None)
+
+
+class Deadline(object):
+    """Point in time, *seconds* from now, that requests must be done by"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left, negative once the deadline is past"""
+        return self.expires - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return "Deadline(%r, remaining=%.3f)" % (self.seconds, self.remaining())
+
+
+def as_deadline(deadline):
+    """A Deadline from a Deadline, a number of seconds or None"""
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
+
+
+def current_deadline():
+    """The Deadline of the request made in the current context, None when it has none"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def use_deadline(deadline):
+    """Makes *deadline* the Deadline of the requests made in the block, on the current
+    thread.  With None the block keeps the deadline it runs in."""
+    if deadline is None:
+        yield _current_deadline.get()
+        return
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+class Hedging(object):
+    """Sends a second attempt of the calls that take longer than a percentile of the latencies
+    seen so far, within a budget"""
+
+    def __init__(
+        self,
+        percentile=95,
+        budget=0.05,
+        min_samples=20,
+        window=200,
+        delay=None,
+        max_workers=8,
+    ):
+        """
+        :param percentile: latency percentile after which a call is hedged
+        :param budget: maximum share of the calls that may be hedged
+        :param min_samples: number of latencies measured before any call is hedged
+        :param window: number of recent latencies the percentile is computed from
+        :param delay: fixed hedging delay in seconds, instead of the percentile
+        :param max_workers: number of attempts that may run at the same time
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.delay = delay
+        self.window = window
+        self.max_workers = max_workers
+        self.calls = 0
+        self.hedged = 0
+        # hedged calls answered first by the second attempt
+        self.wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="v1pysdk-hedging"
+        )
+
+    def __reduce__(self):
+        # a copy (e.g. for a worker process) starts with the settings, without the
+        # latencies and the executor
+        return Hedging, (
+            self.percentile,
+            self.budget,
+            self.min_samples,
+            self.window,
+            self.delay,
+            self.max_workers,
+        )
+
+    def hedge_delay(self):
+        """Seconds after which a call is hedged, None while there aren't enough samples"""
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = int(round(self.percentile / 100.0 * (len(latencies) - 1)))
+        return latencies[index]
+
+    def _timed(self, function):
+        t0 = time.perf_counter()
+        result = function()
+        with self._lock:
+            self._latencies.append(time.perf_counter() - t0)
+        return result
+
+    def _submit(self, function):
+        # the attempt runs in a copy of the caller's context, which carries its request
+        # lane and deadline
+        return self._executor.submit(copy_context().run, self._timed, function)
+
+    def call(self, function):
+        """Calls function(), a second time concurrently when the first call is slow.
+        :return: (result, hedged) with the result of the attempt that finished first
+        """
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(function), False
+        first = self._submit(function)
+        try:
+            return first.result(timeout=delay), False
+        except FutureTimeoutError:
+            pass
+        with self._lock:
+            allowed = self.hedged < self.budget * self.calls
+            if allowed:
+                self.hedged += 1
+        if not allowed:
+            return first.result(), False
+        second = self._submit(function)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = first if first in done else second
+        if winner.exception() is not None:
+            # the other attempt may still succeed
+            winner = second if winner is first else first
+        if winner is second:
+            with self._lock:
+                self.wins += 1
+        return winner.result(), True
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "hedged": self.hedged, "wins": self.wins}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -1,13 +1,114 @@
+import time
+from xml.etree.ElementTree import Element
+
 from .client import *
-from .base_asset import BaseAsset
+from .base_asset import (
+    AssetAttribute,
+    BaseAsset,
+    MultiRelationAttribute,
+    SingleRelationAttribute,
+)
+from .bulk import BulkWriter
 from .cache_decorator import memoized
 from .special_class_methods import special_classes
-from .none_deref import NoneDeref
+from .lazy_relations import LazyRelationList
+from .query import V1QueryBatch
 from .string_utils import split_attribute
 
 
+def is_query_v1_relation(value):
+    """query.v1 gives related assets as {"_oid": ...} objects, or lists of them"""
+    if isinstance(value, dict):
+        return "_oid" in value
+    if isinstance(value, list):
+        return all(isinstance(item, dict) and "_oid" in item for item in value)
+    return False
+
+
+# how rest-1.v1 responses are requested and decoded
+RESPONSE_FORMATS = ("xml", "json")
+
+
+def json_text(value):
+    """The text the XML API would give for a JSON value"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def json_relation_idrefs(relation):
+    """The related idrefs of a rest-1.v1 JSON relation, whose value is a single related
+    asset object, None, or a list of them"""
+    value = relation.get("value")
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [item["idref"] for item in value]
+    return [value["idref"]]
+
+
+def relation_idrefs(value, read=False):
+    """The "Type:id" tokens of a relation value: None, an asset, a list of assets or a
+    LazyRelationList.  With *read*, a LazyRelationList changed in place gives the idrefs it
+    was read with."""
+    if value is None:
+        return []
+    if isinstance(value, BaseAsset):
+        value = [value]
+    if isinstance(value, LazyRelationList):
+        idrefs = value.read_idrefs if read else value.idrefs
+    else:
+        idrefs = [item.idref for item in value if isinstance(item, BaseAsset)]
+    # historical idrefs carry a moment
+    return [":".join(idref.split(":")[:2]) for idref in idrefs]
+
+
+def is_value_list(value):
+    """True for the list of values of a multi-value attribute such as TaggedWith, as
+    opposed to the assets of a multi-value relation"""
+    if not isinstance(value, list) or isinstance(value, LazyRelationList):
+        return False
+    return any(not isinstance(item, BaseAsset) for item in value)
+
+
+def attribute_values(value):
+    """The text of the values of a multi-value attribute value, read as a list or, but for
+    TaggedWith, as its first value"""
+    if not isinstance(value, list):
+        value = [value]
+    return [str(item) for item in value if item is not None]
+
+
+def list_changes(newvalue, oldvalue, known):
+    """(kind, added, removed) of a list set as the value of a multi-value relation ("multi",
+    with idrefs) or attribute ("values"), relative to *oldvalue* when it's *known*"""
+    if is_value_list(newvalue) or (known and is_value_list(oldvalue)):
+        kind, added = "values", attribute_values(newvalue)
+        old = attribute_values(oldvalue) if known else []
+    else:
+        kind, added = "multi", relation_idrefs(newvalue)
+        # the value read may be the list that was changed in place
+        old = relation_idrefs(oldvalue, read=True) if known else []
+    old_members, new_members = set(old), set(added)
+    added = [item for item in added if item not in old_members]
+    return kind, added, [item for item in old if item not in new_members]
+
+
 class V1Meta(object):
     def __init__(self, *args, **kw):
+        # response_format="json" reads rest-1.v1 responses as JSON instead of XML
+        response_format = kw.pop("response_format", "xml")
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError("Unknown response format: " + str(response_format))
+        self.response_format = response_format
+        # optional v1pysdk.select_profiler.SelectProfiler learning the select lists of queries
+        self.select_profiler = kw.pop("select_profiler", None)
+        # optional v1pysdk.bulk.BulkWriter committing through the api/asset endpoint
+        self.bulk_writer = kw.pop("bulk_writer", None)
         self.server = V1Server(*args, **kw)
         self.global_cache = {}
         self.dirtylist = []
@@ -44,47 +145,16 @@ class V1Meta(object):
 
             class_members[opname] = operation_func
 
+        # one shared descriptor per attribute instead of a property and its closures
         for attribute in xmldata.findall("AttributeDefinition"):
             attr = attribute.get("name")
             if attribute.get("attributetype") == "Relation":
                 if attribute.get("ismultivalue") == "True":
-
-                    def getter(self, attr=attr):
-                        return self._v1_getattr(attr)
-
-                    def setter(self, value, attr=attr):
-                        return self._v1_setattr(attr, list(value))
-
-                    def deleter(self, attr=attr):
-                        raise NotImplementedError
-
+                    class_members[attr] = MultiRelationAttribute(attr)
                 else:
-
-                    def getter(self, attr=attr):
-                        v = self._v1_getattr(attr)
-                        if v:
-                            return self._v1_getattr(attr)[0]
-                        else:
-                            return NoneDeref()
-
-                    def setter(self, value, attr=attr):
-                        return self._v1_setattr(attr, value)
-
-                    def deleter(self, attr=attr):
-                        raise NotImplementedError
-
+                    class_members[attr] = SingleRelationAttribute(attr)
             else:
-
-                def getter(self, attr=attr):
-                    return self._v1_getattr(attr)
-
-                def setter(self, value, attr=attr):
-                    return self._v1_setattr(attr, value)
-
-                def deleter(self, attr=attr):
-                    raise NotImplementedError
-
-            class_members[attr] = property(getter, setter, deleter)
+                class_members[attr] = AssetAttribute(attr)
 
         bases = [
             BaseAsset,
@@ -107,62 +177,142 @@ class V1Meta(object):
 
     def commit(self):
         errors = []
+        instrumentation = self.server.instrumentation
+        if instrumentation is not None:
+            t0 = time.perf_counter()
+            asset_count = len(self.dirtylist)
         # we're flushing changes, make sure our memoization cache is cleared so the updates
         # are re-queried
         if self.dirtylist:
             self.clear_memoized_cache()
+        if self.bulk_writer is not None:
+            # written in batches of api/asset commands instead of a POST per asset
+            dirtylist, self.dirtylist = self.dirtylist, []
+            errors = self.bulk_writer.commit(self, dirtylist)
         for asset in self.dirtylist:
             try:
                 asset._v1_commit()
             except V1Error as e:
                 errors.append(e)
             self.dirtylist = []
+        if instrumentation is not None:
+            instrumentation.commit_finished(
+                asset_count, errors, time.perf_counter() - t0
+            )
         return errors
 
-    def generate_update_doc(self, newdata):
-        update_doc = Element("Asset")
+    def update_changes(self, newdata, olddata=None):
+        """The changes of *newdata* as (name, kind, value) tuples, kind being "attribute" (the
+        text of the value), "relation" (an idref or None), "multi" (the idrefs added and
+        removed) or "values" (the values of a multi-value attribute added and removed).  When
+        the current data of the asset is given as *olddata*, values equal to it are left out,
+        and multi-value relations and attributes only add and remove what differs from it.
+        """
+        olddata = olddata or {}
         for attrname, newvalue in newdata.items():
+            known = attrname in olddata
+            oldvalue = olddata.get(attrname)
             if newvalue is None:  # single relation was removed
-                node = Element("Relation")
-                node.set("name", attrname)
-                node.set("act", "set")
+                if known and (oldvalue is None or oldvalue == []):
+                    continue
+                yield attrname, "relation", None
             elif isinstance(newvalue, BaseAsset):  # single relation was changed
-                node = Element("Relation")
+                if known and relation_idrefs(oldvalue, read=True) == relation_idrefs(
+                    newvalue
+                ):
+                    continue
+                yield attrname, "relation", newvalue.idref
+            elif isinstance(newvalue, list):  # multi relation or attribute was changed
+                kind, added, removed = list_changes(newvalue, oldvalue, known)
+                if known and not added and not removed:
+                    continue
+                yield attrname, kind, (added, removed)
+            else:  # Not a relation
+                if known and oldvalue == str(newvalue):
+                    continue
+                yield attrname, "attribute", str(newvalue)
+
+    def generate_update_doc(self, newdata, olddata=None):
+        """The update document of *newdata*, see update_changes()"""
+        update_doc = Element("Asset")
+        for attrname, kind, value in self.update_changes(newdata, olddata):
+            if kind == "attribute":
+                node = Element("Attribute")
                 node.set("name", attrname)
                 node.set("act", "set")
-                ra = Element("Asset")
-                ra.set("idref", newvalue.idref)
-                node.append(ra)
-            elif isinstance(newvalue, list):  # multi relation was changed
+                node.text = value
+            elif kind == "relation":
                 node = Element("Relation")
                 node.set("name", attrname)
-                for item in newvalue:
-                    child = Element("Asset")
-                    child.set("idref", item.idref)
-                    child.set("act", "add")
-                    node.append(child)
-            else:  # Not a relation
+                node.set("act", "set")
+                if value is not None:
+                    ra = Element("Asset")
+                    ra.set("idref", value)
+                    node.append(ra)
+            elif kind == "values":
                 node = Element("Attribute")
                 node.set("name", attrname)
-                node.set("act", "set")
-                node.text = str(newvalue)
+                for act, values in zip(("add", "remove"), value):
+                    for text in values:
+                        child = Element("Value")
+                        child.set("act", act)
+                        child.text = text
+                        node.append(child)
+            else:
+                node = Element("Relation")
+                node.set("name", attrname)
+                for act, idrefs in zip(("add", "remove"), value):
+                    for idref in idrefs:
+                        child = Element("Asset")
+                        child.set("idref", idref)
+                        child.set("act", act)
+                        node.append(child)
             update_doc.append(node)
         return update_doc
 
+    def generate_update_command(self, newdata, olddata=None):
+        """The changes of *newdata* as the attributes of an api/asset command (see
+        v1pysdk.bulk): multi-value relations and attributes are {"add": [...],
+        "remove": [...]} objects
+        """
+        command = {}
+        for attrname, kind, value in self.update_changes(newdata, olddata):
+            if kind in ("multi", "values"):
+                added, removed = value
+                value = {"add": added, "remove": removed}
+            command[attrname] = value
+        return command
+
     def create_asset(self, asset_type_name, newdata):
         update_doc = self.generate_update_doc(newdata)
         new_asset_xml = self.server.create_asset(asset_type_name, update_doc)
         asset_type, asset_oid, asset_moment = new_asset_xml.get("id").split(":")
         return self.asset_class(asset_type)(asset_oid)
 
-    def update_asset(self, asset_type_name, asset_oid, newdata):
-        update_doc = self.generate_update_doc(newdata)
+    def create_assets(self, asset_type_name, newdatas):
+        """Creates an asset per dict of *newdatas* through the api/asset endpoint, in the
+        batches of the bulk_writer (a default BulkWriter when there is none).
+        :return: the created assets, in order
+        :raise v1pysdk.bulk.V1BulkCreateError: when some of them couldn't be created
+        """
+        writer = self.bulk_writer if self.bulk_writer is not None else BulkWriter()
+        return writer.create(self, asset_type_name, newdatas)
+
+    def update_asset(self, asset_type_name, asset_oid, newdata, olddata=None):
+        """Sends the changes of *newdata*, relative to *olddata* when it's given (see
+        generate_update_doc()).  Nothing is sent when nothing changed."""
+        update_doc = self.generate_update_doc(newdata, olddata)
+        if not len(update_doc):
+            return None
         return self.server.update_asset(asset_type_name, asset_oid, update_doc)
 
     def execute_operation(self, asset_type_name, oid, opname):
         return self.server.execute_operation(asset_type_name, oid, opname)
 
     def get_attr(self, asset_type_name, oid, attrname, moment=None):
+        if self.response_format == "json":
+            node = self.server.get_attr_json(asset_type_name, oid, attrname, moment)
+            return self.unpack_asset_json({"Attributes": {attrname: node}})[attrname]
         xml = self.server.get_attr(asset_type_name, oid, attrname, moment)
         dummy_asset = ElementTree.Element("Asset")
         dummy_asset.append(xml)
@@ -172,15 +322,129 @@ class V1Meta(object):
         return self.server.get_query_xml("Data", asset_type_name, where, sel)
 
     def read_asset(self, asset_type_name, asset_oid, moment=None):
+        if self.response_format == "json":
+            document = self.server.get_asset_json(asset_type_name, asset_oid, moment)
+            return self.unpack_asset_json(document)
         xml = self.server.get_asset_xml(asset_type_name, asset_oid, moment)
         return self.unpack_asset(xml)
 
     def unpack_asset(self, xml):
+        instrumentation = self.server.instrumentation
+        if instrumentation is not None:
+            t0 = time.perf_counter()
         output = {}
         self.unpack_asset_relations(output, xml)
         self.unpack_asset_attributes(output, xml)
+        if instrumentation is not None:
+            asset_type_name = (xml.get("id") or "").split(":")[0]
+            instrumentation.asset_unpacked(asset_type_name, time.perf_counter() - t0)
+        return output
+
+    def unpack_asset_values(self, xml):
+        """Flat version of unpack_asset() that maps every returned name to its raw value.
+        Attributes give their text (a list for multi-value attributes) and relations give
+        the list of related idrefs, so no asset class or instance is ever built."""
+        output = {}
+        for relation in xml.findall("Relation"):
+            output[relation.get("name")] = [
+                value_element.get("idref")
+                for value_element in relation.findall("Asset")
+            ]
+        for attribute in xml.findall("Attribute"):
+            values = attribute.findall("Value")
+            if values:
+                output[attribute.get("name")] = [v.text for v in values]
+            else:
+                output[attribute.get("name")] = attribute.text
         return output
 
+    def unpack_asset_json(self, asset):
+        """unpack_asset() for an asset of a rest-1.v1 JSON response, where the attributes and
+        relations are the "Attributes" object of the asset, keyed by name"""
+        instrumentation = self.server.instrumentation
+        if instrumentation is not None:
+            t0 = time.perf_counter()
+        output = {}
+        nodes = asset.get("Attributes") or {}
+        relations = sorted(
+            name for name, node in nodes.items() if node.get("_type") == "Relation"
+        )
+        # containing relations first, as unpack_asset_relations() does
+        for name in relations:
+            idrefs = json_relation_idrefs(nodes[name])
+            self.add_relation_to_output(output, name, LazyRelationList(self, idrefs))
+        for name, node in nodes.items():
+            if node.get("_type") == "Relation":
+                continue
+            value = node.get("value")
+            if isinstance(value, list):
+                values = [json_text(v) for v in value] or [None]
+            else:
+                values = [json_text(value)]
+            self.add_attribute_to_output(output, name, values)
+        if instrumentation is not None:
+            asset_type_name = (asset.get("id") or "").split(":")[0]
+            instrumentation.asset_unpacked(asset_type_name, time.perf_counter() - t0)
+        return output
+
+    def unpack_asset_json_values(self, asset):
+        """unpack_asset_values() for an asset of a rest-1.v1 JSON response"""
+        output = {}
+        for name, node in (asset.get("Attributes") or {}).items():
+            value = node.get("value")
+            if node.get("_type") == "Relation":
+                output[name] = json_relation_idrefs(node)
+            elif isinstance(value, list):
+                # like an XML attribute without Value elements
+                output[name] = [json_text(v) for v in value] or None
+            else:
+                output[name] = json_text(value)
+        return output
+
+    def unpack_query_v1(self, result):
+        """unpack_asset() for a result object of the query.v1 endpoint"""
+        output = {}
+        relations = []
+        attributes = []
+        for name, value in result.items():
+            if name == "_oid":
+                continue
+            if is_query_v1_relation(value):
+                relations.append((name, value))
+            else:
+                attributes.append((name, value))
+        # containing relations first, as unpack_asset_relations() does
+        for name, value in sorted(relations):
+            items = value if isinstance(value, list) else [value]
+            idrefs = [item["_oid"] for item in items]
+            self.add_relation_to_output(output, name, LazyRelationList(self, idrefs))
+        for name, value in attributes:
+            if isinstance(value, list):
+                values = [json_text(v) for v in value] or [None]
+            else:
+                values = [json_text(value)]
+            self.add_attribute_to_output(output, name, values)
+        return output
+
+    def query_v1_values(self, result):
+        """unpack_asset_values() for a result object of the query.v1 endpoint"""
+        output = {}
+        for name, value in result.items():
+            if name == "_oid":
+                continue
+            if is_query_v1_relation(value):
+                items = value if isinstance(value, list) else [value]
+                output[name] = [item["_oid"] for item in items]
+            elif isinstance(value, list):
+                output[name] = [json_text(v) for v in value]
+            else:
+                output[name] = json_text(value)
+        return output
+
+    def batch(self):
+        """A V1QueryBatch running several queries in one query.v1 request"""
+        return V1QueryBatch(self)
+
     def unpack_asset_attributes(self, output, xml):
         for attribute in xml.findall("Attribute"):
             # key = attribute.get('name').replace('.','_')
@@ -197,18 +461,16 @@ class V1Meta(object):
         # containing relations are added before leaf ones.
         for relation in sorted(xml.findall("Relation"), key=lambda x: x.get("name")):
             key = relation.get("name")
-            related_asset_elements = relation.findall("Asset")
-            rellist = []
-            for value_element in related_asset_elements:
-                relation_idref = value_element.get("idref")
-                # value = self.asset_from_oid(relation_idref)
-                value = self.history_aware_asset_from_oid(relation_idref)
-                rellist.append(value)
-            self.add_relation_to_output(output, key, rellist)
+            # keep the raw idrefs, asset proxies are only built for accessed entries
+            idrefs = [
+                value_element.get("idref")
+                for value_element in relation.findall("Asset")
+            ]
+            self.add_relation_to_output(output, key, LazyRelationList(self, idrefs))
 
     def add_relation_to_output(self, output, relation, assets):
         if self.is_attribute_qualified(relation):
-            (container, leaf) = self.split_relation_to_container_and_leaf(relation)
+            container, leaf = self.split_relation_to_container_and_leaf(relation)
 
             asset = self.get_related_asset(output, container)
 
@@ -224,7 +486,7 @@ class V1Meta(object):
             if ".@" in relation:
                 output[relation] = values[0]
             else:
-                (container, leaf) = self.split_relation_to_container_and_leaf(relation)
+                container, leaf = self.split_relation_to_container_and_leaf(relation)
 
                 for asset, value in zip(
                     self.get_related_assets(output, container), values
@@ -274,7 +536,7 @@ class V1Meta(object):
 
     def asset_from_oid(self, oidtoken):
         oid_parts = oidtoken.split(":")
-        (asset_type, asset_id, moment) = (
+        asset_type, asset_id, moment = (
             oid_parts if len(oid_parts) > 2 else (oid_parts[0], oid_parts[1], None)
         )
         AssetClass = self.asset_class(asset_type)
@@ -282,9 +544,10 @@ class V1Meta(object):
         return instance
 
     def history_aware_asset_from_oid(self, oidtoken_with_moment):
-        if len(oidtoken_with_moment.split(":")) == 3:
+        oid_parts = oidtoken_with_moment.split(":")
+        if len(oid_parts) == 3:
             # means oid token has the form "X: Y: Z", which contains the moment as Z
-            asset_type, asset_id, asset_moment = oidtoken_with_moment.split(":")
+            asset_type, asset_id, asset_moment = oid_parts
             # once you have the moment, make a query to : <version1-url>/rest-1.v1/Hist/<asset type>/<asset id>/""
             AssetClass = self.asset_class(asset_type)
             instance = AssetClass(asset_id)
@@ -300,6 +563,14 @@ class V1Meta(object):
 
     get_attachment_blob = set_attachment_blob
 
+    def download_attachment(self, attachment, fileobj, **kw):
+        intid = attachment.intid if isinstance(attachment, BaseAsset) else attachment
+        return self.server.download_attachment(intid, fileobj, **kw)
+
+    def upload_attachment(self, attachment, fileobj, **kw):
+        intid = attachment.intid if isinstance(attachment, BaseAsset) else attachment
+        return self.server.upload_attachment(intid, fileobj, **kw)
+
     # This will eventually require iso8601 module
     # type_converters = dict(
     #  Boolean = bool
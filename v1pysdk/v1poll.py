@@ -1,56 +1,217 @@
 from .v1meta import V1Meta
 
 import sqlite3
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+
+# state of one handler: the (ChangeDateUTC, oid) of the last asset it was called for
+Watermark = namedtuple("Watermark", "change oid")
 
 
 class V1Poll(object):
-    def __init__(self, meta=None, filename="versionone_poll_state.sqlite"):
+    """Incremental change feed over VersionOne assets.
+
+    Handlers are registered per asset type with run_on_new() or run_on_change(). Each
+    poll() only queries the assets changed since the oldest position of the registered
+    handlers (ChangeDateUTC), page by page, and calls every handler once for every new
+    change it hasn't seen yet.  Handler positions are kept in a sqlite file, so a poll
+    picks up where the previous one (in this process or another) stopped.
+
+    A handler registered for the first time starts from the current state of the asset
+    type: it is only called for changes made after its first poll().  Positions are saved
+    under the name of the handler, its module and qualified name unless a *name* is given,
+    which lambdas and nested functions need.
+    """
+
+    def __init__(
+        self, meta=None, filename="versionone_poll_state.sqlite", page_size=500
+    ):
         if not meta:
             meta = V1Meta()
+        self.meta = meta
+        self.page_size = page_size
         self.datafile_name = filename
         self.db = sqlite3.connect(self.datafile_name)
         self.registrations = defaultdict(list)
+        self.selections = defaultdict(set)
+        self.db.execute("""
+            create table if not exists v1_poll_data (
+                handler_id text not null,
+                asset_type text not null,
+                kind text not null,
+                last_change text not null,
+                last_oid integer not null,
+                primary key (handler_id, asset_type, kind)
+            )
+            """)
+        self.db.commit()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exception_type, exception_value, traceback):
-        self.poll()
+        if exception_type is None:
+            self.poll()
+        self.close()
 
-    def run_on_new(self, asset_type_name, handler_function):
-        self.registrations[asset_type_name].append(handler_function)
-        raise NotImplementedError
+    def close(self):
+        self.db.close()
 
-    def poll(self):
-        raise NotImplementedError
-        for asset_type, callback in self.registrations.items():
-            callback_id = callback.__module__ + "." + callback.__name__
-        rows = self.db.query(
+    @staticmethod
+    def handler_id(handler_function, name=None):
+        """The name the position of a handler is saved under: *name* when given, the module
+        and qualified name of the function otherwise"""
+        if name is not None:
+            return name
+        qualname = handler_function.__qualname__
+        if "<lambda>" in qualname or "<locals>" in qualname:
+            # other lambdas or nested functions of the module can have the same qualname
+            raise ValueError(
+                "The handler %s needs a name= to save its position under" % qualname
+            )
+        return handler_function.__module__ + "." + qualname
+
+    def _register(self, kind, asset_type_name, handler_function, select, name):
+        handler_id = self.handler_id(handler_function, name)
+        for registered_id, registered_kind, _ in self.registrations[asset_type_name]:
+            if (registered_id, registered_kind) == (handler_id, kind):
+                raise ValueError(
+                    "A %s handler of %s is already registered as %s"
+                    % (kind, asset_type_name, handler_id)
+                )
+        self.registrations[asset_type_name].append((handler_id, kind, handler_function))
+        if isinstance(select, str):
+            select = [select]
+        self.selections[asset_type_name].update(select)
+
+    def run_on_new(self, asset_type_name, handler_function, select=(), name=None):
+        """Call handler_function(asset) for each asset of the type created after the
+        handler's first poll. *select* names attributes to fetch along with the assets,
+        *name* the position of the handler (see handler_id()).
+        """
+        self._register("new", asset_type_name, handler_function, select, name)
+
+    def run_on_change(self, asset_type_name, handler_function, select=(), name=None):
+        """Call handler_function(asset) for each change made to an asset of the type after
+        the handler's first poll.  Several changes between two polls make a single call.
+        *select* and *name* are the ones of run_on_new().
+        """
+        self._register("change", asset_type_name, handler_function, select, name)
+
+    def _load_watermark(self, handler_id, asset_type_name, kind):
+        row = self.db.execute(
             """
-            select asset_type, min(last_moment)
-            from v1_poll_data
-            group by asset_type
+            select last_change, last_oid from v1_poll_data
+            where handler_id = ? and asset_type = ? and kind = ?
+            """,
+            (handler_id, asset_type_name, kind),
+        ).fetchone()
+        return Watermark(*row) if row else None
+
+    def _save_watermark(self, handler_id, asset_type_name, kind, watermark):
+        self.db.execute(
             """
+            insert or replace into v1_poll_data
+                (handler_id, asset_type, kind, last_change, last_oid)
+            values (?, ?, ?, ?, ?)
+            """,
+            (handler_id, asset_type_name, kind, watermark.change, watermark.oid),
         )
 
-        # if asset type has never been registered,
-        # just put the current moment in the file as the last
-        # seen moment for all newly registered funcs
+    def _latest_watermark(self, asset_type_name):
+        """Position of the most recent change of the asset type, where new handlers start"""
+        asset_class = self.meta.asset_class(asset_type_name)
+        latest = list(
+            asset_class.select("ChangeDateUTC")
+            .sort("-ChangeDateUTC", "-ID")
+            .page(size=1)
+        )
+        if not latest:
+            return Watermark("", 0)
+        return Watermark(latest[0].data["ChangeDateUTC"], int(latest[0].intid))
 
-        # if it has been, get the earliest "previous moment"
-        # query that asset type for everything since that moment
-        # walk through, calling the handler funcs conditionally only if
-        #  they have not been called for that moment
+    def poll(self):
+        """Dispatch the changes made since the last poll, returns the number of handler calls"""
+        calls = 0
+        for asset_type_name, registrations in self.registrations.items():
+            calls += self._poll_asset_type(asset_type_name, registrations)
+        return calls
 
-        previously_called_handlers = None
-        newly_registered_handlers = None
+    def _poll_asset_type(self, asset_type_name, registrations):
+        watermarks = {}
+        for handler_id, kind, handler in registrations:
+            watermark = self._load_watermark(handler_id, asset_type_name, kind)
+            if watermark is None:
+                # if the handler has never been polled, start it from the current state
+                watermark = self._latest_watermark(asset_type_name)
+                self._save_watermark(handler_id, asset_type_name, kind, watermark)
+            watermarks[(handler_id, kind)] = watermark
+        self.db.commit()
 
-        previously_polled_asset_types = None
-        newly_registered_asset_types = None
+        since = min(watermarks.values())
+        select = ["ChangeDateUTC", "CreateDateUTC"] + sorted(
+            self.selections[asset_type_name]
+        )
+        # "new" handlers take the assets created after their position at the start of the
+        # poll, even when an update moved them further on while it ran
+        cutoffs = dict((key, watermark.change) for key, watermark in watermarks.items())
+        announced = defaultdict(set)
 
-        for asset_type in previously_polled_asset_types:
-            pass
+        calls = 0
+        for page in self._changes(asset_type_name, select, since):
+            # handlers that moved past assets without being called, saved once per page
+            skipped = set()
+            for asset in page:
+                position = Watermark(asset.data["ChangeDateUTC"], int(asset.intid))
+                created = asset.data.get("CreateDateUTC") or ""
+                for handler_id, kind, handler in registrations:
+                    key = (handler_id, kind)
+                    if position <= watermarks[key]:
+                        continue
+                    watermarks[key] = position
+                    if kind == "new" and (
+                        created <= cutoffs[key] or position.oid in announced[key]
+                    ):
+                        skipped.add(key)
+                        continue
+                    handler(asset)
+                    calls += 1
+                    announced[key].add(position.oid)
+                    skipped.discard(key)
+                    # persist right after each call, so a handler is never called twice
+                    # for the same change even if a later handler fails
+                    self._save_watermark(handler_id, asset_type_name, kind, position)
+                    self.db.commit()
+            for handler_id, kind in skipped:
+                self._save_watermark(
+                    handler_id, asset_type_name, kind, watermarks[(handler_id, kind)]
+                )
+            if skipped:
+                self.db.commit()
+        return calls
 
-        for row in rows:
-            registered_funcs = self.registrations[row["asset_type"]]
+    def _changes(self, asset_type_name, select, since):
+        """Generator of the pages of the assets changed since the Watermark *since*, oldest
+        change first.  Keyset paging: every page restarts from the newest change read so
+        far, so assets changing during the poll move further on instead of shifting the
+        others over a page boundary.  The assets of that last instant are read again, the
+        watermarks of the handlers filter them out."""
+        asset_class = self.meta.asset_class(asset_type_name)
+        change = since.change
+        skip = 0
+        while True:
+            query = asset_class.select(*select).sort("ChangeDateUTC", "ID")
+            if change:
+                # >= and the oid tie-break keep assets changed in the same instant
+                query = query.filter("ChangeDateUTC>='{0}'".format(change))
+            _, xml = next(query.page_xml(self.page_size, skip))
+            found = xml.findall("Asset")
+            page = [asset_class.from_query_select(asset) for asset in found]
+            yield page
+            if len(found) < self.page_size:
+                return
+            newest = page[-1].data["ChangeDateUTC"]
+            if newest == change:
+                # a whole page changed in the same instant
+                skip += len(found)
+            else:
+                change, skip = newest, 0
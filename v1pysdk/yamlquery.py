@@ -1,5 +1,46 @@
+"""
+Queries written as YAML documents:
+
+    from: Story
+    select:
+      - Scope.Name
+      - Name
+      - Estimate
+    where:
+      SuperMeAndUp.Name: All Projects
+    filter:
+      - Estimate>='5'
+    asof:
+      - 2012-01-01
+      - 2012-02-01
+    sort:
+      - +Name
+      - -Estimate
+    page:
+      size: 100
+      start: 0
+    find: Joe
+    findin:
+      - Name
+      - Description
+
+query_from_yaml() turns a document into a rest-1.v1 URL.  YamlQueries compiles
+documents into query plans once, keyed by the hash of the document, and runs
+them as V1Query objects:
+
+    queries = YamlQueries(v1)
+    for story in queries.run(report_yaml):
+        print(story.Name)
+    for story in queries.stream(report_yaml, page_size=500):
+        ...
+"""
+
+import hashlib
+import threading
 import urllib.parse as parse
-import yaml
+from collections import namedtuple
+
+from .query import DEFAULT_PAGE_SIZE
 
 
 def encode_v1_whereterm(input):
@@ -16,7 +57,7 @@ def single_or_list(input, separator=","):
 def where_terms(data):
     if "where" in data:
         for attrname, value in data["where"].items():
-            yield ("%s='%s'" % (attrname, encode_v1_whereterm(value)))
+            yield ("%s='%s'" % (attrname, encode_v1_whereterm(str(value))))
 
     if "filter" in data:
         filter = data["filter"]
@@ -54,39 +95,116 @@ def query_params(data):
         yield ("op", data["op"])
 
 
-def query_from_yaml(yamlstring):
-    data = yaml.load(yamlstring)
-    if data and "from" in data:
-        path = "/" + parse.quote(data["from"])
-        url = path + "?" + parse.urlencode(list(query_params(data)))
-        return url
+def load_yaml_query(yamlstring):
+    """The query document of a YAML string, a dict with at least a "from" key"""
+    import yaml
+
+    data = yaml.safe_load(yamlstring)
+    if isinstance(data, dict) and "from" in data:
+        return data
     raise Exception("Invalid yaml output: " + str(data))
 
 
-code = """
-  from: Story
-  select:
-    - Scope.Name
-    - Name
-    - Estimate
-    - CreateDateUTC
-    - Owner[OwnedWorkitems.@Count<'']
-  where:
-    SuperMeAndUp.Name: All Projects
-  filter:
-    - Estimate>='5'
-  asof: 2012-01-01 01:01:01
-  sort:
-    - +Name
-    - -Estimate
-  page:
-    size: 100
-    start: 0
-  find: Joe
-  findin:
-    - Name
-    - Description
-  op: Delete
-"""
+def query_from_yaml(yamlstring):
+    data = load_yaml_query(yamlstring)
+    path = "/" + parse.quote(data["from"])
+    url = path + "?" + parse.urlencode(list(query_params(data)))
+    return url
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return [str(item) for item in str(value).split(",")]
+
 
-print(query_from_yaml(code))
+# the parts of a query document, normalized so they can be applied to a V1Query
+YamlQueryPlan = namedtuple(
+    "YamlQueryPlan",
+    "asset_type select filter sort page_size page_start find findin asof",
+)
+
+
+def compile_yaml_query(yamlstring):
+    """YamlQueryPlan of a YAML query document.  Documents with an "op" are refused: running
+    an operation on every result is not something a report should do by accident."""
+    data = load_yaml_query(yamlstring)
+    if "op" in data:
+        raise ValueError(
+            "YAML queries with an op can't be executed, use query_from_yaml() for the URL"
+        )
+    page = data.get("page") or {}
+    asof = data.get("asof")
+    if asof is None:
+        asof = []
+    elif not isinstance(asof, list):
+        asof = [asof]
+    return YamlQueryPlan(
+        asset_type=str(data["from"]),
+        select=tuple(as_list(data.get("select"))),
+        filter=";".join(where_terms(data)) or None,
+        # "+Name" sorts like "Name"
+        sort=tuple(term.lstrip("+") for term in as_list(data.get("sort"))),
+        page_size=page.get("size"),
+        page_start=page.get("start"),
+        find=data.get("find"),
+        findin=",".join(as_list(data.get("findin"))) or None,
+        # YAML reads unquoted dates as date objects
+        asof=tuple(str(moment) for moment in asof),
+    )
+
+
+class YamlQueries(object):
+    """Runs YAML query documents against a V1Meta, compiling each distinct document once"""
+
+    def __init__(self, v1meta):
+        self.v1meta = v1meta
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def compile(self, yamlstring):
+        """The YamlQueryPlan of a document, from the cache when the same text was seen before"""
+        key = hashlib.sha256(yamlstring.encode("utf-8")).hexdigest()
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = compile_yaml_query(yamlstring)
+            with self._lock:
+                self._plans[key] = plan
+        return plan
+
+    def query(self, yamlstring):
+        """A new V1Query for the document"""
+        plan = self.compile(yamlstring)
+        return self._query(plan, plan.asof)
+
+    def _query(self, plan, asof):
+        query = self.v1meta.asset_class(plan.asset_type).select(*plan.select)
+        if plan.filter:
+            query.filter(plan.filter)
+        if plan.sort:
+            query.sort(*plan.sort)
+        if plan.page_size:
+            query.page(size=plan.page_size, start=plan.page_start)
+        if plan.find and plan.findin:
+            query.find(plan.find, plan.findin)
+        if asof:
+            query.asof(list(asof))
+        return query
+
+    def run(self, yamlstring):
+        """The results of the document, every asof moment being requested at the same time"""
+        return self.query(yamlstring)
+
+    def stream(self, yamlstring, page_size=None):
+        """Generator of the results of the document, requested *page_size* at a time from the
+        document's page start, one asof moment after the other.  *page_size* defaults to the
+        document's page size, or DEFAULT_PAGE_SIZE when it has none."""
+        plan = self.compile(yamlstring)
+        if page_size is None:
+            page_size = plan.page_size or DEFAULT_PAGE_SIZE
+        for asof in plan.asof or (None,):
+            query = self._query(plan, [asof] if asof else [])
+            for asset in query.paged(page_size):
+                yield asset